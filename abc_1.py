@@ -1,180 +1,615 @@
-from flask import Flask, jsonify, request
-import pandas as pd
+from flask import Flask, jsonify, request, g, url_for
+import numpy as np
 from datetime import datetime, timedelta
-import random
-import networkx as nx
-import heapq
 import threading
+import os
+import argparse
+import io
+from station_graph import changed_delays
+from snapshot import GraphSnapshot, SnapshotHolder
+from connection_scan import build_connections
+from types import MappingProxyType
+from route_cache import RouteCache
+from batch_routing import BatchRouter
+from data_stats import SummaryCache
+from http_encoding import FastJSONProvider, compress_response
+from contraction import load_or_contract
+from convert_to_csv import default_data_path
+from network_artifact import load_or_compile
+from delay_simulation import DelaySimulator, DelayForecast
+from geo_index import StationGeoIndex, TravelTimeBound
+from metrics import REGISTRY, CONTENT_TYPE, SIZE_BUCKETS, RequestProfile
+from delay_model import DelayModel, train_attributes
+from timetable import ServiceDays, MINUTES_PER_DAY
+from time import perf_counter, thread_time
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
-# Load and preprocess dataset
-DATA_PATH = "preprocessed_capstone_merged_train_data.csv"
-df = pd.read_csv(DATA_PATH)
-df = df.dropna(subset=["train_number", "from_station_code", "to_station_code", "train_name_y", "arrival_time", "departure_time", "day", "total_duration_min"])
-df['arrival_time'] = pd.to_datetime(df['arrival_time'], format='%H:%M:%S', errors='coerce').dt.time
-df['departure_time'] = pd.to_datetime(df['departure_time'], format='%H:%M:%S', errors='coerce').dt.time
+# In-process metrics, served in Prometheus text format from /metrics
+STARTUP_SECONDS = REGISTRY.histogram("startup_seconds", "Time of each startup step", labels=("step",))
+REFRESH_SECONDS = REGISTRY.histogram("delay_refresh_seconds", "Wall time of each delay refresh phase", labels=("phase",))
+REFRESH_CPU_SECONDS = REGISTRY.histogram("delay_refresh_cpu_seconds", "CPU time the refreshing thread spends per delay refresh")
+REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "Request handling time up to the finished response", labels=("endpoint", "method", "status"))
+RESPONSE_BYTES = REGISTRY.histogram("http_response_bytes", "Response body size as sent", SIZE_BUCKETS, labels=("endpoint", "encoding"))
+PROFILING_ENABLED = os.environ.get("ALLOW_REQUEST_PROFILING") == "1"                #?profile=1 returns a cProfile summary of the request instead
+
+DATA_PATH = os.environ.get("TRAIN_DATA_PATH", default_data_path())
+NETWORK_PATH = os.environ.get("NETWORK_ARTIFACT_PATH", DATA_PATH + ".network")
 
 # Graph and delay containers
-G = nx.DiGraph()
-station_coords = df[['from_station_code', 'latitude', 'longitude']].drop_duplicates('from_station_code').set_index('from_station_code').to_dict('index')
-train_timetables = {}
-train_delays = {}
-delays_per_station = {}
+REFRESH_INTERVAL_SEC = int(os.environ.get("DELAY_REFRESH_SEC", 300))
+MAX_ALTERNATE_ROUTES = 5
+ALTERNATE_ROUTE_BUDGET_SEC = 0.25
+MAX_BATCH_CELLS = 4_000_000
+MAX_PAGE_SIZE = 1000
+MAX_NEARBY_STATIONS = 50
+SERVICE_DAYS_AHEAD = 1                                                      #Service days kept past today (days back: as many as the longest run spans)
+TRAIN_FIELDS = {"number": "train_number", "name": "train_name", "route": "route"}
+SIMULATION_SEED = os.environ.get("DELAY_SIMULATION_SEED")                   #Fixed seed: every run replays the same delays per snapshot version
+DELAY_MODEL_PATH = os.environ.get("DELAY_MODEL_PATH")                       #Exported delay model (delay_model.py); predicted delays are off without it
+ROUTE_A_STAR = os.environ.get("ROUTE_A_STAR") == "1"                        #"1": /live/route searches with A*, faster only where the bound is tight (bench_astar)
+network = None
+edge_table = None
+route_topology = None
+station_coords = None
+station_index = None                                        #KD-tree behind /stations/nearby
+travel_bound = None                                         #Great-circle lower bound: distance bands, and A* with ROUTE_A_STAR
+route_cache = None                                          #Route answers for the current snapshot, dropped on every publish
+train_timetables = None
+connection_table = None
+route_hierarchy = None
+delay_simulator = None
+scheduled_forecast = None
+initial_service_days = None
+delay_model = None
+delay_features = None
+snapshots = SnapshotHolder()
+stats_summary = SummaryCache(DATA_PATH)                     #Dashboard aggregates, recomputed only when the data file changes
+batch_router = BatchRouter()                                #Process pool for /live/route/batch, started on first use
+
+# Load the prebuilt network (timetable, edge table, route topology), mapped from the
+# compiled artifact when it matches the dataset, otherwise parsed and compiled now.
+# Not done at import: batch routing workers import the main module again (as
+# __mp_main__ when started with python abc_1.py) and must not load a network of their own.
+def load_network_data():
+    global network, edge_table, route_topology, station_coords, station_index, travel_bound, route_cache
+    if network is not None:
+        return
+    with STARTUP_SECONDS.time(step="network"):
+        network = load_or_compile(DATA_PATH, NETWORK_PATH)
+    edge_table = network.edge_table
+    route_topology = network.route_topology
+    station_coords = network.station_coords
+    station_index = StationGeoIndex(list(station_coords),
+                                    [coords['latitude'] for coords in station_coords.values()],
+                                    [coords['longitude'] for coords in station_coords.values()])
+    travel_bound = TravelTimeBound(route_topology, station_coords)
+    route_cache = RouteCache(bound=travel_bound, a_star=ROUTE_A_STAR)
+    snapshots.subscribe(route_cache.published)
 
-# Initialize timetables once
+# Initialize timetables once (columnar, already built with the network)
 def build_timetables():
-    for train_number, group in df.groupby("train_number"):
-        timetable = []
-        for _, row in group.iterrows():
-            today = datetime.now().date()
-            arrival_dt = datetime.combine(today + timedelta(days=int(row['day']) - 1), row['arrival_time'])
-            departure_dt = datetime.combine(today + timedelta(days=int(row['day']) - 1), row['departure_time'])
-            timetable.append({
-                "station": row['from_station_code'],
-                "arrival": arrival_dt,
-                "departure": departure_dt,
-                "train_name": row['train_name_y']
-            })
-        if len(timetable) >= 2:
-            train_timetables[str(train_number)] = sorted(timetable, key=lambda x: x['arrival'])
-
-# Dynamic updater
-def update_delays_and_graph():
-    global G, train_delays, delays_per_station
-    train_delays = {str(train_id): random.randint(0, 30) for train_id in train_timetables.keys()}
-    delays_per_station = {}
-    G.clear()
-    for _, row in df.iterrows():
-        from_station = row['from_station_code']
-        to_station = row['to_station_code']
-        train_id = str(row['train_number'])
-        delay = train_delays.get(train_id, 0)
-        weight = float(row['total_duration_min']) + delay
-        G.add_edge(from_station, to_station, weight=weight)
-        delays_per_station[from_station] = delay
+    global train_timetables, connection_table, delay_simulator, scheduled_forecast, initial_service_days
+    load_network_data()
+    with STARTUP_SECONDS.time(step="timetables"):
+        train_timetables = network.timetable
+        connection_table = build_connections(train_timetables)
+        delay_simulator = DelaySimulator(train_timetables)
+        no_delay = np.zeros(len(train_timetables.arrival), dtype=np.int64)
+        scheduled_forecast = DelayForecast(train_timetables, no_delay, no_delay.copy())
+        initial_service_days = ServiceDays.around(datetime.now().date(), max(train_timetables.service_span_days() - 1, 1), SERVICE_DAYS_AHEAD)
+    if DELAY_MODEL_PATH:
+        load_delay_model(DELAY_MODEL_PATH)
+
+# Delay model exported by delay_model.py plus the schedule features of every train; each
+# refresh runs it once over the whole fleet (numpy only, no TensorFlow)
+def load_delay_model(path):
+    global delay_model, delay_features
+    with STARTUP_SECONDS.time(step="delay_model"):
+        delay_model = DelayModel.load(path)
+        delay_features = delay_model.features(train_timetables, train_attributes(DATA_PATH, train_timetables))
+
+# Optional contraction hierarchy over the route topology, loaded from path when it was built
+# for this topology and contracted (then saved there) otherwise. Each delay refresh only
+# re-customizes its weights.
+def build_route_hierarchy(path):
+    global route_hierarchy
+    route_hierarchy = load_or_contract(route_topology, path)
+
+# Dynamic updater: delays come from a run of the delay propagation simulator (per stop,
+# seeded per snapshot version when SIMULATION_SEED is set). Stops a train has already
+# reached keep the disturbances of the previous run, so delays already shown never
+# change and each tick only redraws what lies ahead; each train's current delay,
+# taken at the run of its current service day, drives the edge weights. The first run
+# computes the delayed weight arrays from the edge table, later runs copy the current
+# arrays and only rewrite the edges and station delays of trains whose delay changed.
+# The new snapshot is published with one reference swap; readers never see it half-built.
+# With a delay model loaded, the predicted delay of every train is computed in one
+# batched call and published alongside. Each phase's wall time and the CPU time of the
+# whole refresh go to the delay_refresh_* histograms.
+def update_delays_and_graph(schedule_next=True):
+    started, started_cpu = perf_counter(), thread_time()
+    previous = snapshots.current
+    seed = None if SIMULATION_SEED is None else [int(SIMULATION_SEED), previous.version + 1]
+    now = datetime.now()
+    service_days = current_service_days(previous, now)
+    with REFRESH_SECONDS.time(phase="simulate"):
+        previous_min = train_pattern_minutes(service_days, stop_forecast(previous), now)
+        forecast = delay_simulator.run_after(previous.forecast, previous_min, seed)
+        now_min = train_pattern_minutes(service_days, forecast, now)
+        train_delay = forecast.train_delays(now_min)                                 #Each train at its current service day's run
+        new_delays = dict(zip(train_timetables.train_ids.tolist(), train_delay.tolist()))
+    predicted = None
+    if delay_model is not None:
+        with REFRESH_SECONDS.time(phase="predict"):
+            predicted = delay_model.predict(delay_features.at(now_min))
+        predicted.setflags(write=False)
+    with REFRESH_SECONDS.time(phase="graph"):
+        if previous.graph is None:
+            weights, station_delay = edge_table.delayed_weights(new_delays)
+        else:
+            weights = previous.graph.weights.copy()
+            station_delay = previous.graph.station_delay.copy()
+            edge_table.apply_delay_changes(weights, station_delay, changed_delays(previous.train_delays, new_delays))
+        graph = route_topology.with_weights(weights, station_delay)
+    with REFRESH_SECONDS.time(phase="connections"):
+        connections = connection_table.with_stop_delays(forecast.arrival_delay, forecast.departure_delay)
+    with REFRESH_SECONDS.time(phase="hierarchy"):
+        hierarchy = None if route_hierarchy is None else route_hierarchy.customize(graph)
+    with REFRESH_SECONDS.time(phase="publish"):
+        snapshots.publish(GraphSnapshot(
+            version=previous.version + 1,
+            graph=graph,
+            train_delays=MappingProxyType(new_delays),
+            max_delay=forecast.max_delay(),
+            updated_at=now,
+            connections=connections,
+            hierarchy=hierarchy,
+            forecast=forecast,
+            predicted_delays=predicted,
+            service_days=service_days,
+        ))
+    REFRESH_SECONDS.observe(perf_counter() - started, phase="total")
+    REFRESH_CPU_SECONDS.observe(thread_time() - started_cpu)
 
     # Schedule next run
-    threading.Timer(300, update_delays_and_graph).start()
-
-# Shortest path logic
-# Dijkstra-based shortest path with delay consideration
-def find_fastest_route(graph, delays, start, end):
-    visited = set()
-    queue = [(0, start, [])]
-    while queue:
-        current_time, station, path = heapq.heappop(queue)
-        if station in visited:
-            continue
-        visited.add(station)
-        path = path + [station]
-        if station == end:
-            return current_time, path
-        for neighbor in graph.neighbors(station):
-            edge_weight = graph[station][neighbor]['weight']
-            delay = delays.get(station, 0)
-            total_cost = current_time + edge_weight + delay
-            heapq.heappush(queue, (total_cost, neighbor, path))
-    return float('inf'), []
+    if schedule_next:
+        timer = threading.Timer(REFRESH_INTERVAL_SEC, update_delays_and_graph)
+        timer.daemon = True                                #Never holds the process open on shutdown
+        timer.start()
+
+# Builds everything the routes read and publishes the first snapshot; the updater then
+# keeps publishing every REFRESH_INTERVAL_SEC. Shared by the Flask server and asgi_app.
+def start_live_updates(hierarchy_path=None):
+    build_timetables()
+    if hierarchy_path:
+        with STARTUP_SECONDS.time(step="hierarchy"):
+            build_route_hierarchy(hierarchy_path)
+    with STARTUP_SECONDS.time(step="stats_summary"):
+        stats_summary.summary()
+    update_delays_and_graph()
+
+# Pattern minute of now for every train, at the run of its current service day under forecast
+def train_pattern_minutes(service_days, forecast, now):
+    return service_days.offsets(now)[service_days.current_day(forecast.arrival[train_timetables.indptr[1:] - 1], now)]
+
+# Each request reads a single snapshot for its whole lifetime
+def pin_snapshot():
+    if 'snapshot' not in g:
+        g.snapshot = snapshots.current
+    return g.snapshot
+
+# Service-day window of the snapshot, rolled forward when midnight has passed since it
+# was published (the timetable itself is never rebuilt for a new day)
+def current_service_days(snapshot, now):
+    days = initial_service_days if snapshot.service_days is None else snapshot.service_days
+    return days.rolled(now.date())
+
+# Service day of the train's current run: the oldest one that has not reached its
+# terminus yet (with its delay), so a run is shown until it arrives
+def train_service_day(snapshot, train_id, now):
+    days = current_service_days(snapshot, now)
+    terminus = train_timetables.stops(train_id).stop - 1
+    return days, int(days.current_day(stop_forecast(snapshot).arrival[terminus], now))
+
+# Predicted stop times of the snapshot (the plain schedule until the first delay run)
+def stop_forecast(snapshot):
+    return scheduled_forecast if snapshot.forecast is None else snapshot.forecast
+
+def stop_status(now, arrival, departure):
+    if now > departure:
+        return "Departed"
+    elif arrival <= now <= departure:
+        return "At station"
+    elif now < arrival:
+        minutes_left = int((arrival - now).total_seconds() // 60)
+        return f"Expected in {minutes_left} min"
+    return "Unknown"
 
 @app.route('/live/train/<train_id>', methods=['GET'])
 def get_train_status(train_id):
+    snapshot = pin_snapshot()
     if train_id not in train_timetables:
-        return jsonify({"error": "Train not found"}), 404
+        return jsonify({"error": "Train not found", "snapshot_version": snapshot.version}), 404
     now = datetime.now()
-    delay = train_delays.get(train_id, 0)                            #Returns live status of all stations on the route of that train
+    days, day = train_service_day(snapshot, train_id, now)
+    result = {
+        "train_number": train_id,
+        "train_name": train_timetables.train_name(train_id),
+        "service_date": days.dates[day].isoformat(),
+        "route": train_status_rows(snapshot, train_id, now),              #Returns live status of all stations on the route of that train
+        "last_updated": now.strftime('%Y-%m-%d %H:%M:%S'),
+        "snapshot_version": snapshot.version
+    }
+    if snapshot.predicted_delays is not None:
+        result["predicted_delay_min"] = round(float(snapshot.predicted_delays[train_timetables.train_index[train_id]]), 1)
+    return jsonify(result)
+
+# One row per stop of the train, as served by /live/train and pushed by the live feed
+def train_status_rows(snapshot, train_id, now):
+    forecast = stop_forecast(snapshot)
+    stops = train_timetables.stops(train_id)
+    days, day = train_service_day(snapshot, train_id, now)
     status_list = []
-    for stop in train_timetables[train_id]:
-        arrival = stop['arrival'] + timedelta(minutes=delay)
-        departure = stop['departure'] + timedelta(minutes=delay)
-        if now > departure:
-            status = "Departed"
-        elif arrival <= now <= departure:
-            status = "At station"
-        elif now < arrival:
-            minutes_left = int((arrival - now).total_seconds() // 60)
-            status = f"Expected in {minutes_left} min"
-        else:
-            status = "Unknown"
+    for station, arrival_min, departure_min, delay in zip(train_timetables.route(train_id),
+                                                          forecast.arrival[stops].tolist(),
+                                                          forecast.departure[stops].tolist(),
+                                                          forecast.stop_delay[stops].tolist()):
+        arrival = days.to_datetime(day, arrival_min)
+        departure = days.to_datetime(day, departure_min)
         status_list.append({
-            "station": stop['station'],
+            "station": station,
             "arrival": arrival.strftime('%Y-%m-%d %H:%M'),
             "departure": departure.strftime('%Y-%m-%d %H:%M'),
-            "status": status,
+            "status": stop_status(now, arrival, departure),
             "delay_min": delay
         })
-    return jsonify({
-        "train_number": train_id,
-        "train_name": train_timetables[train_id][0]["train_name"],
-        "route": status_list,
-        "last_updated": now.strftime('%Y-%m-%d %H:%M:%S')
-    })
+    return status_list
 
 @app.route('/live/station/<station_code>', methods=['GET'])
 def get_station_status(station_code):
+    snapshot = pin_snapshot()
     now = datetime.now()
-    station_summary = []                                                      #Loops through all train timetables and filters ones stopping at the station
-    for train_id, timetable in train_timetables.items():
-        for stop in timetable:
-            if stop['station'] == station_code:
-                delay = train_delays.get(train_id, 0)
-                arrival = stop['arrival'] + timedelta(minutes=delay)
-                departure = stop['departure'] + timedelta(minutes=delay)
-                if now > departure:
-                    status = "Departed"
-                elif arrival <= now <= departure:
-                    status = "At station"
-                elif now < arrival:
-                    minutes_left = int((arrival - now).total_seconds() // 60)
-                    status = f"Expected in {minutes_left} min"
-                else:
-                    status = "Unknown"
-                station_summary.append({
-                    "train_number": train_id,
-                    "train_name": stop['train_name'],
-                    "arrival": arrival.strftime('%Y-%m-%d %H:%M'),
-                    "departure": departure.strftime('%Y-%m-%d %H:%M'),
-                    "delay_min": delay,
-                    "status": status
-                })
-                break
+    window = request.args.get('window', type=int)                            #Optional: only trains arriving in the next `window` minutes
     return jsonify({
         "station": station_code,
-        "live_status": station_summary,
-        "last_updated": now.strftime('%Y-%m-%d %H:%M:%S')
+        "live_status": station_status_rows(snapshot, station_code, now, window),
+        "last_updated": now.strftime('%Y-%m-%d %H:%M:%S'),
+        "snapshot_version": snapshot.version
     })
 
+# One row per train calling at the station, as served by /live/station and pushed by the live feed.
+# Without a window each train appears at its run that has yet to leave the station (or
+# the newest run); with one, every run of the window calling in it, found by one binary
+# search per service day. Rows are in order of scheduled arrival.
+def station_status_rows(snapshot, station_code, now, window=None):
+    station_summary = []
+    forecast = stop_forecast(snapshot)
+    station_id = train_timetables.station_id(station_code)
+    if station_id is not None:
+        index = train_timetables.station_index
+        days = current_service_days(snapshot, now)
+        if window is None:
+            calls = index.calls(station_id)
+            trains, positions = index.trains[calls], index.stops[calls]
+            service_day = days.current_day(forecast.departure[positions], now)
+        else:
+            # A delayed train is still listed while it has not departed, so widen the lower bound
+            slack = snapshot.max_delay + int(index.max_dwell[station_id]) + 1
+            found = []
+            for day, now_min in enumerate(days.offsets(now).tolist()):
+                calls = index.calls_between(station_id, int(now_min) - slack, int(now_min) + window)
+                found.append((index.trains[calls], index.stops[calls], np.full(calls.stop - calls.start, day)))
+            trains, positions, service_day = (np.concatenate(parts) for parts in zip(*found))
+            window_end = now + timedelta(minutes=window)
+        order = np.argsort(service_day * MINUTES_PER_DAY + train_timetables.arrival[positions], kind='stable')
+        for train, position, day in zip(trains[order].tolist(), positions[order].tolist(), service_day[order].tolist()):
+            train_id = train_timetables.train_ids[train]
+            delay = int(forecast.stop_delay[position])
+            arrival = days.to_datetime(day, forecast.arrival[position])
+            departure = days.to_datetime(day, forecast.departure[position])
+            if window is not None and (departure < now or arrival > window_end):
+                continue
+            station_summary.append({
+                "train_number": train_id,
+                "train_name": train_timetables.train_names[train],
+                "service_date": days.dates[day].isoformat(),
+                "arrival": arrival.strftime('%Y-%m-%d %H:%M'),
+                "departure": departure.strftime('%Y-%m-%d %H:%M'),
+                "delay_min": delay,
+                "status": stop_status(now, arrival, departure)
+            })
+    return station_summary
+
+# Summary of all trains: number, name and list of stations in route. Optional:
+# station=CODE (only trains calling there), fields=number,name,route (projection) and
+# limit=N with cursor=C for pages; a page that has more after it links the next one
+# in a Link header (rel="next") and X-Next-Cursor.
 @app.route('/live/all_trains', methods=['GET'])
 def get_all_trains():
-    summary = []                                         #Simple summary of all trains: number, name and list of stations in route
-    for train_id, stops in train_timetables.items():
-        summary.append({
-            "train_number": train_id,
-            "train_name": stops[0]["train_name"],
-            "route": [s["station"] for s in stops]
-        })
-    return jsonify(summary)
+    fields = request.args.get('fields')
+    keys = list(TRAIN_FIELDS.values()) if fields is None else [TRAIN_FIELDS.get(name.strip(), name.strip()) for name in fields.split(',')]
+    if not keys or any(key not in TRAIN_FIELDS.values() for key in keys):
+        return jsonify({"error": f"fields must be a comma-separated list of {', '.join(TRAIN_FIELDS)}"}), 400
+    limit, cursor = request.args.get('limit'), request.args.get('cursor', '0')     #Parsed here: type=int would drop a malformed value silently
+    if limit is not None and not (limit.isdecimal() and 1 <= int(limit) <= MAX_PAGE_SIZE):
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    if not cursor.isdecimal():
+        return jsonify({"error": "cursor must be the X-Next-Cursor of a previous page"}), 400
+    limit, cursor = None if limit is None else int(limit), int(cursor)
+
+    trains = np.arange(len(train_timetables))
+    station = request.args.get('station')
+    if station is not None:
+        station_id = train_timetables.station_id(station)
+        index = train_timetables.station_index
+        trains = np.zeros(0, dtype=np.int64) if station_id is None else np.unique(index.trains[index.calls(station_id)])
+    start = int(np.searchsorted(trains, cursor))
+    end = len(trains) if limit is None else start + limit
+    page = trains[start:end].tolist()
+
+    timetable = train_timetables
+    summary = []
+    for i in page:
+        row = {}
+        if "train_number" in keys:
+            row["train_number"] = timetable.train_ids[i]
+        if "train_name" in keys:
+            row["train_name"] = timetable.train_names[i]
+        if "route" in keys:
+            row["route"] = timetable.station_codes[timetable.stations[timetable.indptr[i]:timetable.indptr[i + 1]]].tolist()
+        summary.append(row)
+    response = jsonify(summary)
+    if end < len(trains):
+        next_cursor = str(trains[end])
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for("get_all_trains", **{**request.args.to_dict(), "cursor": next_cursor})}>; rel="next"'
+    return response
 
 @app.route('/live/route', methods=['GET'])
 def get_optimized_route():
+    snapshot = pin_snapshot()
     source = request.args.get('source')
     destination = request.args.get('destination')                                    #Accepts source and destination via query params
     if not source or not destination:
-        return jsonify({"error": "Source and destination are required"}), 400
+        return jsonify({"error": "Source and destination are required", "snapshot_version": snapshot.version}), 400
     if source == destination:
-        return jsonify({"error": "Source and destination cannot be the same"}), 400
-    time, path = find_fastest_route(G, delays_per_station, source, destination)
+        return jsonify({"error": "Source and destination cannot be the same", "snapshot_version": snapshot.version}), 400
+    if snapshot.graph is None:
+        return jsonify({"error": "Route graph not built yet", "snapshot_version": snapshot.version}), 503
+    if request.args.get('depart_after'):
+        return get_timetable_route(snapshot, source, destination, request.args['depart_after'])
+    alternates = request.args.get('alternates', 0, type=int)                         #Optional number of alternate routes (Yen's k-shortest)
+    alternates = max(0, min(alternates, MAX_ALTERNATE_ROUTES))
+    if alternates:
+        (time, path), others = route_cache.alternate_routes(snapshot, source, destination, alternates, ALTERNATE_ROUTE_BUDGET_SEC)
+    else:
+        time, path = route_cache.fastest_route(snapshot, source, destination)
     if time == float('inf'):
-        return jsonify({"error": "No valid path found"}), 404
-    return jsonify({
+        return jsonify({"error": "No valid path found", "snapshot_version": snapshot.version}), 404
+    result = {
         "source": source,
         "destination": destination,
         "time_min": int(time),
         "route": path,
-        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "snapshot_version": snapshot.version
+    }
+    if alternates:
+        result["alternate_routes"] = [{"path": alt_path, "time": int(alt_time)} for alt_time, alt_path in others]
+    return jsonify(result)
+
+# Travel-time matrix: JSON body {"sources": [codes], "destinations": [codes]}. Answers
+# with time_min[i][j] (null where unreachable or unknown), or with the float32 matrix
+# as a .npy file (inf where unreachable) when called with ?format=npy
+@app.route('/live/route/batch', methods=['POST'])
+def get_route_matrix():
+    snapshot = pin_snapshot()
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "The body must be a JSON object with sources and destinations", "snapshot_version": snapshot.version}), 400
+    sources, destinations = body.get('sources'), body.get('destinations')
+    if not all(isinstance(codes, list) and codes and all(isinstance(code, str) for code in codes) for codes in (sources, destinations)):
+        return jsonify({"error": "sources and destinations must be non-empty lists of station codes", "snapshot_version": snapshot.version}), 400
+    if len(sources) * len(destinations) > MAX_BATCH_CELLS:
+        return jsonify({"error": f"At most {MAX_BATCH_CELLS} source-destination pairs per batch", "snapshot_version": snapshot.version}), 400
+    if snapshot.graph is None:
+        return jsonify({"error": "Route graph not built yet", "snapshot_version": snapshot.version}), 503
+    matrix = batch_router.travel_time_matrix(snapshot.graph, sources, destinations)
+    if request.args.get('format') == 'npy':
+        buffer = io.BytesIO()
+        np.save(buffer, matrix.astype(np.float32))
+        return app.response_class(buffer.getvalue(), mimetype='application/x-npy')
+    return jsonify({
+        "sources": sources,
+        "destinations": destinations,
+        "time_min": [[None if time == float('inf') else int(time) for time in row] for row in matrix.tolist()],
+        "unknown_stations": sorted({code for code in sources + destinations if code not in snapshot.graph}),
+        "snapshot_version": snapshot.version
     })
 
+# Parses depart_after as "HH:MM" (today) or "YYYY-MM-DDTHH:MM"
+def parse_depart_after(value):
+    for fmt in ('%H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M'):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == '%H:%M':
+            parsed = datetime.combine(datetime.now().date(), parsed.time())
+        return parsed
+    return None
+
+# Earliest-arrival journey over the delayed timetable (connection scan). The runs of the
+# depart day and of the earlier days that may still be under way are scanned one service
+# day at a time (transfers stay within one day's runs); the earliest arrival wins.
+def get_timetable_route(snapshot, source, destination, depart_after):
+    if not len(snapshot.connections):
+        return jsonify({"error": "depart_after needs per-stop stations in the timetable; every train in this data calls at one station only",
+                        "snapshot_version": snapshot.version}), 501
+    depart = parse_depart_after(depart_after)
+    if depart is None:
+        return jsonify({"error": "depart_after must be HH:MM or YYYY-MM-DDTHH:MM", "snapshot_version": snapshot.version}), 400
+    days = ServiceDays.around(depart.date(), initial_service_days.days_before, 0)
+    best = None
+    for day, depart_offset in enumerate(days.offsets(depart).tolist()):
+        depart_min = int(np.ceil(depart_offset))
+        arrival, legs = snapshot.connections.earliest_arrival(source, destination, depart_min)
+        if arrival != float('inf') and (best is None or days.to_datetime(day, arrival) < days.to_datetime(best[0], best[1])):
+            best = (day, arrival, depart_min, legs)
+    if best is None:
+        return jsonify({"error": "No valid path found", "snapshot_version": snapshot.version}), 404
+    day, arrival, depart_min, legs = best
+    route = [legs[0]["stations"][0]]
+    for leg in legs:
+        route.extend(leg["stations"][1:])
+        leg["departure"] = days.to_datetime(day, leg["departure"]).strftime('%Y-%m-%d %H:%M')
+        leg["arrival"] = days.to_datetime(day, leg["arrival"]).strftime('%Y-%m-%d %H:%M')
+    return jsonify({
+        "source": source,
+        "destination": destination,
+        "depart_after": depart.strftime('%Y-%m-%d %H:%M'),
+        "arrival": days.to_datetime(day, arrival).strftime('%Y-%m-%d %H:%M'),
+        "time_min": int(arrival - depart_min),
+        "route": route,
+        "legs": legs,
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "snapshot_version": snapshot.version
+    })
+
+@app.route('/live/last_update', methods=['GET'])
+def get_last_update():
+    snapshot = pin_snapshot()                          #When the currently published graph snapshot was built
+    if snapshot.updated_at is None:
+        return jsonify({"error": "Route graph not built yet", "snapshot_version": snapshot.version}), 503
+    return jsonify({
+        "last_updated": snapshot.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+        "snapshot_version": snapshot.version
+    })
+
+@app.route('/live/stats', methods=['GET'])
+def get_stats():
+    snapshot = pin_snapshot()                          #Route cache counters (hits, misses, evictions, size)
+    return jsonify({
+        "route_cache": route_cache.stats(),
+        "snapshot_version": snapshot.version
+    })
+
+# The k stations nearest to a point, so clients need not download the full station list
+@app.route('/stations/nearby', methods=['GET'])
+def get_nearby_stations():
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    k = request.args.get('k', 5, type=int)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "lat and lon must be valid coordinates"}), 400
+    if not 1 <= k <= MAX_NEARBY_STATIONS:
+        return jsonify({"error": f"k must be between 1 and {MAX_NEARBY_STATIONS}"}), 400
+    return jsonify([{
+        "station_code": code,
+        "latitude": station_coords[code]['latitude'],
+        "longitude": station_coords[code]['longitude'],
+        "distance_km": round(distance, 3)
+    } for code, distance in station_index.nearest(lat, lon, k)])
+
+# Aggregates for the Statistical Dashboard; clients revalidate with If-None-Match
+@app.route('/stats/summary', methods=['GET'])
+def get_stats_summary():
+    summary = stats_summary.summary()
+    response = jsonify(summary)
+    response.set_etag(summary["data_version"], weak=True)
+    return response.make_conditional(request)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return app.response_class(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+# Request timing and, with ?profile=1 when ALLOW_REQUEST_PROFILING=1, a cProfile of the
+# request. Registered before the other hooks, so the after-hook runs last and sees the
+# response as sent (compressed).
+@app.before_request
+def start_request_metrics():
+    g.request_start = perf_counter()
+    if PROFILING_ENABLED and request.args.get('profile') == '1':
+        g.profile = RequestProfile()
+        if not g.profile.start():
+            return jsonify({"error": "Another request is being profiled"}), 429
+    return None
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unmatched"
+    if not (response.is_streamed or response.direct_passthrough):
+        RESPONSE_BYTES.observe(len(response.get_data()), endpoint=endpoint, encoding=response.headers.get('Content-Encoding', 'identity'))
+    REQUEST_SECONDS.observe(perf_counter() - g.request_start, endpoint=endpoint, method=request.method, status=response.status_code)
+    profile = g.pop('profile', None)
+    if profile is not None and profile.running:
+        summary = app.response_class(profile.summary(), content_type="text/plain; charset=utf-8")
+        summary.headers['X-Profiled-Status'] = str(response.status_code)
+        summary.headers['X-Profiled-Bytes'] = str(response.content_length or 0)
+        return summary
+    return response
+
+@app.teardown_request
+def stop_request_profile(exc):
+    if 'profile' in g:
+        g.profile.stop()                                 #The view raised: release the profiler
+
+# What each cacheable GET answer depends on besides the data file: the published
+# snapshot, and for per-stop statuses ("Expected in N min") the current minute. Some query
+# arguments add to it: depart_after may be "HH:MM", which means today.
+ETAG_DEPENDS_ON = {
+    'get_all_trains': (),
+    'get_nearby_stations': (),
+    'get_last_update': ('snapshot',),
+    'get_optimized_route': ('snapshot',),
+    'get_train_status': ('snapshot', 'minute'),
+    'get_station_status': ('snapshot', 'minute'),
+}
+ETAG_ARGUMENT_DEPENDS_ON = {
+    'get_optimized_route': {'depart_after': ('date',)},
+}
+
+def response_etag(depends_on):
+    parts = [network.data_version or "unversioned"]
+    if 'snapshot' in depends_on:
+        parts.append(str(pin_snapshot().version))
+    if 'minute' in depends_on:
+        parts.append(datetime.now().strftime('%Y%m%d%H%M'))
+    elif 'date' in depends_on:
+        parts.append(datetime.now().strftime('%Y%m%d'))
+    return "-".join(parts)
+
+# A client that already holds the current answer gets a 304 before any work is done
+@app.before_request
+def answer_not_modified():
+    if request.method != 'GET' or request.endpoint not in ETAG_DEPENDS_ON:
+        return None
+    depends_on = ETAG_DEPENDS_ON[request.endpoint]
+    for argument, extra in ETAG_ARGUMENT_DEPENDS_ON.get(request.endpoint, {}).items():
+        if request.args.get(argument):
+            depends_on += extra
+    g.etag = response_etag(depends_on)
+    if request.if_none_match.contains_weak(g.etag):
+        response = app.response_class(status=304)
+        response.set_etag(g.etag, weak=True)
+        return response
+    return None
+
+# Every response also carries the snapshot version it was served from as a header, its
+# ETag when cacheable, and is compressed when the client accepts it
+@app.after_request
+def add_snapshot_version(response):
+    snapshot = g.get('snapshot', snapshots.current)
+    response.headers.setdefault('X-Snapshot-Version', str(snapshot.version))
+    if response.status_code == 200 and 'etag' in g and 'ETag' not in response.headers:
+        response.set_etag(g.etag, weak=True)
+    return compress_response(response, request.accept_encodings)
+
 if __name__ == '__main__':
-    build_timetables()
-    update_delays_and_graph()
+    parser = argparse.ArgumentParser(description="Real-time train status API")
+    parser.add_argument("--hierarchy", metavar="PATH", help="route with a contraction hierarchy persisted at PATH")
+    args = parser.parse_args()
+    start_live_updates(args.hierarchy)
     app.run()
\ No newline at end of file
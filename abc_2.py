@@ -1,15 +1,81 @@
 import streamlit as st
 import pandas as pd
 import requests
+import json
 import folium
 from streamlit_folium import st_folium
 from itertools import islice
 import seaborn as sns
 import matplotlib.pyplot as plt
+import os
+from convert_to_csv import read_train_data, default_data_path
+from data_stats import SummaryCache
 
 st.set_page_config(page_title="Optimized Route Viewer", layout="wide")
 
 API_URL = "http://localhost:5000"
+DATA_PATH = os.environ.get("TRAIN_DATA_PATH", default_data_path())
+
+# Station lookups, built once per data file version (its mtime) instead of on every rerun
+@st.cache_data
+def station_lookups(path, mtime):
+    station_df = read_train_data(path, columns=["from_station_code", "from_station_name", "latitude", "longitude"])
+    station_df = station_df.dropna(subset=["from_station_code", "from_station_name", "latitude", "longitude"])
+    station_df = station_df.drop_duplicates(subset=["from_station_code"])
+    station_map = station_df.set_index("from_station_code").to_dict("index")
+    station_code_to_name = station_df.set_index("from_station_code")["from_station_name"].to_dict()
+    station_name_to_code = station_df.set_index("from_station_name")["from_station_code"].to_dict()
+    return station_map, station_code_to_name, station_name_to_code
+
+# Statistical Dashboard aggregates from the API's /stats/summary (revalidated at most every
+# minute), or computed here from the data file when the API is not reachable
+@st.cache_resource
+def local_summary(path):
+    return SummaryCache(path)
+
+@st.cache_data(ttl=60)
+def stats_summary(path):
+    try:
+        response = requests.get(f"{API_URL}/stats/summary", timeout=10)
+        if response.status_code == 200:
+            return response.json()
+    except requests.RequestException:
+        pass
+    return local_summary(path).summary()
+
+# The four figures, drawn once per data version
+@st.cache_resource
+def summary_figures(data_version, _summary):
+    top_stations = pd.DataFrame(_summary["top_departure_stations"], columns=["station", "departures"])
+    fig1, ax1 = plt.subplots()
+    sns.barplot(x=top_stations["departures"], y=top_stations["station"], ax=ax1)
+    ax1.set_xlabel("Number of Departures")
+    ax1.set_ylabel("Station Code")
+
+    avg_duration = pd.DataFrame(_summary["avg_duration_by_train_type"], columns=["train_type", "avg_duration_min"])
+    fig2 = None
+    if not avg_duration.empty:
+        fig2, ax2 = plt.subplots()
+        sns.barplot(x=avg_duration["avg_duration_min"], y=avg_duration["train_type"], palette='crest', ax=ax2)
+        ax2.set_xlabel("Average Duration (min)")
+        ax2.set_ylabel("Train Type")
+
+    histogram = _summary["duration_histogram"]
+    fig3, ax3 = plt.subplots()
+    if histogram["counts"]:
+        edges = histogram["bin_edges"]
+        sns.histplot(x=[(low + high) / 2 for low, high in zip(edges, edges[1:])], weights=histogram["counts"], bins=edges, ax=ax3)
+        ax3.plot(histogram["kde_x"], histogram["kde_y"])
+    ax3.set_title("Distribution of Travel Times")
+    ax3.set_xlabel("Total Duration (min)")
+
+    top_degree = pd.DataFrame(_summary["top_connectivity"], columns=["station", "departures", "arrivals"]).set_index("station")
+    top_degree = top_degree.rename(columns={"departures": "Departures", "arrivals": "Arrivals"})
+    fig4, ax4 = plt.subplots()
+    top_degree[['Departures', 'Arrivals']].plot(kind='barh', stacked=True, ax=ax4)
+    ax4.set_title("Top Stations by Connectivity")
+    ax4.set_xlabel("Number of Trains")
+    return fig1, fig2, fig3, fig4
 
 st.sidebar.title("📘 Navigation")
 tabs = st.sidebar.radio("Go to:", ["🚦 Dashboard", "📊 Statistical Dashboard", "🧑‍🤝‍🧑 Team Contributions"])
@@ -17,12 +83,7 @@ tabs = st.sidebar.radio("Go to:", ["🚦 Dashboard", "📊 Statistical Dashboard
 if tabs == "🚦 Dashboard":
     st.markdown("<h2 style='text-align: left;'>🚦 Train Route Intelligence Dashboard</h2>", unsafe_allow_html=True)
 
-    station_df = pd.read_csv("preprocessed_capstone_merged_train_data.csv")
-    station_df = station_df.dropna(subset=["from_station_code", "from_station_name", "latitude", "longitude"])
-    station_df = station_df.drop_duplicates(subset=["from_station_code"])
-    station_map = station_df.set_index("from_station_code").to_dict("index")
-    station_code_to_name = station_df.set_index("from_station_code")["from_station_name"].to_dict()
-    station_name_to_code = station_df.set_index("from_station_name")["from_station_code"].to_dict()
+    station_map, station_code_to_name, station_name_to_code = station_lookups(DATA_PATH, os.path.getmtime(DATA_PATH))
     station_code_list = sorted(station_code_to_name.keys())
     station_name_list = sorted(station_name_to_code.keys())
 
@@ -46,22 +107,51 @@ if tabs == "🚦 Dashboard":
             selected_station_name = station_code_to_name.get(selected_station, "Unknown")
 
         if selected_station:
-            response = requests.get(f"{API_URL}/live/station/{selected_station}")
-            if response.status_code == 200:
-                data = response.json()
-                df = pd.DataFrame(data["live_status"])
-                st.markdown(f"<h5 style='margin-top: 10px;'>📍 Live Train Activity for {selected_station_name}</h5>", unsafe_allow_html=True)
-                if not df.empty:
-                    def highlight(row):
-                        if row['status'] == "Departed": return ['background-color: gray'] * len(row)
-                        elif row['status'] == "At station": return ['background-color: blue'] * len(row)
-                        elif "Expected in" in row['status']: return ['background-color: yellow'] * len(row)
-                        return [''] * len(row)
-                    st.dataframe(df.style.apply(highlight, axis=1), use_container_width=True)
-                else:
-                    st.warning("No active train data found for this station.")
+            live_updates = st.checkbox("Live updates", help="Keep the table open and apply the changes the API pushes after each delay update (API served by `uvicorn asgi_app:app --port 5000`)")
+
+            def show_station_table(placeholder, df):
+                with placeholder.container():
+                    if not df.empty:
+                        def highlight(row):
+                            if row['status'] == "Departed": return ['background-color: gray'] * len(row)
+                            elif row['status'] == "At station": return ['background-color: blue'] * len(row)
+                            elif "Expected in" in row['status']: return ['background-color: yellow'] * len(row)
+                            return [''] * len(row)
+                        st.dataframe(df.style.apply(highlight, axis=1), use_container_width=True)
+                    else:
+                        st.warning("No active train data found for this station.")
+
+            st.markdown(f"<h5 style='margin-top: 10px;'>📍 Live Train Activity for {selected_station_name}</h5>", unsafe_allow_html=True)
+            table = st.empty()
+            if live_updates:
+                # Server-Sent Events: one full "snapshot" of the rows, then "update" events with only the changed rows
+                rows = {}
+                try:
+                    with requests.get(f"{API_URL}/live/stream/station/{selected_station}", stream=True, timeout=(5, None)) as response:
+                        event, data = None, []
+                        for line in response.iter_lines(decode_unicode=True):
+                            if line.startswith("event:"):
+                                event = line[6:].strip()
+                            elif line.startswith("data:"):
+                                data.append(line[5:].strip())
+                            elif not line and data:
+                                message = json.loads("\n".join(data))
+                                if event == "snapshot":
+                                    rows = message["rows"]
+                                elif event == "update":
+                                    rows.update(message["changed"])
+                                    for key in message["removed"]:
+                                        rows.pop(key, None)
+                                show_station_table(table, pd.DataFrame(list(rows.values())))
+                                event, data = None, []
+                except requests.RequestException:
+                    st.error("Live feed unavailable; the API must run as `uvicorn asgi_app:app` for live updates.")
             else:
-                st.error("API failed to return station data.")
+                response = requests.get(f"{API_URL}/live/station/{selected_station}")
+                if response.status_code == 200:
+                    show_station_table(table, pd.DataFrame(response.json()["live_status"]))
+                else:
+                    st.error("API failed to return station data.")
     elif view_option == "🚄 Optimized Path Finder":
         st.markdown("<h4 style='margin-bottom: 5px;'>🔍 Route Search Preferences</h4>", unsafe_allow_html=True)
         search_mode = st.radio("Search by:", ["Station Name", "Station Code"])
@@ -161,44 +251,20 @@ elif tabs == "📊 Statistical Dashboard":
     except:
         st.warning("Could not retrieve last update time from backend.")
 
-    df = pd.read_csv("preprocessed_capstone_merged_train_data.csv")
-    df = df.dropna(subset=['from_station_code', 'to_station_code', 'total_duration_min'])
+    summary = stats_summary(DATA_PATH)
+    fig1, fig2, fig3, fig4 = summary_figures(summary["data_version"], summary)
 
     st.markdown("### 🚉 Top 10 Busiest Departure Stations")
-    top_stations = df['from_station_code'].value_counts().head(10)
-    fig1, ax1 = plt.subplots()
-    sns.barplot(x=top_stations.values, y=top_stations.index, ax=ax1)
-    ax1.set_xlabel("Number of Departures")
-    ax1.set_ylabel("Station Code")
     st.pyplot(fig1)
 
     st.markdown("### ⏱ Average Travel Duration by Train Type")
-    if 'train_type' in df.columns:
-        avg_duration = df.groupby('train_type')['total_duration_min'].mean().sort_values(ascending=False).dropna()
-        fig2, ax2 = plt.subplots()
-        sns.barplot(x=avg_duration.values, y=avg_duration.index, palette='crest', ax=ax2)
-        ax2.set_xlabel("Average Duration (min)")
-        ax2.set_ylabel("Train Type")
+    if fig2 is not None:
         st.pyplot(fig2)
     else:
         st.warning("Train type data not available in dataset.")
 
     st.markdown("### 🔁 Duration Distribution")
-    fig3, ax3 = plt.subplots()
-    sns.histplot(df['total_duration_min'], bins=50, kde=True, ax=ax3)
-    ax3.set_title("Distribution of Travel Times")
-    ax3.set_xlabel("Total Duration (min)")
     st.pyplot(fig3)
 
     st.markdown("### 🚉 In-Degree vs Out-Degree of Stations")
-    station_counts = pd.concat([
-        df['from_station_code'].value_counts(),
-        df['to_station_code'].value_counts()
-    ], axis=1, keys=['Departures', 'Arrivals']).fillna(0).astype(int)
-    station_counts['Total'] = station_counts.sum(axis=1)
-    top_degree = station_counts.sort_values(by='Total', ascending=False).head(10)
-    fig4, ax4 = plt.subplots()
-    top_degree[['Departures', 'Arrivals']].plot(kind='barh', stacked=True, ax=ax4)
-    ax4.set_title("Top Stations by Connectivity")
-    ax4.set_xlabel("Number of Trains")
     st.pyplot(fig4)
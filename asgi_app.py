@@ -0,0 +1,265 @@
+import asyncio
+import io
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from urllib.parse import parse_qs
+
+import abc_1
+
+STREAM_PREFIX = "/live/stream/"
+KEEPALIVE_SEC = 15
+KEEPALIVE_EVENT = b": keepalive\n\n"
+CLIENT_QUEUE_EVENTS = 8
+HIERARCHY_PATH = os.environ.get("ROUTE_HIERARCHY_PATH")                   #Same as abc_1.py --hierarchy
+
+
+# Asyncio serving mode: one ASGI app over the same process state as abc_1 (one snapshot
+# holder, one updater thread). The REST routes are abc_1's Flask views, run on the
+# default thread pool so a slow route never stalls the event loop. On top of them,
+# /live/stream/station/<code>[?window=N] and /live/stream/train/<train_id> are
+# Server-Sent Events feeds: a "snapshot" event with every row, then after each delay
+# tick an "update" event with only the rows that changed. Run with e.g.
+#   uvicorn asgi_app:app --port 5000
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif scope["type"] == "http":
+        if scope["path"].startswith(STREAM_PREFIX) and scope["method"] == "GET":
+            await serve_stream(scope, receive, send)
+        else:
+            await serve_wsgi(scope, receive, send)
+
+
+feed = None
+
+
+async def lifespan(receive, send):
+    global feed
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            loop = asyncio.get_running_loop()
+            feed = LiveFeed(loop)
+            abc_1.snapshots.subscribe(feed.published)
+            await loop.run_in_executor(None, abc_1.start_live_updates, HIERARCHY_PATH)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+# ---- REST routes: the Flask app behind a minimal ASGI -> WSGI bridge ----
+
+def wsgi_environ(scope, body):
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else "HTTP_" + name
+        value = value.decode("latin-1")
+        environ[key] = environ[key] + "," + value if key in environ else value
+    return environ
+
+
+def call_wsgi(environ):
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+    result = abc_1.app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started["status"], started["headers"], body
+
+
+async def serve_wsgi(scope, receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    status, headers, body = await asyncio.get_running_loop().run_in_executor(None, call_wsgi, wsgi_environ(scope, body))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+# ---- Server-push feed ----
+
+def sse_event(name, version, data):
+    return f"event: {name}\nid: {version}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+# Rows of one stream (a station with an optional window, or a train), keyed so a client
+# can merge updates: station rows by train number and service date (number@date, then
+# number@date#2, ... for more calls of that run), train rows by stop position
+class Topic:
+    def __init__(self, build):
+        self.build = build
+        self.rows = None
+        self.version = None
+        self.clients = set()
+        self.loading = None
+
+    def full_event(self):
+        return sse_event("snapshot", self.version, {"snapshot_version": self.version, "rows": self.rows})
+
+    # Every client of the topic gets the same encoded bytes. A client whose queue is full
+    # (not reading fast enough) has its backlog replaced by one full snapshot instead.
+    def broadcast(self, event):
+        full = None
+        for queue in self.clients:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                full = full or self.full_event()
+                queue.put_nowait(full)
+
+
+def station_rows(station_code, window):
+    def build(snapshot):
+        keyed, calls = {}, Counter()
+        for row in abc_1.station_status_rows(snapshot, station_code, datetime.now(), window):
+            key = f'{row["train_number"]}@{row["service_date"]}'
+            calls[key] += 1
+            keyed[key if calls[key] == 1 else f"{key}#{calls[key]}"] = row
+        return keyed
+    return build
+
+
+def train_rows(train_id):
+    def build(snapshot):
+        return {str(stop): row for stop, row in enumerate(abc_1.train_status_rows(snapshot, train_id, datetime.now()))}
+    return build
+
+
+def changed_rows(old, new):
+    changed = {key: row for key, row in new.items() if old.get(key) != row}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+# Topics live only while they have clients. Each published snapshot rebuilds every live
+# topic once (on the thread pool), however many clients share it, and sends each client
+# only the difference from the rows it already has.
+class LiveFeed:
+    def __init__(self, loop):
+        self.loop = loop
+        self.topics = {}
+        self.refreshing = asyncio.Lock()
+
+    # Called on the updater thread by SnapshotHolder.publish
+    def published(self, snapshot):
+        asyncio.run_coroutine_threadsafe(self.refresh(snapshot), self.loop)
+
+    async def refresh(self, snapshot):
+        async with self.refreshing:
+            topics = [topic for topic in self.topics.values() if topic.rows is not None and topic.version < snapshot.version]
+            rebuilt = await self.loop.run_in_executor(None, lambda: [topic.build(snapshot) for topic in topics])
+            for topic, rows in zip(topics, rebuilt):
+                changed, removed = changed_rows(topic.rows, rows)
+                topic.rows, topic.version = rows, snapshot.version
+                if changed or removed:
+                    topic.broadcast(sse_event("update", snapshot.version, {"snapshot_version": snapshot.version,
+                                                                           "changed": changed, "removed": removed}))
+
+    async def join(self, key, build):
+        topic = self.topics.get(key)
+        if topic is None:
+            topic = self.topics[key] = Topic(build)
+            topic.loading = self.loop.create_task(self.load(key, topic))
+        if topic.rows is None:
+            await asyncio.shield(topic.loading)
+        queue = asyncio.Queue(CLIENT_QUEUE_EVENTS)
+        queue.put_nowait(topic.full_event())
+        topic.clients.add(queue)
+        return topic, queue
+
+    async def load(self, key, topic):
+        snapshot = abc_1.snapshots.current
+        try:
+            topic.rows = await self.loop.run_in_executor(None, topic.build, snapshot)
+        except Exception:
+            del self.topics[key]
+            raise
+        topic.version = snapshot.version
+
+    def leave(self, key, topic, queue):
+        topic.clients.discard(queue)
+        if not topic.clients and self.topics.get(key) is topic:
+            del self.topics[key]
+
+
+def stream_topic(path, query):
+    kind, _, key = path[len(STREAM_PREFIX):].partition("/")
+    if kind == "station" and key:
+        window = query.get("window", [None])[0]
+        window = int(window) if window and window.lstrip("-").isdigit() else None
+        return ("station", key, window), station_rows(key, window)
+    if kind == "train" and key in abc_1.train_timetables:
+        return ("train", key), train_rows(key)
+    return None, None
+
+
+async def send_json(send, status, data):
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": json.dumps(data).encode()})
+
+
+async def serve_stream(scope, receive, send):
+    if feed is None or abc_1.train_timetables is None:
+        await send_json(send, 503, {"error": "Live feed not started"})
+        return
+    key, build = stream_topic(scope["path"], parse_qs(scope["query_string"].decode("latin-1")))
+    if key is None:
+        await send_json(send, 404, {"error": "Unknown stream"})
+        return
+
+    topic, queue = await feed.join(key, build)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]})
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, disconnected}, timeout=KEEPALIVE_SEC, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()                               #Queue.get leaves the item queued when cancelled
+            if disconnected.done():
+                break
+            event = getter.result() if getter.done() else KEEPALIVE_EVENT
+            await send({"type": "http.response.body", "body": event, "more_body": True})
+    finally:
+        disconnected.cancel()
+        feed.leave(key, topic, queue)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
@@ -0,0 +1,170 @@
+import atexit
+import heapq
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context, shared_memory
+
+import numpy as np
+
+INF = float('inf')
+INLINE_ORIGINS = 8                 #Fewer distinct origins than this are searched in-process
+CHUNKS_PER_WORKER = 4
+
+
+# Cost from source to each target: Dijkstra over the CSR arrays (lists or memoryviews),
+# stopping once every target is settled. Same costs as routing.shortest_path.
+def distances_to(adjacency, station_count, source, targets):
+    indptr, indices, costs = adjacency
+    wanted = set(targets)
+    dist = [INF] * station_count
+    settled = [False] * station_count
+    dist[source] = 0
+    queue = [(0, source)]
+    while queue and wanted:
+        current, station = heapq.heappop(queue)
+        if settled[station]:
+            continue
+        settled[station] = True
+        wanted.discard(station)
+        for position in range(indptr[station], indptr[station + 1]):
+            neighbor = indices[position]
+            total_cost = current + costs[position]
+            if total_cost < dist[neighbor]:
+                dist[neighbor] = total_cost
+                heapq.heappush(queue, (total_cost, neighbor))
+    return [dist[target] for target in targets]
+
+
+def distance_rows(adjacency, station_count, sources, targets):
+    return np.array([distances_to(adjacency, station_count, source, targets) for source in sources], dtype=np.float64).reshape(len(sources), len(targets))
+
+
+# The route graph's CSR arrays copied once into a shared-memory block. Pool workers map
+# the block and search it in place, so a batch ships only station ids to the workers,
+# never the graph itself.
+class SharedGraph:
+    def __init__(self, graph):
+        arrays = [np.ascontiguousarray(graph.indptr, dtype=np.int64), np.ascontiguousarray(graph.indices, dtype=np.int64),
+                  np.ascontiguousarray(graph.costs, dtype=np.float64)]
+        self.block = shared_memory.SharedMemory(create=True, size=max(sum(array.nbytes for array in arrays), 1))
+        layout, offset = [], 0
+        for array in arrays:
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=self.block.buf, offset=offset)
+            view[:] = array
+            del view
+            layout.append((array.dtype.char, offset, array.nbytes))
+            offset += array.nbytes
+        self.spec = (self.block.name, len(graph), tuple(layout))
+        self.users = 0
+        self.retired = False
+
+    def close(self):
+        self.block.close()
+        self.block.unlink()
+
+
+# Worker side: the block of the graph last searched stays mapped between tasks
+_mapped = None
+
+
+def _shared_distance_rows(spec, sources, targets):
+    global _mapped
+    name, station_count, layout = spec
+    if _mapped is None or _mapped[0] != name:
+        if _mapped is not None:
+            _, block, views = _mapped
+            _mapped = None
+            for view in views:
+                view.release()
+            block.close()
+        block = shared_memory.SharedMemory(name=name)
+        views = tuple(block.buf[offset:offset + size].cast(kind) for kind, offset, size in layout)
+        _mapped = (name, block, views)
+    return distance_rows(_mapped[2], station_count, sources, targets)
+
+
+# Pool workers never start as a fork of the server: it runs threads (updater, request
+# handlers), and a forked child would inherit any lock one of them held at that moment.
+# A fork server (this module and numpy preloaded) or a fresh interpreter starts them
+# instead; they reach the graph only through SharedGraph.
+def _pool_context():
+    if "forkserver" in get_all_start_methods():
+        context = get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return get_context("spawn")
+
+
+# Many-to-many travel times over a route graph: one single-source search per distinct
+# origin, spread in chunks over a process pool that shares the graph through a
+# SharedGraph. The pool is started on first use and kept; each new graph (snapshot)
+# gets a fresh block, and a replaced block is freed once no batch still reads it.
+class BatchRouter:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._shared = None
+        self._graph = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _acquire(self, graph):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=_pool_context())
+            if self._graph is not graph:
+                if self._shared is not None:
+                    self._retire(self._shared)
+                self._graph, self._shared = graph, SharedGraph(graph)
+            self._shared.users += 1
+            return self._shared
+
+    def _release(self, shared):
+        with self._lock:
+            shared.users -= 1
+            if shared.retired and shared.users == 0:
+                shared.close()
+
+    def _retire(self, shared):
+        shared.retired = True
+        if shared.users == 0:
+            shared.close()
+
+    # Matrix of minutes (inf where unreachable or the code is unknown), one row per
+    # source and one column per destination, in the order given
+    def travel_time_matrix(self, graph, sources, destinations):
+        source_ids = [graph.station_id(code) for code in sources]
+        target_ids = [graph.station_id(code) for code in destinations]
+        origins = sorted({i for i in source_ids if i is not None})
+        targets = sorted({i for i in target_ids if i is not None})
+        if not origins or not targets:
+            return np.full((len(sources), len(destinations)), INF)
+
+        if self.workers == 1 or len(origins) < INLINE_ORIGINS:
+            rows = distance_rows(graph.adjacency, len(graph), origins, targets)
+        else:
+            shared = self._acquire(graph)
+            try:
+                chunk = math.ceil(len(origins) / (self.workers * CHUNKS_PER_WORKER))
+                futures = [self._executor.submit(_shared_distance_rows, shared.spec, origins[i:i + chunk], targets)
+                           for i in range(0, len(origins), chunk)]
+                rows = np.vstack([future.result() for future in futures])
+            finally:
+                self._release(shared)
+
+        row_of = {origin: row for row, origin in enumerate(origins)}
+        column_of = {target: column for column, target in enumerate(targets)}
+        padded = np.full((len(origins) + 1, len(targets) + 1), INF)            #Last row/column: unknown codes
+        padded[:-1, :-1] = rows
+        return padded[np.ix_([row_of.get(i, -1) for i in source_ids], [column_of.get(i, -1) for i in target_ids])]
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if self._shared is not None:
+                self._retire(self._shared)
+                self._shared = self._graph = None
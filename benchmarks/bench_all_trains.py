@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+
+
+def timed(client, url, headers=None, repeat=3):
+    best, response = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers or {})
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return response, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/live/all_trains: full stdlib payload vs projected, paginated, compressed and revalidated responses")
+    parser.add_argument("--data", default=default_data_path())
+    args = parser.parse_args()
+
+    os.environ["TRAIN_DATA_PATH"] = args.data
+    import abc_1
+
+    abc_1.build_timetables()
+    abc_1.update_delays_and_graph(schedule_next=False)
+    client = abc_1.app.test_client()
+    timetable = abc_1.train_timetables
+
+    # The original handler: a dict per train, stdlib json
+    start = time.perf_counter()
+    legacy = json.dumps([{"train_number": train_id, "train_name": timetable.train_name(train_id), "route": timetable.route(train_id)}
+                         for train_id in timetable], sort_keys=True, separators=(",", ":"))
+    legacy_s = time.perf_counter() - start
+    print(f"trains: {len(timetable)}")
+    print(f"{'legacy, stdlib json':<34} {len(legacy) / 1024:10.1f} KiB  {legacy_s * 1000:8.1f} ms")
+
+    full, _ = timed(client, "/live/all_trains")
+    cases = [
+        ("full", "/live/all_trains", {}),
+        ("full, gzip", "/live/all_trains", {"Accept-Encoding": "gzip"}),
+        ("full, br", "/live/all_trains", {"Accept-Encoding": "br, gzip"}),
+        ("fields=number,name, br", "/live/all_trains?fields=number,name", {"Accept-Encoding": "br, gzip"}),
+        ("limit=100 page, br", "/live/all_trains?limit=100", {"Accept-Encoding": "br, gzip"}),
+        ("revalidate (If-None-Match)", "/live/all_trains", {"If-None-Match": full.headers["ETag"]}),
+    ]
+    for name, url, headers in cases:
+        response, elapsed = timed(client, url, headers)
+        print(f"{name:<34} {len(response.data) / 1024:10.1f} KiB  {elapsed * 1000:8.1f} ms  status {response.status_code}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, os.pardir)
+sys.path.insert(0, REPO_DIR)
+from synthetic_network import default_station_count, generate
+
+DEFAULT_SCALES = "100,1000,10000"
+WARMUP_REQUESTS = 5
+ALL_TRAINS_REQUESTS = 20                                                #Full-list responses are large; fewer of them
+REGRESSION_METRICS = [
+    ("cold.network_load_s", "lower"), ("warm.network_load_s", "lower"), ("warm.build_timetables_s", "lower"),
+    ("warm.refresh.incremental_mean_s", "lower"), ("warm.memory.rss_mb", "lower"),
+    ("warm.endpoints.train.p95_ms", "lower"), ("warm.endpoints.station.p95_ms", "lower"),
+    ("warm.endpoints.route.p95_ms", "lower"), ("warm.endpoints.all_trains.p95_ms", "lower"),
+    ("warm.endpoints.train.throughput_rps", "higher"), ("warm.endpoints.station.throughput_rps", "higher"),
+    ("warm.endpoints.route.throughput_rps", "higher"), ("warm.endpoints.all_trains.throughput_rps", "higher"),
+]
+
+
+# Current and peak resident memory in MiB (/proc on Linux, peak only elsewhere)
+def memory_mb():
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss_mb": int(fields["VmRSS"].split()[0]) / 1024, "peak_rss_mb": int(fields["VmHWM"].split()[0]) / 1024}
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        return {"rss_mb": None, "peak_rss_mb": peak}
+
+
+def timed(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+
+def latency_summary(client, urls):
+    for url in urls[:WARMUP_REQUESTS]:
+        client.get(url)
+    latencies, statuses, sizes = [], Counter(), []
+    start = time.perf_counter()
+    for url in urls:
+        request_start = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - request_start)
+        statuses[str(response.status_code)] += 1
+        sizes.append(len(response.data))
+    total = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": len(urls),
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "throughput_rps": len(urls) / total,
+        "mean_bytes": float(np.mean(sizes)),
+        "statuses": dict(statuses),
+    }
+
+
+# Origin-destination pairs with a route between them (random pairs mostly have none)
+def reachable_pairs(graph, count, rng):
+    from routing import INF, shortest_path_tree
+
+    sources = np.flatnonzero(np.diff(graph.indptr)).tolist()
+    pairs = []
+    while sources and len(pairs) < count:
+        source = rng.choice(sources)
+        dist, _ = shortest_path_tree(graph, source)
+        reachable = [station for station, cost in enumerate(dist) if 0 < cost < INF]
+        for destination in rng.sample(reachable, min(len(reachable), max(1, count // 20))):
+            pairs.append((graph.station_codes[source], graph.station_codes[destination]))
+    rng.shuffle(pairs)
+    return pairs[:count]
+
+
+# Runs in a fresh interpreter per data file (abc_1 keeps its network in module globals)
+def worker(args):
+    os.environ["TRAIN_DATA_PATH"] = args.data
+    os.environ["DELAY_SIMULATION_SEED"] = str(args.seed)
+    result = {"memory_before": memory_mb()}
+    import abc_1
+    _, result["network_load_s"] = timed(abc_1.load_network_data)
+    _, result["build_timetables_s"] = timed(abc_1.build_timetables)
+    _, result["stats_summary_s"] = timed(abc_1.stats_summary.summary)
+    result["memory"] = memory_mb()
+    if args.startup_only:
+        return result
+
+    _, first = timed(lambda: abc_1.update_delays_and_graph(schedule_next=False))
+    incremental = [timed(lambda: abc_1.update_delays_and_graph(schedule_next=False))[1] for _ in range(args.refreshes)]
+    phases = abc_1.REFRESH_SECONDS.totals()
+    result["refresh"] = {
+        "first_s": first,
+        "incremental_mean_s": float(np.mean(incremental)),
+        "incremental_max_s": float(np.max(incremental)),
+        "cpu_mean_s": sum(total for _, total in abc_1.REFRESH_CPU_SECONDS.totals().values()) / (args.refreshes + 1),
+        "phase_mean_s": {phase: total / count for (phase,), (count, total) in sorted(phases.items())},
+    }
+    result["memory_after_refresh"] = memory_mb()
+
+    rng = random.Random(args.seed)
+    timetable, graph = abc_1.train_timetables, abc_1.snapshots.current.graph
+    result["network"] = {"trains": len(timetable), "stops": len(timetable.arrival), "stations": len(graph), "edges": len(graph.indices)}
+    trains = timetable.train_ids.tolist()
+    stations = graph.station_codes.tolist()
+    client = abc_1.app.test_client()
+    result["endpoints"] = {
+        "train": latency_summary(client, [f"/live/train/{rng.choice(trains)}" for _ in range(args.requests)]),
+        "station": latency_summary(client, [f"/live/station/{rng.choice(stations)}" for _ in range(args.requests)]),
+        "route": latency_summary(client, [f"/live/route?source={source}&destination={destination}"
+                                          for source, destination in reachable_pairs(graph, args.requests, rng)]),
+        "all_trains": latency_summary(client, ["/live/all_trains"] * min(args.requests, ALL_TRAINS_REQUESTS)),
+    }
+    result["route_cache"] = abc_1.route_cache.stats()
+    result["memory_after_requests"] = memory_mb()
+    return result
+
+
+def run_worker(data, seed, refreshes, requests, startup_only):
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--data", data, "--seed", str(seed),
+               "--refreshes", str(refreshes), "--requests", str(requests)] + (["--startup-only"] if startup_only else [])
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=REPO_DIR)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark worker failed on {data}:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    import pandas as pd
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=REPO_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "git_commit": commit,
+    }
+
+
+# Generated once per (trains, stations, seed) in the work directory and reused after
+def scale_data(workdir, trains, stations, seed):
+    path = os.path.join(workdir, f"synthetic-{trains}t-{stations}s-seed{seed}.csv")
+    generate_s = None
+    if not os.path.exists(path):
+        _, generate_s = timed(lambda: generate(path + ".partial", trains, stations, seed))
+        os.replace(path + ".partial", path)
+    return path, generate_s
+
+
+def lookup(result, dotted):
+    for part in dotted.split("."):
+        if not isinstance(result, dict) or part not in result:
+            return None
+        result = result[part]
+    return result
+
+
+# Prints the headline metrics against a previous results file; True if any got worse by
+# more than tolerance
+def compare(results, baseline, tolerance):
+    previous = {scale["trains"]: scale for scale in baseline["scales"]}
+    regressed = False
+    for scale in results["scales"]:
+        old = previous.get(scale["trains"])
+        if old is None:
+            continue
+        print(f"\n{scale['trains']} trains vs baseline {baseline.get('environment', {}).get('git_commit')}:")
+        for metric, better in REGRESSION_METRICS:
+            new_value, old_value = lookup(scale, metric), lookup(old, metric)
+            if not new_value or not old_value:
+                continue
+            change = new_value / old_value - 1
+            worse = change > tolerance if better == "lower" else change < -tolerance
+            regressed |= worse
+            print(f"  {metric:<42} {old_value:12.3f} -> {new_value:12.3f}  {change:+7.1%}{'  REGRESSION' if worse else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API benchmark suite over generated networks: startup, refresh, memory and "
+                                                 "/live/train, /live/station, /live/route, /live/all_trains latency per scale")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated train counts (100 to 100000)")
+    parser.add_argument("--stations", type=int, help="station count for every scale (default: scaled with the trains)")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--refreshes", type=int, default=5, help="incremental delay refreshes to time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "train-api-bench"), help="where generated files are kept")
+    parser.add_argument("--output", default="bench_api_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    parser.add_argument("--startup-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args)))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {
+        "benchmark": "api",
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "parameters": {"requests": args.requests, "refreshes": args.refreshes, "seed": args.seed},
+        "scales": [],
+    }
+    for trains in [int(scale) for scale in args.scales.split(",")]:
+        stations = args.stations or default_station_count(trains)
+        data, generate_s = scale_data(args.workdir, trains, stations, args.seed)
+        artifact = data + ".network"
+        if os.path.exists(artifact):
+            os.remove(artifact)                                       #Cold start compiles the network artifact again
+        cold = run_worker(data, args.seed, args.refreshes, args.requests, startup_only=True)
+        warm = run_worker(data, args.seed, args.refreshes, args.requests, startup_only=False)
+        scale = {"trains": trains, "stations": stations, "data_bytes": os.path.getsize(data), "generate_s": generate_s,
+                 "cold": cold, "warm": warm}
+        results["scales"].append(scale)
+        endpoints = "  ".join(f"{name} p50 {e['p50_ms']:.2f} ms / {e['throughput_rps']:.0f} rps" for name, e in warm["endpoints"].items())
+        print(f"{trains:>7} trains {stations:>6} stations: load cold {cold['network_load_s']:.2f} s, warm {warm['network_load_s']:.2f} s; "
+              f"timetables {warm['build_timetables_s']:.3f} s; refresh {warm['refresh']['incremental_mean_s'] * 1000:.0f} ms; "
+              f"rss {warm['memory_after_requests']['rss_mb'] or 0:.0f} MiB\n        {endpoints}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare(results, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
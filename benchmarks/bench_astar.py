@@ -0,0 +1,59 @@
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+from geo_index import haversine_km
+from routing import shortest_path, shortest_path_a_star
+
+
+def run(searches):
+    settled, results = [], []
+    start = time.perf_counter()
+    for search in searches:
+        counts = Counter()
+        results.append(search(counts))
+        settled.append(counts["settled"])
+    return results, settled, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/live/route: stations settled and time, plain Dijkstra vs A* with the great-circle bound")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["TRAIN_DATA_PATH"] = args.data
+    import abc_1
+
+    abc_1.build_timetables()
+    abc_1.update_delays_and_graph(schedule_next=False)
+    graph = abc_1.snapshots.current.graph
+    bound = abc_1.travel_bound
+    rng = random.Random(args.seed)
+    pairs = [tuple(rng.sample(range(len(graph)), 2)) for _ in range(args.queries)]
+    span = haversine_km(bound.latitude[[s for s, _ in pairs]], bound.longitude[[s for s, _ in pairs]],
+                        bound.latitude[[t for _, t in pairs]], bound.longitude[[t for _, t in pairs]])
+
+    plain, plain_settled, plain_s = run([lambda counts, s=s, t=t: shortest_path(graph, s, t, counts) for s, t in pairs])
+    guided, guided_settled, guided_s = run([lambda counts, s=s, t=t: shortest_path_a_star(graph, s, t, bound.to(t), counts) for s, t in pairs])
+
+    plain_settled, guided_settled = np.array(plain_settled), np.array(guided_settled)
+    far = span >= np.percentile(span, 75)
+    print(f"stations: {len(graph)}  queries: {len(pairs)}  bound speed: "
+          + (f"{60 / bound.minutes_per_km:.0f} km/h" if bound.minutes_per_km else "none (bound disabled)"))
+    print(f"dijkstra: {plain_s * 1000:9.1f} ms  settled mean {plain_settled.mean():8.1f}  longest quarter {plain_settled[far].mean():8.1f}")
+    print(f"a*:       {guided_s * 1000:9.1f} ms  settled mean {guided_settled.mean():8.1f}  longest quarter {guided_settled[far].mean():8.1f}")
+    print(f"settled ratio {guided_settled.sum() / plain_settled.sum():.2f}  speedup {plain_s / guided_s:.2f}x")
+    print(f"costs differing: {sum(a[0] != b[0] for a, b in zip(plain, guided))}  paths differing: {sum(a != b for a, b in zip(plain, guided))}")
+
+
+if __name__ == '__main__':
+    main()
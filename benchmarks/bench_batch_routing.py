@@ -0,0 +1,60 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from batch_routing import BatchRouter
+from convert_to_csv import default_data_path
+from routing import find_fastest_route
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OD travel-time matrix: per-pair find_fastest_route vs BatchRouter at growing worker counts")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--sources", type=int, default=100)
+    parser.add_argument("--destinations", type=int, default=100)
+    parser.add_argument("--pair-sample", type=int, default=500, help="pairs timed one by one to estimate the per-pair cost")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["TRAIN_DATA_PATH"] = args.data
+    import abc_1
+
+    abc_1.build_timetables()
+    abc_1.update_delays_and_graph(schedule_next=False)
+    graph = abc_1.snapshots.current.graph
+    rng = random.Random(args.seed)
+    codes = graph.station_codes.tolist()
+    sources, destinations = rng.sample(codes, args.sources), rng.sample(codes, args.destinations)
+
+    sample = [(rng.randrange(len(sources)), rng.randrange(len(destinations))) for _ in range(args.pair_sample)]
+    start = time.perf_counter()
+    expected = [find_fastest_route(graph, sources[i], destinations[j])[0] for i, j in sample]
+    per_pair_s = (time.perf_counter() - start) / len(sample)
+    cells = len(sources) * len(destinations)
+    print(f"stations: {len(graph)}  matrix: {len(sources)} x {len(destinations)}  cpus: {os.cpu_count()}")
+    print(f"pair by pair (estimated): {per_pair_s * cells:8.2f} s")
+
+    baseline = None
+    workers = 1
+    while True:
+        with_workers = min(workers, os.cpu_count() or 1)
+        router = BatchRouter(with_workers)
+        router.travel_time_matrix(graph, sources[:with_workers * 8], destinations)     #Starts the pool
+        start = time.perf_counter()
+        matrix = router.travel_time_matrix(graph, sources, destinations)
+        elapsed = time.perf_counter() - start
+        router.close()
+        baseline = baseline or elapsed
+        mismatches = sum(matrix[i, j] != cost for (i, j), cost in zip(sample, expected))
+        print(f"batch, {with_workers:2d} workers:      {elapsed:8.2f} s  scaling {baseline / elapsed:5.2f}x  "
+              f"mismatches {mismatches}/{len(sample)}")
+        if with_workers == (os.cpu_count() or 1):
+            break
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+from routing import find_fastest_route
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000 if samples else float('nan')
+
+
+def report(name, samples):
+    print(f"{name:>10}: mean {np.mean(samples) * 1000:8.3f} ms  p50 {percentile_ms(samples, 50):8.3f} ms  "
+          f"p90 {percentile_ms(samples, 90):8.3f} ms  p99 {percentile_ms(samples, 99):8.3f} ms")
+
+
+def timed(route, pairs):
+    results, times = [], []
+    for source, destination in pairs:
+        start = time.perf_counter()
+        results.append(route(source, destination))
+        times.append(time.perf_counter() - start)
+    return results, times
+
+
+# Sum of the cheapest edge costs along a station-code path, to check a returned route really costs what it claims
+def path_cost(graph, path):
+    cost = 0
+    for station, neighbor in zip(path, path[1:]):
+        u, v = graph.station_id(station), graph.station_id(neighbor)
+        positions = range(graph.indptr[u], graph.indptr[u + 1])
+        cost += min(graph.costs[p] for p in positions if graph.indices[p] == v)
+    return cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contraction hierarchy preprocessing and query latency vs plain Dijkstra")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--hierarchy", help="where to persist the hierarchy (default: a temporary file)")
+    args = parser.parse_args()
+
+    os.environ["TRAIN_DATA_PATH"] = args.data
+    import abc_1
+    from contraction import contract, load_or_contract
+
+    abc_1.build_timetables()
+    abc_1.update_delays_and_graph(schedule_next=False)
+    graph = abc_1.snapshots.current.graph
+    path = args.hierarchy or os.path.join(tempfile.mkdtemp(), "hierarchy.npz")
+
+    start = time.perf_counter()
+    hierarchy = contract(graph)
+    contract_s = time.perf_counter() - start
+    hierarchy.save(path)
+    start = time.perf_counter()
+    hierarchy = load_or_contract(graph, path)
+    load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    customized = hierarchy.customize(graph)
+    customize_s = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    stations = graph.station_codes.tolist()
+    pairs = [tuple(rng.sample(stations, 2)) for _ in range(args.queries)]
+    dijkstra_results, dijkstra_times = timed(lambda s, d: find_fastest_route(graph, s, d), pairs)
+    hierarchy_results, hierarchy_times = timed(customized.find_fastest_route, pairs)
+
+    # Costs must match exactly; paths may differ only between equal-cost ties
+    cost_mismatches = sum(a[0] != b[0] for a, b in zip(dijkstra_results, hierarchy_results))
+    bad_paths = sum(bool(b[1]) and (b[1][0] != s or b[1][-1] != d or path_cost(graph, b[1]) != b[0])
+                    for (s, d), b in zip(pairs, hierarchy_results))
+    tied_paths = sum(a[0] == b[0] and a[1] != b[1] for a, b in zip(dijkstra_results, hierarchy_results))
+
+    print(f"stations: {len(graph)}  edges: {len(graph.indices)}  shortcut arcs: {len(hierarchy.up_heads)}  "
+          f"triangles: {len(hierarchy.tri_top)}  file: {os.path.getsize(path) / 1024:.1f} KiB")
+    print(f"contract {contract_s:.3f} s  load {load_s * 1000:.1f} ms  customize {customize_s * 1000:.1f} ms")
+    print(f"queries: {len(pairs)}  cost mismatches: {cost_mismatches}  invalid paths: {bad_paths}  equal-cost tie paths: {tied_paths}")
+    report("dijkstra", dijkstra_times)
+    report("hierarchy", hierarchy_times)
+    print(f"speedup: {np.mean(dijkstra_times) / np.mean(hierarchy_times):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
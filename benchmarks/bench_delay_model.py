@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+from delay_model import DelayModel, train, train_attributes
+from network_artifact import load_or_compile
+
+
+def per_tick(run, ticks):
+    times = []
+    for now_min in ticks:
+        start = time.perf_counter()
+        result = run(now_min)
+        times.append(time.perf_counter() - start)
+    return result, np.array(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delay model inference per refresh tick over the whole fleet: feature build, "
+                                                 "piecewise-linear predict and the layer-by-layer forward pass")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--model", help="exported model to load (default: train a small one first)")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timetable = load_or_compile(args.data, args.data + ".network").timetable
+    start = time.perf_counter()
+    attributes = train_attributes(args.data, timetable)
+    attributes_s = time.perf_counter() - start
+    if args.model:
+        model = DelayModel.load(args.model)
+    else:
+        start = time.perf_counter()
+        model = train(timetable, attributes, runs=2, samples_per_run=2, epochs=args.epochs, seed=args.seed)
+        print(f"trained in {time.perf_counter() - start:.1f} s")
+    features = model.features(timetable, attributes)
+
+    rng = np.random.default_rng(args.seed)
+    ticks = rng.uniform(features.start.min(), features.end.max(), args.ticks)
+    _, build_ms = per_tick(features.at, ticks)
+    matrices = {now_min: features.at(now_min) for now_min in ticks}
+    fast, fast_ms = per_tick(lambda now_min: model.predict(matrices[now_min]), ticks)
+    layers, layers_ms = per_tick(lambda now_min: model.predict_layers(matrices[now_min]), ticks)
+
+    print(f"trains: {len(features)}  features: {len(features.names)}  attributes read in {attributes_s:.2f} s")
+    for name, ms in (("features", build_ms), ("predict", fast_ms), ("layers", layers_ms)):
+        print(f"{name:<9} mean {ms.mean():8.2f} ms  p95 {np.percentile(ms, 95):8.2f} ms  {len(features) / ms.mean() * 1000:12.0f} trains/s")
+    print(f"tick total (features + predict) {build_ms.mean() + fast_ms.mean():.2f} ms; "
+          f"predict vs layers: {layers_ms.mean() / fast_ms.mean():.1f}x faster, max difference {np.abs(fast - layers).max():.4f} min")
+
+
+if __name__ == '__main__':
+    main()
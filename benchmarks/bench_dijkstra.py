@@ -0,0 +1,110 @@
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import networkx as nx                              #Only for the legacy baseline
+except ImportError:
+    nx = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+from routing import find_fastest_route
+
+
+# The original abc_1.find_fastest_route: path lists copied on every pop and pushed into the heap
+def legacy_find_fastest_route(graph, delays, start, end):
+    visited = set()
+    queue = [(0, start, [])]
+    while queue:
+        current_time, station, path = heapq.heappop(queue)
+        if station in visited:
+            continue
+        visited.add(station)
+        path = path + [station]
+        if station == end:
+            return current_time, path
+        for neighbor in graph.neighbors(station):
+            edge_weight = graph[station][neighbor]['weight']
+            delay = delays.get(station, 0)
+            total_cost = current_time + edge_weight + delay
+            heapq.heappush(queue, (total_cost, neighbor, path))
+    return float('inf'), []
+
+
+# networkx graph and station delay dict equivalent to a RouteGraph, as the old updater built them
+def legacy_graph(route_graph):
+    graph = nx.DiGraph()
+    codes = route_graph.station_codes
+    for station in range(len(route_graph)):
+        for position in range(route_graph.indptr[station], route_graph.indptr[station + 1]):
+            edge = route_graph.edge_ids[position]
+            graph.add_edge(codes[station], codes[route_graph.indices[position]], weight=float(route_graph.weights[edge]))
+    delays = {codes[station]: float(delay) for station, delay in enumerate(route_graph.station_delay) if delay}
+    return graph, delays
+
+
+# Latency is timed untraced; peak allocation comes from a second, traced pass
+def measure(route, pairs):
+    times = []
+    for source, destination in pairs:
+        start = time.perf_counter()
+        route(source, destination)
+        times.append(time.perf_counter() - start)
+    peak = 0
+    for source, destination in pairs:
+        tracemalloc.start()
+        route(source, destination)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return times, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Legacy path-copying Dijkstra vs the CSR parent-pointer core")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["TRAIN_DATA_PATH"] = args.data
+    import abc_1
+
+    abc_1.build_timetables()
+    abc_1.update_delays_and_graph(schedule_next=False)
+    route_graph = abc_1.snapshots.current.graph
+
+    rng = random.Random(args.seed)
+    stations = route_graph.station_codes.tolist()
+    pairs = [tuple(rng.sample(stations, 2)) for _ in range(args.queries)]
+
+    results = {"csr": measure(lambda s, d: find_fastest_route(route_graph, s, d), pairs)}
+    mismatches = tied_paths = "n/a"
+    if nx is None:
+        print("networkx is not installed: legacy baseline skipped")
+    else:
+        # Costs must match; paths may differ between equal-cost ties (the legacy search
+        # takes the lexicographically smallest path, the CSR core the smallest parent id)
+        graph, delays = legacy_graph(route_graph)
+        compared = [(legacy_find_fastest_route(graph, delays, s, d), find_fastest_route(route_graph, s, d)) for s, d in pairs]
+        mismatches = sum(a[0] != b[0] for a, b in compared)
+        tied_paths = sum(a[0] == b[0] and a[1] != b[1] for a, b in compared)
+        results["legacy"] = measure(lambda s, d: legacy_find_fastest_route(graph, delays, s, d), pairs)
+
+    print(f"stations: {len(route_graph)}  edges: {len(route_graph.indices)}  queries: {len(pairs)}  "
+          f"cost mismatches: {mismatches}  equal-cost tie paths: {tied_paths}")
+    for name, (times, peak) in results.items():
+        print(f"{name:>7}: mean {np.mean(times) * 1000:8.3f} ms  p99 {np.percentile(times, 99) * 1000:8.3f} ms  "
+              f"peak alloc {peak / 1024:9.1f} KiB")
+    if "legacy" in results:
+        print(f"speedup: {np.mean(results['legacy'][0]) / np.mean(results['csr'][0]):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import DROP_COLUMNS, TRAIN_PROPERTIES, convert, read_train_data
+
+API_COLUMNS = ["train_number", "from_station_code", "to_station_code", "train_name_y", "arrival_time", "departure_time",
+               "day", "total_duration_min", "latitude", "longitude"]
+
+
+# The original convert_to_csv.py: whole-document json.load, intermediate CSVs read back for the merge
+def legacy_convert(stations_path, trains_path, schedules_path, output_path, workdir):
+    with open(stations_path, "r", encoding="utf-8") as f:
+        stations_data = json.load(f)
+    stations_list = []
+    for station in stations_data["features"]:
+        properties = station["properties"]
+        geometry = station["geometry"]
+        coordinates = geometry["coordinates"] if geometry else [None, None]
+        stations_list.append({
+            "station_code": properties.get("code", None),
+            "station_name": properties.get("name", None),
+            "state": properties.get("state", None),
+            "zone": properties.get("zone", None),
+            "latitude": coordinates[1],
+            "longitude": coordinates[0],
+            "address": properties.get("address", None)
+        })
+    pd.DataFrame(stations_list).to_csv(os.path.join(workdir, "stations.csv"), index=False, encoding="utf-8")
+
+    with open(trains_path, "r", encoding="utf-8") as f:
+        trains_data = json.load(f)
+    trains_list = [{name: train["properties"].get(key, default) for name, (key, default) in TRAIN_PROPERTIES.items()}
+                   for train in trains_data["features"]]
+    pd.DataFrame(trains_list).to_csv(os.path.join(workdir, "trains.csv"), index=False, encoding="utf-8")
+
+    df_merged = pd.read_csv(schedules_path).merge(pd.read_csv(os.path.join(workdir, "trains.csv")), on="train_number", how="left")
+    df_merged = df_merged.merge(pd.read_csv(os.path.join(workdir, "stations.csv")), on="station_code", how="left")
+    df_merged.to_csv(os.path.join(workdir, "merged_train_data.csv"), index=False, encoding="utf-8")
+
+    df = pd.read_csv(os.path.join(workdir, "merged_train_data.csv"))
+    df_cleaned = df.dropna(subset=["arrival"])
+    df_cleaned = df_cleaned.dropna(subset=["return_train"])
+    df_cleaned = df_cleaned[df_cleaned["return_train"].astype(str).str.isnumeric()]
+    df_cleaned = df_cleaned.drop(columns=DROP_COLUMNS, errors='ignore')
+    df_cleaned["total_duration_min"] = df_cleaned["duration_h"] * 60 + df_cleaned["duration_m"]
+    df_cleaned.to_csv(output_path, index=False)
+    return len(df_cleaned)
+
+
+def traced(run):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+# Numbers compare by value (the legacy CSV writes 90.0 where Parquet holds 90, and rounds
+# floats in the last digit), the rest as text
+def same_values(legacy, streamed):
+    legacy, streamed = legacy.reset_index(drop=True), streamed.reset_index(drop=True)
+    if len(legacy) != len(streamed) or not legacy.isna().equals(streamed.isna()):
+        return False
+    present = legacy.notna()
+    if pd.api.types.is_numeric_dtype(legacy):
+        return bool(np.allclose(legacy[present].astype(float), streamed[present].astype(float), rtol=1e-12, atol=0))
+    return bool((legacy[present].astype(str) == streamed[present].astype(str)).all())
+
+
+def timed_load(path, columns):
+    start = time.perf_counter()
+    df = read_train_data(path, columns)
+    return df, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Legacy json.load + CSV round-trip conversion vs the streaming Parquet pipeline")
+    parser.add_argument("--stations", default=os.path.join("dataset_2", "stations.json"))
+    parser.add_argument("--trains", default=os.path.join("dataset_2", "trains.json"))
+    parser.add_argument("--schedules", default=os.path.join("dataset_2", "csv_format", "schedules.csv"))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    csv_path = os.path.join(workdir, "legacy.csv")
+    parquet_path = os.path.join(workdir, "streamed.parquet")
+    legacy_rows, legacy_s, legacy_peak = traced(lambda: legacy_convert(args.stations, args.trains, args.schedules, csv_path, workdir))
+    rows, stream_s, stream_peak = traced(lambda: convert(args.stations, args.trains, args.schedules, parquet_path))
+
+    print(f"rows: legacy {legacy_rows}  streamed {rows}")
+    for name, elapsed, peak, path in (("legacy", legacy_s, legacy_peak, csv_path), ("streamed", stream_s, stream_peak, parquet_path)):
+        print(f"{name:>9}: convert {elapsed:7.2f} s  peak alloc {peak / 2 ** 20:8.1f} MiB  output {os.path.getsize(path) / 2 ** 20:7.1f} MiB")
+
+    # Same rows and values for the columns the API reads
+    legacy, csv_all_s = timed_load(csv_path, None)
+    streamed, parquet_all_s = timed_load(parquet_path, None)
+    _, csv_api_s = timed_load(csv_path, API_COLUMNS)
+    _, parquet_api_s = timed_load(parquet_path, API_COLUMNS)
+    mismatched = [name for name in API_COLUMNS if not same_values(legacy[name], streamed[name])]
+    print(f"API columns differing: {mismatched or 'none'}")
+    print(f"load all columns: csv {csv_all_s * 1000:8.1f} ms  parquet {parquet_all_s * 1000:8.1f} ms")
+    print(f"load API columns: csv {csv_api_s * 1000:8.1f} ms  parquet {parquet_api_s * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+from route_cache import RouteCache
+from routing import find_fastest_route
+
+
+# Dashboard-like traffic: a few popular origins and destinations take most of the queries
+def zipf_pairs(stations, queries, popular, rng):
+    weights = 1 / np.arange(1, popular + 1)
+    origins, destinations = rng.sample(stations, popular), rng.sample(stations, popular)
+    pairs = []
+    while len(pairs) < queries:
+        source, destination = rng.choices(origins, weights)[0], rng.choices(destinations, weights)[0]
+        if source != destination:
+            pairs.append((source, destination))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/live/route answers: uncached Dijkstra vs the snapshot route cache")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--popular", type=int, default=50)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["TRAIN_DATA_PATH"] = args.data
+    import abc_1
+
+    abc_1.build_timetables()
+    abc_1.update_delays_and_graph(schedule_next=False)
+    snapshot = abc_1.snapshots.current
+    rng = random.Random(args.seed)
+    pairs = zipf_pairs(snapshot.graph.station_codes.tolist(), args.queries, args.popular, rng)
+
+    start = time.perf_counter()
+    expected = [find_fastest_route(snapshot.graph, source, destination) for source, destination in pairs]
+    uncached_s = time.perf_counter() - start
+
+    cache = RouteCache(max_entries=args.cache_size)
+    cache.published(snapshot)
+    start = time.perf_counter()
+    cached = [cache.fastest_route(snapshot, source, destination) for source, destination in pairs]
+    cached_s = time.perf_counter() - start
+
+    stats = cache.stats()
+    print(f"stations: {len(snapshot.graph)}  queries: {len(pairs)}  distinct pairs: {len(set(pairs))}")
+    print(f"uncached: {uncached_s * 1000:9.1f} ms  ({uncached_s / len(pairs) * 1000:.3f} ms/query)")
+    print(f"cached:   {cached_s * 1000:9.1f} ms  ({cached_s / len(pairs) * 1000:.3f} ms/query)  speedup {uncached_s / cached_s:.1f}x")
+    print(f"hit rate {stats['hit_rate']:.1%}  trees built {stats['tree_builds']}  evictions {stats['evictions']} routes, "
+          f"{stats['tree_evictions']} trees  size {stats['size']} routes + {stats['trees']}/{stats['max_trees']} trees")
+    print(f"answers differing from Dijkstra: {sum(a != b for a, b in zip(expected, cached))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+from routing import find_fastest_route
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000 if samples else float('nan')
+
+
+def report(name, samples, found):
+    print(f"{name:>10}: mean {np.mean(samples) * 1000:8.3f} ms  p50 {percentile_ms(samples, 50):8.3f} ms  "
+          f"p99 {percentile_ms(samples, 99):8.3f} ms  found {found}/{len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Random origin-destination routing benchmark: connection scan vs Dijkstra")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["TRAIN_DATA_PATH"] = args.data
+    import abc_1
+
+    abc_1.build_timetables()
+    abc_1.update_delays_and_graph(schedule_next=False)
+    snapshot = abc_1.snapshots.current
+
+    rng = random.Random(args.seed)
+    stations = snapshot.graph.station_codes.tolist()
+    pairs = [tuple(rng.sample(stations, 2)) + (rng.randrange(0, 1440),) for _ in range(args.queries)]
+
+    dijkstra_times, dijkstra_found = [], 0
+    for source, destination, _ in pairs:
+        start = time.perf_counter()
+        cost, _ = find_fastest_route(snapshot.graph, source, destination)
+        dijkstra_times.append(time.perf_counter() - start)
+        dijkstra_found += cost != float('inf')
+
+    print(f"stations: {len(stations)}  connections: {len(snapshot.connections)}  queries: {len(pairs)}")
+    report("dijkstra", dijkstra_times, dijkstra_found)
+    if not len(snapshot.connections):
+        print("csa: skipped, the timetable has no connections between different stations")
+        return
+
+    csa_times, csa_found = [], 0
+    for source, destination, depart_after in pairs:
+        start = time.perf_counter()
+        arrival, _ = snapshot.connections.earliest_arrival(source, destination, depart_after)
+        csa_times.append(time.perf_counter() - start)
+        csa_found += arrival != float('inf')
+
+    report("csa", csa_times, csa_found)
+
+
+if __name__ == '__main__':
+    main()
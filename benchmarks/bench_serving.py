@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+from convert_to_csv import default_data_path
+from network_artifact import compile_network
+
+FLASK_SERVER = "import abc_1; abc_1.start_live_updates(); abc_1.app.run(port={port}, threaded=True)"
+
+
+def start_server(mode, port, data, refresh_sec):
+    env = dict(os.environ, TRAIN_DATA_PATH=data, DELAY_REFRESH_SEC=str(refresh_sec))
+    if mode == "flask":
+        command = [sys.executable, "-c", FLASK_SERVER.format(port=port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "asgi_app:app", "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+# Minimal HTTP/1.1 keep-alive client: one request at a time per connection
+class Connection:
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode())
+        status, headers = await read_head(self.reader)
+        body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close" or status.startswith("HTTP/1.0"):
+            self.writer.close()
+            self.reader = self.writer = None
+        return body
+
+
+async def read_head(reader):
+    lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+async def wait_ready(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await Connection(port).get("/live/last_update")
+            return True
+        except OSError:
+            await asyncio.sleep(0.2)
+    return False
+
+
+# Closed-loop polling: `clients` connections each issue requests back to back for `duration` seconds
+async def poll(port, paths, clients, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(seed):
+        rng = random.Random(seed)
+        connection = Connection(port)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await connection.get(rng.choice(paths))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(seed) for seed in range(clients)))
+    return len(latencies) / (time.perf_counter() - start), np.array(latencies)
+
+
+# SSE subscribers on one station stream: waits for `ticks` update events and records,
+# per tick, when each subscriber received it and how many bytes it carried
+async def subscribe(port, path, subscribers, ticks, timeout):
+    arrivals = {}
+
+    async def subscriber():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode())
+        await read_head(reader)
+        buffer, seen = b"", 0
+        try:
+            while seen < ticks:
+                size = int((await reader.readline()).strip(), 16)        #Chunked transfer encoding
+                buffer += (await reader.readexactly(size + 2))[:-2]
+                while b"\n\n" in buffer:
+                    event, buffer = buffer.split(b"\n\n", 1)
+                    if event.startswith(b"event: update"):
+                        version = json.loads(event.split(b"data: ", 1)[1])["snapshot_version"]
+                        arrivals.setdefault(version, []).append((time.perf_counter(), len(event)))
+                        seen += 1
+        finally:
+            writer.close()
+
+    await asyncio.wait_for(asyncio.gather(*(subscriber() for _ in range(subscribers))), timeout)
+    return arrivals
+
+
+async def run(args):
+    timetable = compile_network(args.data).timetable
+    rng = random.Random(0)
+    stations = rng.sample(list(timetable.station_codes), min(200, len(timetable.station_codes)))
+    paths = [f"/live/station/{code}" for code in stations]
+
+    for mode, port in (("flask", args.port), ("asgi", args.port + 1)):
+        server = start_server(mode, port, args.data, args.refresh_sec)
+        try:
+            if not await wait_ready(port, 120):
+                print(f"{mode}: server did not start")
+                continue
+            await poll(port, paths, args.clients, 1)                   #Warm up
+            rate, latencies = await poll(port, paths, args.clients, args.duration)
+            print(f"{mode:>5} polling /live/station, {args.clients} clients: {rate:8.0f} req/s  "
+                  f"p50 {np.percentile(latencies, 50) * 1000:7.1f} ms  p99 {np.percentile(latencies, 99) * 1000:7.1f} ms")
+
+            if mode == "asgi":
+                index = timetable.station_index
+                busiest = max(stations, key=lambda code: index.indptr[timetable.station_id(code) + 1] - index.indptr[timetable.station_id(code)])
+                full = len(await Connection(port).get(f"/live/station/{busiest}"))
+                arrivals = await subscribe(port, f"/live/stream/station/{busiest}", args.subscribers, args.ticks,
+                                           args.refresh_sec * (args.ticks + 2) + 60)
+                for version, received in sorted(arrivals.items()):
+                    times = [at for at, _ in received]
+                    print(f" push tick {version}: {len(received)} subscribers reached in {(max(times) - min(times)) * 1000:7.1f} ms, "
+                          f"{received[0][1]} bytes each (full /live/station payload {full} bytes)")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test: Flask dev server vs the ASGI app (polling), plus SSE push fan-out")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--ticks", type=int, default=2)
+    parser.add_argument("--refresh-sec", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+from delay_simulation import DelaySimulator
+from network_artifact import compile_network
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delay propagation simulator: run time per day of service and delay statistics")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timetable = compile_network(args.data).timetable
+    start = time.perf_counter()
+    simulator = DelaySimulator(timetable)
+    setup_s = time.perf_counter() - start
+    stop_count = len(timetable.arrival)
+
+    times, forecasts = [], []
+    for run in range(args.runs):
+        start = time.perf_counter()
+        forecasts.append(simulator.run(seed=[args.seed, run]))
+        times.append(time.perf_counter() - start)
+    run_s = min(times)
+
+    # Same seed, same delays; no disturbances, no delay anywhere
+    again = simulator.run(seed=[args.seed, 0])
+    reproducible = np.array_equal(again.arrival_delay, forecasts[0].arrival_delay) and np.array_equal(again.departure_delay, forecasts[0].departure_delay)
+    undisturbed = simulator.run(injected=np.zeros(stop_count, dtype=np.int64))
+
+    delays = np.concatenate([forecast.stop_delay for forecast in forecasts])
+    terminus = np.concatenate([forecast.arrival_delay[timetable.indptr[1:] - 1] for forecast in forecasts])
+    print(f"trains: {len(timetable)}  stops: {stop_count}  stations: {len(simulator.platforms)}  "
+          f"platforms: {int(simulator.platforms.sum())}")
+    print(f"setup: {setup_s * 1000:9.1f} ms")
+    print(f"run:   {run_s * 1000:9.1f} ms  ({stop_count / run_s:,.0f} stops/s)")
+    print(f"stop delay: mean {delays.mean():.1f}  p95 {np.percentile(delays, 95):.0f}  max {delays.max()} min")
+    print(f"terminus delay: mean {terminus.mean():.1f}  on time {np.mean(terminus == 0):.1%}")
+    print(f"reproducible: {reproducible}  undisturbed max delay: {undisturbed.max_delay()}")
+
+
+if __name__ == '__main__':
+    main()
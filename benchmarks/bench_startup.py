@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path
+from network_artifact import compile_network, load_network, save_network, source_checksum
+
+
+def best_of(repeat, run):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Network cold start: parse and build from the data file vs map the compiled artifact")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "network.bin")
+    checksum = source_checksum(args.data)
+    network = compile_network(args.data)
+    save_network(network, path, checksum)
+
+    parse_s = best_of(args.repeat, lambda: compile_network(args.data))
+    checksum_s = best_of(args.repeat, lambda: source_checksum(args.data))
+    load_s = best_of(args.repeat, lambda: load_network(path))
+
+    print(f"trains: {len(network.timetable)}  stations: {len(network.route_topology)}  edges: {len(network.edge_table)}  "
+          f"artifact: {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+    print(f"parse + build: {parse_s * 1000:9.1f} ms")
+    print(f"checksum:      {checksum_s * 1000:9.1f} ms")
+    print(f"map artifact:  {load_s * 1000:9.1f} ms")
+    print(f"speedup: {parse_s / (checksum_s + load_s):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
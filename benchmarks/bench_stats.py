@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path, read_train_data
+from data_stats import STATS_COLUMNS, SummaryCache
+
+
+# What every rerun of the Statistical Dashboard tab used to do before plotting
+def legacy_rerun(path):
+    df = read_train_data(path, columns=STATS_COLUMNS)
+    df = df.dropna(subset=['from_station_code', 'to_station_code', 'total_duration_min'])
+    df['from_station_code'].astype(str).value_counts().head(10)
+    df.groupby('train_type', observed=True)['total_duration_min'].mean().astype(float).sort_values(ascending=False).dropna()
+    df['total_duration_min'].astype(float)
+    station_counts = pd.concat([
+        df['from_station_code'].astype(str).value_counts(),
+        df['to_station_code'].astype(str).value_counts()
+    ], axis=1, keys=['Departures', 'Arrivals']).fillna(0).astype(int)
+    station_counts['Total'] = station_counts.sum(axis=1)
+    station_counts.sort_values(by='Total', ascending=False).head(10)
+
+
+def best_of(repeat, run):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statistical Dashboard aggregates: recomputed per rerun vs the per-data-version summary cache")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cache = SummaryCache(args.data)
+    start = time.perf_counter()
+    summary = cache.summary()
+    first_s = time.perf_counter() - start
+    legacy_s = best_of(args.repeat, lambda: legacy_rerun(args.data))
+    cached_s = best_of(args.repeat, cache.summary)
+
+    print(f"rows: {summary['rows']}")
+    print(f"per rerun, legacy:        {legacy_s * 1000:10.1f} ms")
+    print(f"summary, first build:     {first_s * 1000:10.1f} ms")
+    print(f"summary, same data file:  {cached_s * 1000:10.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import default_data_path, read_train_data
+from timetable import ServiceDays, build_timetable
+
+REQUIRED = ["train_number", "from_station_code", "to_station_code", "train_name_y", "arrival_time", "departure_time", "day", "total_duration_min"]
+
+
+# The original abc_1.build_timetables (groupby + iterrows + datetime.combine per row)
+def legacy_build_timetables(df):
+    df = df.copy()
+    df['arrival_time'] = pd.to_datetime(df['arrival_time'], format='%H:%M:%S', errors='coerce').dt.time
+    df['departure_time'] = pd.to_datetime(df['departure_time'], format='%H:%M:%S', errors='coerce').dt.time
+    train_timetables = {}
+    for train_number, group in df.groupby("train_number"):
+        timetable = []
+        for _, row in group.iterrows():
+            today = datetime.now().date()
+            arrival_dt = datetime.combine(today + timedelta(days=int(row['day']) - 1), row['arrival_time'])
+            departure_dt = datetime.combine(today + timedelta(days=int(row['day']) - 1), row['departure_time'])
+            timetable.append({
+                "station": row['from_station_code'],
+                "arrival": arrival_dt,
+                "departure": departure_dt,
+                "train_name": row['train_name_y']
+            })
+        if len(timetable) >= 2:
+            train_timetables[str(train_number)] = sorted(timetable, key=lambda x: x['arrival'])
+    return train_timetables
+
+
+def check_equal(legacy, columnar):
+    assert list(legacy) == list(columnar), "train order differs"
+    days = ServiceDays([datetime.now().date()], 0)                                  #The legacy builder anchors every train on today
+    for train_id, stops in legacy.items():
+        assert [s['station'] for s in stops] == columnar.route(train_id), train_id
+        sl = columnar.stops(train_id)
+        for stop, arrival, departure in zip(stops, columnar.arrival[sl], columnar.departure[sl]):
+            assert stop['arrival'].replace(second=0) == days.to_datetime(0, arrival), train_id
+            assert stop['departure'].replace(second=0) == days.to_datetime(0, departure), train_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy iterrows timetable builder with the columnar one")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the columnar builder")
+    args = parser.parse_args()
+
+    df = read_train_data(args.data).dropna(subset=REQUIRED)
+    print(f"rows: {len(df)}")
+
+    start = time.perf_counter()
+    columnar = build_timetable(df)
+    columnar_s = time.perf_counter() - start
+    print(f"columnar build: {columnar_s:.3f} s ({len(columnar)} trains, {len(columnar.arrival)} stops)")
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        legacy = legacy_build_timetables(df)
+        legacy_s = time.perf_counter() - start
+        print(f"legacy build:   {legacy_s:.3f} s")
+        print(f"speedup:        {legacy_s / columnar_s:.1f}x")
+        check_equal(legacy, columnar)
+        print("timetables match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import os
+import string
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import ChunkWriter
+from geo_index import StationGeoIndex, haversine_km
+
+# Column order of convert_to_csv's output (schedules merged with trains and stations,
+# helper columns dropped, total_duration_min appended)
+OUTPUT_COLUMNS = ["arrival", "day", "id", "train_number", "train_name_y", "train_type", "departure_time", "arrival_time",
+                  "duration_h", "duration_m", "distance_km", "from_station_code", "from_station_name", "to_station_code",
+                  "to_station_name", "return_train", "first_ac", "second_ac", "third_ac", "sleeper", "chair_car",
+                  "first_class", "latitude", "longitude", "total_duration_min"]
+CLASS_COLUMNS = ["first_ac", "second_ac", "third_ac", "sleeper", "chair_car", "first_class"]
+
+# Train types: (code, name suffix, share, speed km/h, chance of stopping at a station on
+# the way, trip length range km, classes carried)
+TRAIN_TYPES = [
+    ("Pass", "Passenger", 0.22, 35, 1.0, (40, 300), ()),
+    ("MEMU", "MEMU", 0.06, 45, 1.0, (30, 150), ()),
+    ("Exp", "Express", 0.30, 55, 0.35, (200, 2000), ("second_ac", "third_ac", "sleeper")),
+    ("SF", "Superfast Express", 0.21, 65, 0.2, (300, 2500), ("first_ac", "second_ac", "third_ac", "sleeper")),
+    ("Mail", "Mail", 0.08, 55, 0.3, (300, 2000), ("second_ac", "third_ac", "sleeper")),
+    ("Raj", "Rajdhani Express", 0.04, 80, 0.08, (800, 2500), ("first_ac", "second_ac", "third_ac")),
+    ("Shtb", "Shatabdi Express", 0.04, 80, 0.15, (200, 700), ("chair_car", "first_class")),
+    ("Drnt", "Duronto Express", 0.05, 75, 0.04, (600, 2500), ("first_ac", "second_ac", "third_ac", "sleeper")),
+]
+LATITUDE_RANGE = (8.0, 32.0)
+LONGITUDE_RANGE = (69.0, 95.0)
+STATIONS_PER_HUB = 60
+HUB_SPREAD = 0.45                                                     #Cluster spread, as a share of the hub spacing
+HUB_LINKS = 4
+CORRIDOR_KM = 8
+DIRECT_SPACINGS = 1.5                                                 #Trips shorter than this many hub spacings skip the main lines
+HUB_WEIGHT = 25
+HUB_DWELL_MIN = 10
+DWELL_MIN = 2
+CHUNK_TRAINS = 5000
+NAME_HEADS = ["Ram", "Shiv", "Hari", "Krishna", "Bhav", "Man", "Gop", "Sur", "Chand", "Dev", "Lak", "Raj", "Sita", "Kam",
+              "Nav", "Bal", "Ganga", "Jai", "Vijay", "Anand", "Bhim", "Indra", "Kal", "Mohan", "Sundar", "Tara"]
+NAME_TAILS = ["pur", "nagar", "abad", "garh", "ganj", "kot", "wadi", "gaon", "pet", "palli", "ur", "bad", "gram", "sar"]
+
+
+def station_code(index):
+    # 17576 three-letter codes first, then four-letter ones
+    length, index = (3, index) if index < 26 ** 3 else (4, index - 26 ** 3)
+    letters = []
+    for _ in range(length):
+        index, letter = divmod(index, 26)
+        letters.append(string.ascii_uppercase[letter])
+    return "".join(reversed(letters))
+
+
+# Stations clustered around hub cities inside an India-sized box, the hubs first. Each
+# hub has main lines to its nearest hubs; a line calls at the stations of its two
+# clusters that lie within CORRIDOR_KM of it, in order along the line.
+class TrackNetwork:
+    def __init__(self, count, rng):
+        hubs = max(2, count // STATIONS_PER_HUB)
+        spacing = np.sqrt(np.ptp(LATITUDE_RANGE) * np.ptp(LONGITUDE_RANGE) / hubs)
+        spread = HUB_SPREAD * spacing
+        self.direct_km = DIRECT_SPACINGS * spacing * 111.0
+        hub_lat = rng.uniform(*LATITUDE_RANGE, hubs)
+        hub_lon = rng.uniform(*LONGITUDE_RANGE, hubs)
+        self.cluster = np.concatenate([np.arange(hubs), rng.integers(0, hubs, count - hubs)])
+        offset = np.arange(count) >= hubs
+        self.lat = np.clip(hub_lat[self.cluster] + offset * rng.normal(0, spread, count), *LATITUDE_RANGE)
+        self.lon = np.clip(hub_lon[self.cluster] + offset * rng.normal(0, spread, count), *LONGITUDE_RANGE)
+        self.hub = ~offset
+        self.codes = np.array([station_code(i) for i in rng.choice(26 ** 3 + 26 ** 4, count, replace=False)], dtype=object)
+        heads, tails = rng.integers(0, len(NAME_HEADS), count), rng.integers(0, len(NAME_TAILS), count)
+        self.names = np.array([NAME_HEADS[h] + NAME_TAILS[t] + (" Jn" if i < hubs else "") for i, (h, t) in enumerate(zip(heads, tails))], dtype=object)
+        self.index = StationGeoIndex(np.arange(count), self.lat, self.lon)
+        self.members = [np.flatnonzero(self.cluster == c) for c in range(hubs)]
+        self.lines = {}
+
+        # Main lines (symmetric) and the next hub on the shortest main-line path, by Floyd-Warshall
+        hub_index = StationGeoIndex(np.arange(hubs), hub_lat, hub_lon)
+        distance = np.full((hubs, hubs), np.inf)
+        np.fill_diagonal(distance, 0)
+        for a in range(hubs):
+            for b, km in hub_index.nearest(hub_lat[a], hub_lon[a], HUB_LINKS + 1):
+                if b != a:
+                    distance[a, b] = distance[b, a] = km
+        self.next_hub = np.where(np.isfinite(distance), np.arange(hubs)[None, :], -1)
+        for k in range(hubs):
+            through = distance[:, k, None] + distance[None, k, :]
+            shorter = through < distance
+            distance = np.where(shorter, through, distance)
+            self.next_hub = np.where(shorter, self.next_hub[:, k, None], self.next_hub)
+
+    def __len__(self):
+        return len(self.codes)
+
+    # Stations of the clusters of a and b near the straight line a -> b, ordered along it
+    # (flat projection, fine at these distances)
+    def line(self, a, b):
+        key = (a, b)
+        if key not in self.lines:
+            candidates = np.unique(np.concatenate([self.members[self.cluster[a]], self.members[self.cluster[b]]]))
+            scale = np.cos(np.radians(self.lat[a]))
+            x, y = (self.lon[candidates] - self.lon[a]) * scale, self.lat[candidates] - self.lat[a]
+            dx, dy = (self.lon[b] - self.lon[a]) * scale, self.lat[b] - self.lat[a]
+            length = dx * dx + dy * dy
+            along = (x * dx + y * dy) / length if length else np.zeros(len(candidates))
+            across = np.abs(x * dy - y * dx) / np.sqrt(length) * 111.0 if length else np.full(len(candidates), np.inf)
+            near = (along > 0) & (along < 1) & (across < CORRIDOR_KM)
+            self.lines[key] = candidates[near][np.argsort(along[near], kind='stable')].tolist()
+        return self.lines[key]
+
+    # Stations a train from origin to destination passes: out to its hub, along the main
+    # lines, then in from the destination's hub (straight there on short trips)
+    def route(self, origin, destination):
+        start, end = self.cluster[origin], self.cluster[destination]
+        direct = haversine_km(self.lat[origin], self.lon[origin], self.lat[destination], self.lon[destination]) < self.direct_km
+        waypoints = [origin]
+        if not direct and self.next_hub[start, end] >= 0:
+            hub = start
+            waypoints.append(hub)
+            while hub != end:
+                hub = self.next_hub[hub, end]
+                waypoints.append(hub)
+        waypoints.append(destination)
+        stations = [origin]
+        for a, b in zip(waypoints, waypoints[1:]):
+            if a != b:
+                stations += self.line(a, b) + [b]
+        seen, route = set(), []
+        for station in stations:
+            if station not in seen:
+                seen.add(station)
+                route.append(station)
+        return route
+
+
+def clock(minutes):
+    minutes = np.asarray(minutes, dtype=np.int64) % 1440
+    return np.char.add(np.char.add(np.char.zfill((minutes // 60).astype(str), 2), ":"),
+                       np.char.add(np.char.zfill((minutes % 60).astype(str), 2), ":00")).astype(object)
+
+
+def generate_chunk(first_train, count, total_trains, network, rng, first_id):
+    codes, names, lat, lon, hub = network.codes, network.names, network.lat, network.lon, network.hub
+    kinds = rng.choice(len(TRAIN_TYPES), count, p=np.array([t[2] for t in TRAIN_TYPES]) / sum(t[2] for t in TRAIN_TYPES))
+    popularity = np.where(hub, HUB_WEIGHT, 1.0)
+    origin = rng.choice(len(network), count, p=popularity / popularity.sum())
+
+    # Destination: the station nearest to a point at the type's trip length from the origin
+    low = np.array([TRAIN_TYPES[k][5][0] for k in kinds])
+    high = np.array([TRAIN_TYPES[k][5][1] for k in kinds])
+    trip_km, bearing = rng.uniform(low, high), rng.uniform(0, 2 * np.pi, count)
+    target_lat = np.clip(lat[origin] + trip_km / 111.0 * np.cos(bearing), *LATITUDE_RANGE)
+    target_lon = np.clip(lon[origin] + trip_km / (111.0 * np.cos(np.radians(lat[origin]))) * np.sin(bearing), *LONGITUDE_RANGE)
+    destination = np.array([next(code for code, _ in network.index.nearest(a, o, 2) if code != start)
+                            for a, o, start in zip(target_lat, target_lon, origin)], dtype=np.int64)
+
+    routes = [network.route(o, d) for o, d in zip(origin.tolist(), destination.tolist())]
+    route = np.full((count, max(map(len, routes))), -1, dtype=np.int64)
+    for i, stations in enumerate(routes):
+        route[i, :len(stations)] = stations
+    visited = route >= 0
+    last = visited.sum(axis=1) - 1
+    final = route[np.arange(count), last]
+    previous = np.where(visited[:, 1:], route[:, :-1], 0)
+    leg_km = np.where(visited[:, 1:], haversine_km(lat[previous], lon[previous], lat[np.maximum(route[:, 1:], 0)], lon[np.maximum(route[:, 1:], 0)]), 0)
+
+    # Which visited stations the train calls at; hubs and the terminus always
+    stop_chance = np.array([TRAIN_TYPES[k][4] for k in kinds])
+    calls = visited[:, 1:] & ((rng.random(leg_km.shape) < stop_chance[:, None]) | hub[np.maximum(route[:, 1:], 0)])
+    calls[np.arange(count), last - 1] = True
+    dwell = np.where(calls, np.where(hub[np.maximum(route[:, 1:], 0)], HUB_DWELL_MIN, DWELL_MIN), 0)
+    speed = np.array([TRAIN_TYPES[k][3] for k in kinds], dtype=np.float64)
+    running = np.cumsum(np.where(visited[:, 1:], np.maximum(leg_km / speed[:, None] * 60, 1), 0), axis=1)
+    departure = rng.integers(0, 1440, count)
+    arrival = departure[:, None] + np.round(running + np.cumsum(dwell, axis=1) - dwell).astype(np.int64)
+    duration = arrival[np.arange(count), last - 1] - departure
+    distance = np.round(leg_km.sum(axis=1))
+
+    numbers = 10000 + first_train + np.arange(count)
+    partner = np.where(numbers % 2 == 0, numbers + 1, numbers - 1)
+    partner = np.where(partner >= 10000 + total_trains, numbers, partner)
+    train_names = np.array([f"{names[o].removesuffix(' Jn')} - {names[f].removesuffix(' Jn')} {TRAIN_TYPES[k][1]}"
+                            for o, f, k in zip(origin, final, kinds)], dtype=object)
+
+    # One row per call, as the converted schedules have them (the origin's row has no
+    # arrival and is dropped by the cleaning step, so it is not written)
+    train, hop = np.nonzero(calls)
+    stop = route[train, hop + 1]
+    rows = {
+        "arrival": clock(arrival[train, hop]),
+        "day": 1 + arrival[train, hop] // 1440,
+        "id": first_id + np.arange(len(train)),
+        "train_number": numbers[train],
+        "train_name_y": train_names[train],
+        "train_type": np.array([TRAIN_TYPES[k][0] for k in kinds], dtype=object)[train],
+        "departure_time": clock(departure)[train],
+        "arrival_time": clock(departure + duration)[train],
+        "duration_h": (duration // 60)[train],
+        "duration_m": (duration % 60)[train],
+        "distance_km": distance[train],
+        "from_station_code": codes[origin][train],
+        "from_station_name": names[origin][train],
+        "to_station_code": codes[final][train],
+        "to_station_name": names[final][train],
+        "return_train": partner[train],
+    }
+    for column in CLASS_COLUMNS:
+        rows[column] = np.array([int(column in TRAIN_TYPES[k][6]) for k in kinds])[train]
+    rows["latitude"], rows["longitude"] = lat[stop], lon[stop]
+    rows["total_duration_min"] = duration[train]
+    return pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+
+
+# Writes a schedule file in convert_to_csv's schema (.csv, or .parquet like the converter).
+# The same trains/stations/seed always give the same file.
+def generate(path, trains, stations=None, seed=0):
+    rng = np.random.default_rng(seed)
+    network = TrackNetwork(stations or default_station_count(trains), rng)
+    writer = ChunkWriter(path)
+    try:
+        for first in range(0, trains, CHUNK_TRAINS):
+            writer.write(generate_chunk(first, min(CHUNK_TRAINS, trains - first), trains, network, rng, writer.rows))
+    finally:
+        writer.close()
+    return writer.rows
+
+
+# Roughly the station-to-train ratio of the real network (about 9k stations, 5k trains)
+def default_station_count(trains):
+    return int(min(max(50, trains * 1.7), 20000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic schedule file in the preprocessed train data schema")
+    parser.add_argument("output", help="a .csv path, or .parquet")
+    parser.add_argument("--trains", type=int, default=5000)
+    parser.add_argument("--stations", type=int, help="default: scaled with --trains")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rows = generate(args.output, args.trains, args.stations, args.seed)
+    print(f"Wrote {rows} rows ({args.trains} trains) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import numpy as np
+
+INF = float('inf')
+SCAN_BLOCK = 4096
+
+
+# Connection Scan Algorithm over the elementary connections of the timetable. A
+# connection is one train running between two consecutive stops at different stations;
+# all of them sit in flat arrays sorted by departure, and an earliest-arrival query is a
+# single forward scan from the first connection departing after the requested time.
+# Data whose rows all carry the train's origin as their station (convert_to_csv keeps
+# no per-stop station) has no connections at all.
+class ConnectionScan:
+    def __init__(self, timetable, departure, arrival, from_station, to_station, train, trip, stop):
+        self.timetable = timetable
+        self.departure = departure
+        self.arrival = arrival
+        self.from_station = from_station
+        self.to_station = to_station
+        self.train = train
+        self.trip = trip
+        self.stop = stop
+
+    def __len__(self):
+        return len(self.departure)
+
+    # Shifts every connection by the predicted delays at its two stops (minutes, one entry
+    # per timetable stop: the departure delay where it leaves, the arrival delay where it
+    # arrives) and re-sorts
+    def with_stop_delays(self, arrival_delay, departure_delay):
+        departure = self.departure + departure_delay[self.stop]
+        arrival = np.maximum(self.arrival + arrival_delay[self.stop + 1], departure)
+        order = np.argsort(departure, kind='stable')
+        return ConnectionScan(self.timetable, departure[order], arrival[order], self.from_station[order],
+                              self.to_station[order], self.train[order], self.trip[order], self.stop[order])
+
+    def earliest_arrival(self, source, target, depart_after):
+        timetable = self.timetable
+        source_id = timetable.station_id(source)
+        target_id = timetable.station_id(target)
+        if source_id is None or target_id is None:
+            return INF, []
+
+        best = [INF] * len(timetable.station_codes)
+        reached_by = [None] * len(best)
+        boarded_at = {}
+        best[source_id] = depart_after
+        target_best = INF
+
+        start = int(np.searchsorted(self.departure, depart_after, side='left'))
+        for block in range(start, len(self.departure), SCAN_BLOCK):
+            end = block + SCAN_BLOCK
+            connections = zip(range(block, end), self.departure[block:end].tolist(), self.arrival[block:end].tolist(),
+                              self.from_station[block:end].tolist(), self.to_station[block:end].tolist(),
+                              self.trip[block:end].tolist())
+            for index, departure, arrival, from_station, to_station, trip in connections:
+                if departure >= target_best:
+                    return target_best, self._journey(reached_by, source_id, target_id)
+                entered = boarded_at.get(trip)
+                if entered is None:
+                    if best[from_station] > departure:
+                        continue
+                    entered = boarded_at[trip] = index
+                if arrival < best[to_station]:
+                    best[to_station] = arrival
+                    reached_by[to_station] = (entered, index)
+                    if to_station == target_id:
+                        target_best = arrival
+        if target_best == INF:
+            return INF, []
+        return target_best, self._journey(reached_by, source_id, target_id)
+
+    # Walks the (boarding, alighting) connection pairs back from the target
+    def _journey(self, reached_by, source_id, target_id):
+        timetable = self.timetable
+        legs = []
+        station = target_id
+        while station != source_id:
+            entered, left = reached_by[station]
+            train = int(self.train[entered])
+            first_stop, last_stop = int(self.stop[entered]), int(self.stop[left]) + 1
+            legs.append({
+                "train_number": timetable.train_ids[train],
+                "train_name": timetable.train_names[train],
+                "stations": timetable.station_codes[timetable.stations[first_stop:last_stop + 1]].tolist(),
+                "departure": int(self.departure[entered]),
+                "arrival": int(self.arrival[left]),
+            })
+            station = int(self.from_station[entered])
+        legs.reverse()
+        return legs
+
+
+def build_connections(timetable):
+    stops = np.arange(len(timetable.stations))
+    last_stop = np.zeros(len(stops), dtype=bool)
+    last_stop[timetable.indptr[1:] - 1] = True
+    stops = stops[~last_stop]
+    train = (np.searchsorted(timetable.indptr, stops, side='right') - 1).astype(np.int32)
+
+    departure = timetable.departure[stops]
+    arrival = timetable.arrival[stops + 1]
+    valid = arrival >= departure
+
+    # A trip is a run of consecutive connections of one train that stays time-monotone;
+    # staying seated is only allowed within a trip, so bad stop times split the train
+    continues = np.zeros(len(stops), dtype=bool)
+    continues[1:] = (train[1:] == train[:-1]) & valid[1:] & valid[:-1] & (departure[1:] >= arrival[:-1])
+    trip = np.cumsum(~continues).astype(np.int32)
+    keep = valid & (timetable.stations[stops] != timetable.stations[stops + 1])    #Staying at one station takes no one anywhere
+    stops, train, trip, departure, arrival = stops[keep], train[keep], trip[keep], departure[keep], arrival[keep]
+
+    order = np.argsort(departure, kind='stable')
+    return ConnectionScan(
+        timetable=timetable,
+        departure=departure[order],
+        arrival=arrival[order],
+        from_station=timetable.stations[stops][order],
+        to_station=timetable.stations[stops + 1][order],
+        train=train[order],
+        trip=trip[order],
+        stop=stops[order],
+    )
@@ -0,0 +1,357 @@
+import hashlib
+import heapq
+import os
+
+import numpy as np
+
+from timetable import code_index
+
+INF = float('inf')
+FORMAT_VERSION = 1
+
+
+# Customizable contraction hierarchy over the station graph. Contraction only looks at the
+# topology: stations are eliminated in min-degree order and the fill-in edges make every
+# station's higher-ranked neighbours a clique. Each undirected "arc" {u, v} of that
+# supergraph is stored once, in the row of its lower-ranked end, with one weight for each
+# direction. Customization turns a cost array into those arc weights by processing lower
+# triangles level by level, so a delay refresh re-customizes without re-contracting.
+# Triangle {w, u, v} (rank w < u < v) is stored as its lower arc {w, u}, upper arc {w, v},
+# top arc {u, v} and its bottom station w (tri_middle).
+class ContractionHierarchy:
+    def __init__(self, station_codes, fingerprint, rank, up_indptr, up_heads, tree_parent,
+                 edge_arcs, edge_upward, tri_lower, tri_upper, tri_top, tri_middle, level_indptr):
+        self.station_codes = station_codes
+        self.fingerprint = fingerprint
+        self.rank = rank
+        self.up_indptr = up_indptr
+        self.up_heads = up_heads
+        self.tree_parent = tree_parent
+        self.edge_arcs = edge_arcs
+        self.edge_upward = edge_upward
+        self.tri_lower = tri_lower
+        self.tri_upper = tri_upper
+        self.tri_top = tri_top
+        self.tri_middle = tri_middle
+        self.level_indptr = level_indptr
+
+        # Triangles grouped by each of their arcs, for path unpacking
+        self.by_top = _group_by(tri_top, len(up_heads))
+        self.by_lower = _group_by(tri_lower, len(up_heads))
+        self.by_upper = _group_by(tri_upper, len(up_heads))
+        self.arc_tails = np.repeat(np.arange(len(rank)), np.diff(up_indptr))
+
+        # Depth below the elimination-tree root: the upper neighbours of a station are all
+        # its ancestors, so the rows of one depth only read rows of smaller depths
+        depth = np.zeros(len(rank), dtype=np.int64)
+        for station in np.argsort(-rank).tolist():
+            if tree_parent[station] != -1:
+                depth[station] = depth[tree_parent[station]] + 1
+        order = np.argsort(depth[tri_middle], kind='stable')
+        self.top_down = order
+        self.depth_indptr = np.searchsorted(depth[tri_middle][order], np.arange(int(depth.max(initial=0)) + 2), side='left')
+
+    def __len__(self):
+        return len(self.station_codes)
+
+    def customize(self, graph):
+        arc_count = len(self.up_heads)
+        up = np.full(arc_count, INF)
+        down = np.full(arc_count, INF)
+        used = self.edge_arcs >= 0
+        upward = used & self.edge_upward
+        downward = used & ~self.edge_upward
+        np.minimum.at(up, self.edge_arcs[upward], graph.costs[upward])
+        np.minimum.at(down, self.edge_arcs[downward], graph.costs[downward])
+        original_up, original_down = up.copy(), down.copy()
+
+        for level in range(len(self.level_indptr) - 1):
+            triangles = slice(self.level_indptr[level], self.level_indptr[level + 1])
+            lower, upper, top = self.tri_lower[triangles], self.tri_upper[triangles], self.tri_top[triangles]
+            np.minimum.at(up, top, down[lower] + up[upper])
+            np.minimum.at(down, top, down[upper] + up[lower])
+
+        # Perfect customization needs strictly positive costs: then every arc a triangle can
+        # replace is strictly heavier than both halves, so pruning all of them is safe
+        keep_up, keep_down = up < INF, down < INF
+        if len(graph.costs) and graph.costs.min() > 0:
+            self._perfect(up, down)
+            keep_up, keep_down = self._necessary(up, down)
+        return CustomizedHierarchy(self, up, down, original_up, original_down, keep_up, keep_down)
+
+    # Top-down pass over upper and intermediate triangles, after which every arc weight is
+    # the exact distance between its ends. The rows of one depth are relaxed together,
+    # repeating while a pass still changes something (arcs of one row read each other).
+    def _perfect(self, up, down):
+        for depth in range(len(self.depth_indptr) - 1):
+            triangles = self.top_down[self.depth_indptr[depth]:self.depth_indptr[depth + 1]]
+            lower, upper, top = self.tri_lower[triangles], self.tri_upper[triangles], self.tri_top[triangles]
+            arcs = np.concatenate([lower, upper])
+            changed = len(triangles) > 0
+            while changed:
+                before = np.concatenate([up[arcs], down[arcs]])
+                np.minimum.at(up, lower, up[upper] + down[top])
+                np.minimum.at(down, lower, up[top] + down[upper])
+                np.minimum.at(up, upper, up[lower] + up[top])
+                np.minimum.at(down, upper, down[top] + down[lower])
+                changed = bool((np.concatenate([up[arcs], down[arcs]]) < before).any())
+
+    # Arc directions that no upper or intermediate triangle can stand in for
+    def _necessary(self, up, down):
+        lower, upper, top = self.tri_lower, self.tri_upper, self.tri_top
+        keep_up, keep_down = up < INF, down < INF
+        keep_up[lower[up[upper] + down[top] == up[lower]]] = False
+        keep_down[lower[up[top] + down[upper] == down[lower]]] = False
+        keep_up[upper[up[lower] + up[top] == up[upper]]] = False
+        keep_down[upper[down[top] + down[lower] == down[upper]]] = False
+        return keep_up, keep_down
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, format_version=FORMAT_VERSION, station_codes=self.station_codes.astype(str),
+                     fingerprint=self.fingerprint, rank=self.rank, up_indptr=self.up_indptr, up_heads=self.up_heads,
+                     tree_parent=self.tree_parent, edge_arcs=self.edge_arcs, edge_upward=self.edge_upward,
+                     tri_lower=self.tri_lower, tri_upper=self.tri_upper, tri_top=self.tri_top,
+                     tri_middle=self.tri_middle, level_indptr=self.level_indptr)
+
+
+# Arc weights of one metric. The query graph keeps, per direction, only the arcs that
+# are finite and (after perfect customization) not replaceable by a triangle, as rows
+# (indptr, heads, weights, arc ids) over the lower-ranked end of each arc.
+class CustomizedHierarchy:
+    def __init__(self, hierarchy, up, down, original_up, original_down, keep_up, keep_down):
+        self.hierarchy = hierarchy
+        self.up = up
+        self.down = down
+        self.original_up = original_up
+        self.original_down = original_down
+        self.upward_rows = _rows(hierarchy, up, keep_up)
+        self.downward_rows = _rows(hierarchy, down, keep_down)
+        self._tree_parent = hierarchy.tree_parent.tolist()
+
+    # Elimination-tree query: every station in the upward search space of s is an ancestor
+    # of s, so each side is one sweep up the tree, with no priority queue.
+    def _sweep(self, start, rows):
+        indptr, heads, weights, arcs = rows
+        tree_parent = self._tree_parent
+        dist = {start: 0}
+        reached_by = {}
+        station = start
+        while station != -1:
+            current = dist.get(station, INF)
+            if current < INF:
+                for position in range(indptr[station], indptr[station + 1]):
+                    neighbor = heads[position]
+                    total_cost = current + weights[position]
+                    if total_cost < dist.get(neighbor, INF):
+                        dist[neighbor] = total_cost
+                        reached_by[neighbor] = (station, arcs[position])
+            station = tree_parent[station]
+        return dist, reached_by
+
+    def shortest_path(self, source, target):
+        forward, forward_by = self._sweep(source, self.upward_rows)
+        backward, backward_by = self._sweep(target, self.downward_rows)
+        best, meeting = INF, -1
+        for station, cost in forward.items():
+            total_cost = cost + backward.get(station, INF)
+            if total_cost < best:
+                best, meeting = total_cost, station
+        if meeting == -1:
+            return INF, []
+
+        path = [meeting]
+        station = meeting
+        while station != source:
+            station, arc = forward_by[station]
+            path[:0] = self._unpack(arc, upward=True)[:-1]
+        station = meeting
+        while station != target:
+            station, arc = backward_by[station]
+            path.extend(self._unpack(arc, upward=False)[1:])
+        return best, path
+
+    # Expands one arc (lower -> head when upward, head -> lower otherwise) into the
+    # stations of the original edges it stands for, in travel order. An arc is split at
+    # the third station of a triangle whose two halves add up to its weight; halves are
+    # pushed last-leg first so the first leg is expanded next.
+    def _unpack(self, arc, upward):
+        pending = [(arc, upward)]
+        hops = []
+        while pending:
+            arc, upward = pending.pop()
+            halves = self._split(arc, upward)
+            if halves is None:
+                hops.append((arc, upward))
+            else:
+                pending.extend(reversed(halves))
+
+        hierarchy = self.hierarchy
+        stations = []
+        for arc, upward in hops:
+            lower = int(hierarchy.arc_tails[arc])
+            head = int(hierarchy.up_heads[arc])
+            if not stations:
+                stations.append(lower if upward else head)
+            stations.append(head if upward else lower)
+        return stations
+
+    # The two legs (arc, upward) an arc is made of, or None when it is an original edge.
+    # With perfect weights the halves through a higher station are strictly lighter than
+    # the arc, so splitting always terminates.
+    def _split(self, arc, upward):
+        hierarchy, up, down = self.hierarchy, self.up, self.down
+        weight = up[arc] if upward else down[arc]
+        if weight == (self.original_up[arc] if upward else self.original_down[arc]):
+            return None
+        # arc = {u, v}, third station w below both
+        for triangle in _triangles(hierarchy.by_top, arc):
+            lower, upper = hierarchy.tri_lower[triangle], hierarchy.tri_upper[triangle]
+            if upward and down[lower] + up[upper] == weight:
+                return (lower, False), (upper, True)
+            if not upward and down[upper] + up[lower] == weight:
+                return (upper, False), (lower, True)
+        # arc = {w, u}, third station v above both
+        for triangle in _triangles(hierarchy.by_lower, arc):
+            upper, top = hierarchy.tri_upper[triangle], hierarchy.tri_top[triangle]
+            if upward and up[upper] < weight and down[top] < weight and up[upper] + down[top] == weight:
+                return (upper, True), (top, False)
+            if not upward and up[top] < weight and down[upper] < weight and up[top] + down[upper] == weight:
+                return (top, True), (upper, False)
+        # arc = {w, v}, third station u between them
+        for triangle in _triangles(hierarchy.by_upper, arc):
+            lower, top = hierarchy.tri_lower[triangle], hierarchy.tri_top[triangle]
+            if upward and up[lower] < weight and up[top] < weight and up[lower] + up[top] == weight:
+                return (lower, True), (top, True)
+            if not upward and down[top] < weight and down[lower] < weight and down[top] + down[lower] == weight:
+                return (top, False), (lower, False)
+        return None
+
+    def find_fastest_route(self, start, end):
+        codes = self.hierarchy.station_codes
+        source = code_index(codes, start)
+        target = code_index(codes, end)
+        if source is None or target is None:
+            return INF, []
+        cost, path = self.shortest_path(source, target)
+        return cost, codes[path].tolist()
+
+
+def _group_by(arcs, arc_count):
+    indptr = np.zeros(arc_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(arcs, minlength=arc_count), out=indptr[1:])
+    return indptr, np.argsort(arcs, kind='stable')
+
+
+def _triangles(group, arc):
+    indptr, order = group
+    return order[indptr[arc]:indptr[arc + 1]].tolist()
+
+
+def _rows(hierarchy, weights, keep):
+    arcs = np.flatnonzero(keep)
+    indptr = np.zeros(len(hierarchy) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(hierarchy.arc_tails[arcs], minlength=len(hierarchy)), out=indptr[1:])
+    return indptr.tolist(), hierarchy.up_heads[arcs].tolist(), weights[arcs].tolist(), arcs.tolist()
+
+
+def topology_fingerprint(graph):
+    digest = hashlib.sha1()
+    for array in (graph.indptr, graph.indices):
+        digest.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+    digest.update("\0".join(graph.station_codes.tolist()).encode())
+    return digest.hexdigest()
+
+
+def contract(graph):
+    n = len(graph)
+    sources = np.repeat(np.arange(n), np.diff(graph.indptr))
+    neighbours = [set() for _ in range(n)]
+    for u, v in zip(sources.tolist(), graph.indices.tolist()):
+        if u != v:
+            neighbours[u].add(v)
+            neighbours[v].add(u)
+
+    # Min-degree elimination with fill-in; up_neighbours[x] are x's neighbours when eliminated
+    rank = np.full(n, -1, dtype=np.int64)
+    up_neighbours = [None] * n
+    queue = [(len(adjacent), station) for station, adjacent in enumerate(neighbours)]
+    heapq.heapify(queue)
+    next_rank = 0
+    while queue:
+        degree, station = heapq.heappop(queue)
+        if rank[station] >= 0 or degree != len(neighbours[station]):
+            continue
+        rank[station] = next_rank
+        next_rank += 1
+        adjacent = neighbours[station]
+        up_neighbours[station] = adjacent
+        for neighbor in adjacent:
+            neighbours[neighbor].discard(station)
+            neighbours[neighbor].update(adjacent)
+            neighbours[neighbor].discard(neighbor)
+            heapq.heappush(queue, (len(neighbours[neighbor]), neighbor))
+        neighbours[station] = set()
+
+    # Upward arcs in CSR form, rows sorted by head id for arc lookups
+    up_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(adjacent) for adjacent in up_neighbours], out=up_indptr[1:])
+    up_heads = np.array([head for adjacent in up_neighbours for head in sorted(adjacent)], dtype=np.int64)
+    rows = up_heads.tolist()
+    arc_of = {}
+    tree_parent = np.full(n, -1, dtype=np.int64)
+    for station in range(n):
+        row = rows[up_indptr[station]:up_indptr[station + 1]]
+        for offset, head in enumerate(row):
+            arc_of[station, head] = int(up_indptr[station]) + offset
+        if row:
+            tree_parent[station] = min(row, key=lambda head: rank[head])
+
+    edge_arcs = np.array([arc_of.get((u, v), arc_of.get((v, u), -1)) for u, v in zip(sources.tolist(), graph.indices.tolist())],
+                         dtype=np.int64)
+    edge_upward = rank[sources] < rank[graph.indices]
+
+    # Lower triangles {w, u, v} with rank w < rank u < rank v, tagged with the level of w in
+    # the elimination tree so one level can be customized as a single vectorized step
+    level = np.zeros(n, dtype=np.int64)
+    triangles = []
+    for station in np.argsort(rank).tolist():
+        row = sorted(rows[up_indptr[station]:up_indptr[station + 1]], key=lambda head: rank[head])
+        for head in row:
+            level[head] = max(level[head], level[station] + 1)
+        for i, u in enumerate(row):
+            for v in row[i + 1:]:
+                triangles.append((level[station], arc_of[station, u], arc_of[station, v], arc_of[u, v], station))
+    triangles.sort(key=lambda triangle: triangle[0])
+    triangles = np.array(triangles, dtype=np.int64).reshape(-1, 5)
+    level_indptr = np.searchsorted(triangles[:, 0], np.arange(int(level.max(initial=0)) + 2), side='left')
+
+    return ContractionHierarchy(
+        station_codes=graph.station_codes,
+        fingerprint=topology_fingerprint(graph),
+        rank=rank,
+        up_indptr=up_indptr,
+        up_heads=up_heads,
+        tree_parent=tree_parent,
+        edge_arcs=edge_arcs,
+        edge_upward=edge_upward,
+        tri_lower=triangles[:, 1],
+        tri_upper=triangles[:, 2],
+        tri_top=triangles[:, 3],
+        tri_middle=triangles[:, 4],
+        level_indptr=level_indptr,
+    )
+
+
+# Loads the hierarchy saved at path when it was built for this graph's topology,
+# otherwise contracts the graph and saves the result there
+def load_or_contract(graph, path):
+    fingerprint = topology_fingerprint(graph)
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as saved:
+            if int(saved["format_version"]) == FORMAT_VERSION and str(saved["fingerprint"]) == fingerprint:
+                fields = {name: saved[name] for name in saved.files if name not in ("format_version", "station_codes", "fingerprint")}
+                return ContractionHierarchy(station_codes=graph.station_codes, fingerprint=fingerprint, **fields)
+    hierarchy = contract(graph)
+    hierarchy.save(path)
+    return hierarchy
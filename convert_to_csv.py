@@ -1,104 +1,359 @@
+import argparse
 import json
+import os
+import re
+
 import pandas as pd
 
-#Converting stations json file to csv
-with open("dataset_2\stations.json", "r", encoding="utf-8") as f:
-    stations_data = json.load(f)
-
-stations_list = []
-for station in stations_data["features"]:
-    properties = station["properties"]
-    geometry = station["geometry"]
-    
-    coordinates = geometry["coordinates"] if geometry else [None, None]
-    stations_list.append({
-        "station_code": properties.get("code", None),
-        "station_name": properties.get("name", None),
-        "state": properties.get("state", None),
-        "zone": properties.get("zone", None),
-        "latitude": coordinates[1],
-        "longitude": coordinates[0],
-        "address": properties.get("address", None)
-    })
-df_stations = pd.DataFrame(stations_list)
-df_stations.to_csv("dataset_2\csv_format\stations.csv", index=False, encoding="utf-8")
-
-#Converting trains json file to csv
-filepath = r"C:\Users\samia\OneDrive\Documents\capstone_project\dataset_2\trains.json"
-
-with open(filepath, "r", encoding="utf-8") as f:
-    trains_data = json.load(f)
-
-trains_list = []
-for train in trains_data["features"]:
-    properties = train["properties"]
-    trains_list.append({
-        "train_number": properties.get("number", None),
-        "train_name": properties.get("name", None),
-        "train_type": properties.get("type", None),
-        "zone": properties.get("zone", None),
-        "departure_time": properties.get("departure", None),                                #converting json files to dataframe/csv using pandas 
-        "arrival_time": properties.get("arrival", None),                                    #it iterates through the json files and keeps adding 
-        "duration_h": properties.get("duration_h", None),                                   #the flattened featured identified to a list of dictionaries
-        "duration_m": properties.get("duration_m", None),                                   #which then is finally converted to a csv file
-        "distance_km": properties.get("distance", None),
-        "from_station_code": properties.get("from_station_code", None),
-        "from_station_name": properties.get("from_station_name", None),
-        "to_station_code": properties.get("to_station_code", None),
-        "to_station_name": properties.get("to_station_name", None),
-        "return_train": properties.get("return_train", None),
-        "first_ac": properties.get("first_ac", 0),
-        "second_ac": properties.get("second_ac", 0),
-        "third_ac": properties.get("third_ac", 0),
-        "sleeper": properties.get("sleeper", 0),
-        "chair_car": properties.get("chair_car", 0),
-        "first_class": properties.get("first_class", 0),
-        "classes_available": properties.get("classes", None)
-    })
-df_trains = pd.DataFrame(trains_list)
-df_trains.to_csv("trains.csv", index=False, encoding="utf-8")
-
-#Merging the now converted stations and trains csv file with already existing schedules csv file
-fp1 = r"C:\Users\samia\OneDrive\Documents\capstone_project\dataset_2\csv_format\schedules.csv"
-fp2 = r"C:\Users\samia\OneDrive\Documents\capstone_project\dataset_2\csv_format\stations.csv"
-fp3 = r"C:\Users\samia\OneDrive\Documents\capstone_project\dataset_2\csv_format\trains.csv"
-df_schedules = pd.read_csv(fp1)
-df_stations = pd.read_csv(fp2)
-df_trains = pd.read_csv(fp3)
-
-df_merged = df_schedules.merge(df_trains, on="train_number", how="left")
-df_merged = df_merged.merge(df_stations, on="station_code", how="left")
-
-df_merged.to_csv("merged_train_data.csv", index=False, encoding="utf-8")
-
-print("merged")
-
-#Rest of Preprocessing
-fp = r"C:\Users\samia\OneDrive\Documents\capstone_project\merged_train_data.csv"
-df = pd.read_csv(fp)
-df.head()
-
-print("Shape of the dataset:", df.shape)
-
-print("Missing values in each column:")
-print(df.isnull().sum())
-
-df_cleaned = df.dropna(subset=["arrival"])
-
-rows_dropped = len(df) - len(df_cleaned)
-print(f"Rows dropped: {rows_dropped}")
-
-df_cleaned = df_cleaned.dropna(subset=["return_train"])
-df_cleaned = df_cleaned[df_cleaned["return_train"].astype(str).str.isnumeric()]
-
-rows_dropped = len(df) - len(df_cleaned)
-print(f"Rows dropped: {rows_dropped}")
-
-drop_columns = ["departure", "station_code", "station_name_x", "train_name_x", "station_name_y", "state", "address", "classes_available", "zone_x", "zone_y"]
-df_cleaned = df_cleaned.drop(columns=drop_columns, errors='ignore')
-
-df_cleaned["total_duration_min"] = df_cleaned["duration_h"] * 60 + df_cleaned["duration_m"]
-
-df_cleaned[['duration_h', 'duration_m', 'total_duration_min']].head()
-
-df_cleaned.to_csv('preprocessed_capstone_merged_train_data.csv', index=False)
\ No newline at end of file
+STREAM_CHUNK_CHARS = 1 << 16
+# Outside a string: a run of flat arrays (coordinate pairs; they leave the nesting as it
+# was) or one character that changes it. Inside one: what ends or escapes it.
+CONTAINER_TOKENS = re.compile(r'(?:\[[^\[\]{}"]*\][^\[\]{}"]*)+|[{}\[\]"]')
+STRING_TOKENS = re.compile(r'["\\]')
+SCHEDULE_CHUNK_ROWS = 100000
+PARQUET_DATA_PATH = "preprocessed_capstone_merged_train_data.parquet"
+CSV_DATA_PATH = "preprocessed_capstone_merged_train_data.csv"
+
+DROP_COLUMNS = ["departure", "station_code", "station_name_x", "train_name_x", "station_name_y", "state", "address", "classes_available", "zone_x", "zone_y"]
+
+# Output typing: station codes/names and train type are dictionary-encoded, counts and
+# durations are nullable ints. Any other column keeps the kind it has in the first chunk
+# (integer -> int, other numeric -> float, anything else -> text) so every chunk writes the same schema.
+CATEGORY_COLUMNS = ["from_station_code", "to_station_code", "from_station_name", "to_station_name", "train_type"]
+INTEGER_COLUMNS = ["train_number", "day", "duration_h", "duration_m", "total_duration_min", "return_train",
+                   "first_ac", "second_ac", "third_ac", "sleeper", "chair_car", "first_class"]
+FLOAT_COLUMNS = ["distance_km", "latitude", "longitude"]
+
+
+# Incremental reader over a JSON text: holds the unconsumed tail of the last chunk read
+# and decodes one value at a time from it. An object or array is first scanned for its
+# end (nesting and string state carried across chunks, so each character is looked at
+# once) and then decoded in one go; only one value is ever held in memory.
+class JsonStream:
+    def __init__(self, f, chunk_size=STREAM_CHUNK_CHARS):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+
+    # Reads one more chunk, dropping what has been consumed; False at end of file
+    def more(self):
+        chunk = self.f.read(self.chunk_size)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return bool(chunk)
+
+    # Next non-whitespace character without consuming it ('' at end of file)
+    def peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer) or not self.more():
+                return self.buffer[self.position:self.position + 1]
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        self.position += 1
+
+    def skip_past(self, text):
+        while True:
+            found = self.buffer.find(text, self.position)
+            if found >= 0:
+                self.position = found + len(text)
+                return
+            self.position = max(self.position, len(self.buffer) - len(text))
+            if not self.more():
+                raise ValueError(f"{text} not found in JSON stream")
+
+    # Reads until the object or array starting at position is whole in the buffer. Each
+    # chunk is scanned once on its own, the nesting and string state carried from one to
+    # the next, and the chunks are joined once at the end.
+    def _read_container(self):
+        depth, in_string = 0, False
+        text, index = self.buffer, self.position
+        chunks = []
+        while True:
+            match = (STRING_TOKENS if in_string else CONTAINER_TOKENS).search(text, index)
+            if match is None:
+                index = max(index - len(text), 0)                                   #1 when a backslash ended the chunk
+                text = self.f.read(self.chunk_size)
+                if not text:
+                    raise ValueError("Unterminated JSON value in stream")
+                chunks.append(text)
+                continue
+            char, index = match.group(), match.end()
+            if len(char) > 1:
+                continue
+            if in_string:
+                if char == '\\':
+                    index += 1                                                      #Skip the escaped character
+                else:
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    break
+        if chunks:
+            self.buffer = self.buffer[self.position:] + "".join(chunks)
+            self.position = 0
+
+    def value(self):
+        if self.peek() in ('{', '['):
+            self._read_container()
+            value, self.position = self.decoder.raw_decode(self.buffer, self.position)
+            return value
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.more():
+                    continue
+                raise
+            self.position = end
+            return value
+
+
+# Features of a GeoJSON FeatureCollection one at a time; only the current feature is
+# ever decoded, so memory is bounded by the largest feature, not the file
+def iter_features(path, chunk_size=STREAM_CHUNK_CHARS):
+    with open(path, "r", encoding="utf-8") as f:
+        stream = JsonStream(f, chunk_size)
+        stream.skip_past('"features"')
+        stream.expect(":")
+        stream.expect("[")
+        if stream.peek() == "]":
+            return
+        while True:
+            yield stream.value()
+            if stream.peek() != ",":
+                stream.expect("]")
+                return
+            stream.expect(",")
+
+
+def read_stations(path):
+    columns = {name: [] for name in ["station_code", "station_name", "state", "zone", "latitude", "longitude", "address"]}
+    for station in iter_features(path):
+        properties = station["properties"]
+        geometry = station["geometry"]
+        coordinates = geometry["coordinates"] if geometry else [None, None]
+        columns["station_code"].append(properties.get("code", None))
+        columns["station_name"].append(properties.get("name", None))
+        columns["state"].append(properties.get("state", None))
+        columns["zone"].append(properties.get("zone", None))
+        columns["latitude"].append(coordinates[1])
+        columns["longitude"].append(coordinates[0])
+        columns["address"].append(properties.get("address", None))
+    stations = pd.DataFrame(columns)
+    stations["latitude"] = pd.to_numeric(stations["latitude"], errors="coerce")
+    stations["longitude"] = pd.to_numeric(stations["longitude"], errors="coerce")
+    return stations
+
+
+# Flattened train properties; the route geometry (the bulk of trains.json) is decoded with
+# its feature but never kept
+TRAIN_PROPERTIES = {
+    "train_number": ("number", None),
+    "train_name": ("name", None),
+    "train_type": ("type", None),
+    "zone": ("zone", None),
+    "departure_time": ("departure", None),
+    "arrival_time": ("arrival", None),
+    "duration_h": ("duration_h", None),
+    "duration_m": ("duration_m", None),
+    "distance_km": ("distance", None),
+    "from_station_code": ("from_station_code", None),
+    "from_station_name": ("from_station_name", None),
+    "to_station_code": ("to_station_code", None),
+    "to_station_name": ("to_station_name", None),
+    "return_train": ("return_train", None),
+    "first_ac": ("first_ac", 0),
+    "second_ac": ("second_ac", 0),
+    "third_ac": ("third_ac", 0),
+    "sleeper": ("sleeper", 0),
+    "chair_car": ("chair_car", 0),
+    "first_class": ("first_class", 0),
+    "classes_available": ("classes", None),
+}
+
+
+def read_trains(path):
+    columns = {name: [] for name in TRAIN_PROPERTIES}
+    for train in iter_features(path):
+        properties = train["properties"]
+        for name, (key, default) in TRAIN_PROPERTIES.items():
+            columns[name].append(properties.get(key, default))
+    trains = pd.DataFrame(columns)
+    trains["train_number"] = _integers(trains["train_number"])
+    for name in ["duration_h", "duration_m", "distance_km"]:
+        trains[name] = pd.to_numeric(trains[name], errors="coerce")
+    trains["return_train"] = trains["return_train"].map(lambda value: None if value is None or value == "" else str(value))
+    return trains
+
+
+def _integers(series):
+    return pd.to_numeric(series, errors="coerce").round().astype("Int64")
+
+
+# Merges one chunk of schedule rows with the train and station tables and applies the
+# cleaning steps: rows need an arrival and a numeric return train, helper columns go
+def merge_and_clean(schedules, trains, stations):
+    schedules = schedules.assign(train_number=_integers(schedules["train_number"]))
+    merged = schedules.merge(trains, on="train_number", how="left")
+    merged = merged.merge(stations, on="station_code", how="left")
+    cleaned = merged.dropna(subset=["arrival"])
+    cleaned = cleaned.dropna(subset=["return_train"])
+    cleaned = cleaned[cleaned["return_train"].astype(str).str.isnumeric()]
+    cleaned = cleaned.drop(columns=DROP_COLUMNS, errors='ignore')
+    cleaned = cleaned.assign(total_duration_min=cleaned["duration_h"] * 60 + cleaned["duration_m"])
+    return merged, cleaned
+
+
+def column_kinds(df):
+    kinds = {}
+    for name in df.columns:
+        if name in CATEGORY_COLUMNS:
+            kinds[name] = "category"
+        elif name in INTEGER_COLUMNS or pd.api.types.is_integer_dtype(df[name]):
+            kinds[name] = "int"
+        elif name in FLOAT_COLUMNS or pd.api.types.is_numeric_dtype(df[name]):
+            kinds[name] = "float"
+        else:
+            kinds[name] = "string"
+    return kinds
+
+
+def _as_text(series):
+    return series.astype(object).where(series.notna(), None).map(lambda value: value if value is None else str(value))
+
+
+def typed(df, kinds):
+    columns = {}
+    for name, kind in kinds.items():
+        series = df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if kind == "int":
+            columns[name] = _integers(series)
+        elif kind == "float":
+            columns[name] = pd.to_numeric(series, errors="coerce").astype("float64")
+        else:
+            columns[name] = _as_text(series)
+    return pd.DataFrame(columns, index=df.index)
+
+
+# Writes chunks as row groups of one Parquet file (dictionary-encoded categories) or
+# appends them to one CSV file, depending on the output extension
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.kinds = None
+        self.schema = None
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.kinds is None:
+            self.kinds = column_kinds(df)
+        df = typed(df, self.kinds)
+        if self.parquet:
+            self._write_parquet(df)
+        else:
+            df.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False, encoding="utf-8")
+        self.rows += len(df)
+
+    def _write_parquet(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.schema is None:
+            types = {"category": pa.dictionary(pa.int32(), pa.string()), "int": pa.int64(), "float": pa.float64(), "string": pa.string()}
+            self.schema = pa.schema([(name, types[kind]) for name, kind in self.kinds.items()])
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        arrays = []
+        for field in self.schema:
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(df[field.name], type=pa.string(), from_pandas=True).dictionary_encode())
+            else:
+                arrays.append(pa.array(df[field.name], type=field.type, from_pandas=True))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        elif self.kinds is None and not self.parquet:
+            open(self.path, "w", encoding="utf-8").close()
+
+
+# Single pass: stations and trains are streamed into small lookup tables, then the
+# schedules are read, merged, cleaned and written chunk by chunk
+def convert(stations_path, trains_path, schedules_path, output_path, chunk_rows=SCHEDULE_CHUNK_ROWS):
+    stations = read_stations(stations_path)
+    trains = read_trains(trains_path)
+    print(f"stations: {len(stations)}  trains: {len(trains)}")
+
+    writer = ChunkWriter(output_path)
+    merged_rows, missing = 0, None
+    try:
+        for schedules in pd.read_csv(schedules_path, chunksize=chunk_rows):
+            merged, cleaned = merge_and_clean(schedules, trains, stations)
+            merged_rows += len(merged)
+            counts = merged.isnull().sum()
+            missing = counts if missing is None else missing.add(counts, fill_value=0)
+            writer.write(cleaned)
+    finally:
+        writer.close()
+
+    print("Merged rows:", merged_rows)
+    if missing is not None:
+        print("Missing values in each column:")
+        print(missing.astype(int))
+    print(f"Rows dropped: {merged_rows - writer.rows}")
+    print(f"Wrote {writer.rows} rows to {output_path}")
+    return writer.rows
+
+
+# The API and the dashboard load the converted data through here: Parquet when the
+# path ends in .parquet (only the requested columns are decoded), CSV otherwise
+def read_train_data(path, columns=None):
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, columns=columns)
+        return table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    return pd.read_csv(path, usecols=columns)
+
+
+# Column names of the converted data, without reading any rows
+def data_columns(path):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def default_data_path():
+    return PARQUET_DATA_PATH if os.path.exists(PARQUET_DATA_PATH) else CSV_DATA_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the stations/trains GeoJSON and schedules CSV into the preprocessed train data")
+    parser.add_argument("--stations", default=os.path.join("dataset_2", "stations.json"))
+    parser.add_argument("--trains", default=os.path.join("dataset_2", "trains.json"))
+    parser.add_argument("--schedules", default=os.path.join("dataset_2", "csv_format", "schedules.csv"))
+    parser.add_argument("--output", default=PARQUET_DATA_PATH, help="a .parquet path, or .csv for the old text format")
+    parser.add_argument("--chunk-rows", type=int, default=SCHEDULE_CHUNK_ROWS)
+    args = parser.parse_args()
+    convert(args.stations, args.trains, args.schedules, args.output, args.chunk_rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from convert_to_csv import data_columns, read_train_data
+from network_artifact import source_checksum
+
+STATS_COLUMNS = ["from_station_code", "to_station_code", "train_type", "total_duration_min"]  #train_type only if the file has it
+TOP_STATIONS = 10
+DURATION_BINS = 50
+KDE_POINTS = 200
+KDE_GRID_BINS = 1024
+
+
+# Gaussian KDE of the durations (Scott's bandwidth, like seaborn's kde=True), scaled to
+# histogram counts and evaluated over the histogram range. The points are first binned
+# on a fine grid, so the cost does not grow with the number of rows.
+def duration_kde(durations, edges):
+    bandwidth = durations.std(ddof=1) * len(durations) ** -0.2 if len(durations) > 1 else 0
+    if not bandwidth > 0:
+        return [], []
+    counts, fine_edges = np.histogram(durations, bins=KDE_GRID_BINS, range=(edges[0], edges[-1]))
+    centers = (fine_edges[:-1] + fine_edges[1:]) / 2
+    grid = np.linspace(edges[0], edges[-1], KDE_POINTS)
+    density = (counts * np.exp(-0.5 * ((grid[:, None] - centers) / bandwidth) ** 2)).sum(axis=1)
+    density /= len(durations) * bandwidth * math.sqrt(2 * math.pi)
+    return grid.tolist(), (density * len(durations) * (edges[1] - edges[0])).tolist()
+
+
+# Every aggregate the Statistical Dashboard plots, as plain JSON-ready lists
+def summarize(df):
+    df = df.dropna(subset=['from_station_code', 'to_station_code', 'total_duration_min'])
+    departures = df['from_station_code'].astype(str).value_counts()
+    arrivals = df['to_station_code'].astype(str).value_counts()
+
+    avg_duration = pd.Series(dtype=float)
+    if 'train_type' in df.columns:
+        avg_duration = df.groupby('train_type', observed=True)['total_duration_min'].mean().astype(float).sort_values(ascending=False).dropna()
+
+    durations = df['total_duration_min'].astype(float).to_numpy()
+    counts, edges = np.histogram(durations, bins=DURATION_BINS) if len(durations) else (np.zeros(0, dtype=np.int64), np.zeros(0))
+    kde_x, kde_y = duration_kde(durations, edges) if len(durations) else ([], [])
+
+    station_counts = pd.concat([departures, arrivals], axis=1, keys=['Departures', 'Arrivals']).fillna(0).astype(int)
+    station_counts['Total'] = station_counts.sum(axis=1)
+    top_degree = station_counts.sort_values(by='Total', ascending=False).head(TOP_STATIONS)
+
+    return {
+        "rows": len(df),
+        "top_departure_stations": [{"station": station, "departures": int(count)} for station, count in departures.head(TOP_STATIONS).items()],
+        "avg_duration_by_train_type": [{"train_type": str(train_type), "avg_duration_min": duration} for train_type, duration in avg_duration.items()],
+        "duration_histogram": {"bin_edges": edges.tolist(), "counts": counts.tolist(), "kde_x": kde_x, "kde_y": kde_y},
+        "top_connectivity": [{"station": station, "departures": int(row.Departures), "arrivals": int(row.Arrivals)}
+                             for station, row in top_degree.iterrows()],
+    }
+
+
+# Summary of one data file, recomputed only when the file changes (size or mtime); its
+# data_version is the file's checksum, so it doubles as an ETag
+class SummaryCache:
+    def __init__(self, path):
+        self.path = path
+        self._key = None
+        self._summary = None
+        self._lock = threading.Lock()
+
+    def summary(self):
+        stat = os.stat(self.path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key != self._key:
+                available = set(data_columns(self.path))
+                summary = summarize(read_train_data(self.path, columns=[name for name in STATS_COLUMNS if name in available]))
+                summary["data_version"] = source_checksum(self.path)
+                self._key, self._summary = key, summary
+            return self._summary
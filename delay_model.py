@@ -0,0 +1,253 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from convert_to_csv import data_columns, default_data_path, read_train_data
+from delay_simulation import DelaySimulator, scheduled_departure
+
+HIDDEN_UNITS = 32
+ACTIVATION_UNITS = 16
+ATTRIBUTE_COLUMNS = ["train_type", "distance_km", "total_duration_min"]
+NUMERIC_FEATURES = ["log_distance_km", "log_duration_min", "day_span", "log_stops", "station_degree", "progress", "not_started", "finished"]
+MAX_TRAINING_ROWS = 500_000
+VALIDATION_SHARE = 0.1
+PARAMETERS = ("W1", "b1", "a1", "c1", "a2", "c2", "W3", "b3")
+
+
+# Train-level columns of the data file (type, distance, duration) in timetable order;
+# missing columns and trains come back as NaN
+def train_attributes(path, timetable):
+    available = set(data_columns(path))
+    columns = [column for column in ATTRIBUTE_COLUMNS if column in available]
+    df = read_train_data(path, columns=["train_number"] + columns).drop_duplicates("train_number")
+    df.index = [str(number) for number in df["train_number"].to_numpy()]                 #Same keys as Timetable.train_ids
+    df = df.reindex(timetable.train_ids.tolist()).reset_index(drop=True)
+    for column in ATTRIBUTE_COLUMNS:
+        if column not in df:
+            df[column] = np.nan
+    return df[ATTRIBUTE_COLUMNS]
+
+
+# Model inputs per train, one row per train of the timetable. The schedule part is built
+# once; at(now_min) adds how far along its run each train is at that minute.
+class TrainFeatures:
+    def __init__(self, timetable, attributes, train_types):
+        first, last = timetable.indptr[:-1], timetable.indptr[1:] - 1
+        stops = np.diff(timetable.indptr)
+        self.start = scheduled_departure(timetable)[first].astype(np.float64)
+        self.end = timetable.arrival[last].astype(np.float64)
+
+        # Station degree: trains calling at each stop's station, log-averaged over the route
+        degree = np.log1p(np.diff(timetable.station_index.indptr))[timetable.stations]
+        mean_degree = np.add.reduceat(degree, first) / stops if len(first) else np.zeros(0)
+        types = [str(train_type) if train_type == train_type else None for train_type in attributes["train_type"].tolist()]
+        known = set(train_types)
+        one_hot = np.array([[train_type == name for name in train_types] + [train_type not in known] for train_type in types],
+                           dtype=bool).reshape(len(types), len(train_types) + 1)          #Last column: any other type
+        self.static = np.column_stack([
+            np.log1p(attributes["distance_km"].to_numpy(dtype=np.float64, na_value=np.nan)),
+            np.log1p(attributes["total_duration_min"].to_numpy(dtype=np.float64, na_value=np.nan)),
+            timetable.arrival[last] // (24 * 60) + 1,
+            np.log1p(stops),
+            mean_degree,
+        ]).astype(np.float32)
+        self.one_hot = one_hot.astype(np.float32)
+        self.names = NUMERIC_FEATURES + [f"type_{train_type}" for train_type in train_types] + ["type_other"]
+
+    def __len__(self):
+        return len(self.start)
+
+    def at(self, now_min):
+        progress = np.clip((now_min - self.start) / np.maximum(self.end - self.start, 1), 0, 1)
+        return np.column_stack([self.static, progress, now_min < self.start, now_min > self.end, self.one_hot]).astype(np.float32)
+
+
+def init_parameters(feature_count, rng):
+    def glorot(fan_in, fan_out):
+        limit = np.sqrt(6 / (fan_in + fan_out))
+        return rng.uniform(-limit, limit, (fan_in, fan_out))
+
+    return {
+        "W1": glorot(feature_count, HIDDEN_UNITS), "b1": np.zeros(HIDDEN_UNITS),
+        "a1": glorot(1, ACTIVATION_UNITS)[0], "c1": np.zeros(ACTIVATION_UNITS),
+        "a2": glorot(ACTIVATION_UNITS, 1)[:, 0], "c2": np.zeros(()),
+        "W3": glorot(HIDDEN_UNITS, 1)[:, 0], "b3": np.zeros(()),
+    }
+
+
+# The network of "custom activation.py": Dense(32) -> DynamicActivation -> Dense(1), where
+# the dynamic activation is a 1 -> 16 (relu) -> 1 network applied to every hidden value
+# on its own. Written out with the (rows, 32, 16) intermediate, as Keras runs it.
+def forward(parameters, x):
+    hidden = x @ parameters["W1"] + parameters["b1"]
+    inner = hidden[..., None] * parameters["a1"] + parameters["c1"]
+    active = np.maximum(inner, 0)
+    activated = active @ parameters["a2"] + parameters["c2"]
+    return activated @ parameters["W3"] + parameters["b3"], (hidden, inner, active, activated)
+
+
+# Mean squared error and its gradient for every parameter (backpropagation by hand)
+def loss_and_gradients(parameters, x, y):
+    output, (hidden, inner, active, activated) = forward(parameters, x)
+    error = output - y
+    d_output = 2 * error / len(y)
+    d_activated = d_output[:, None] * parameters["W3"]
+    d_inner = d_activated[..., None] * parameters["a2"] * (inner > 0)
+    d_hidden = (d_inner * parameters["a1"]).sum(axis=-1)
+    gradients = {
+        "W3": activated.T @ d_output, "b3": d_output.sum(),
+        "a2": np.einsum("bha,bh->a", active, d_activated), "c2": d_activated.sum(),
+        "a1": np.einsum("bha,bh->a", d_inner, hidden), "c1": d_inner.sum(axis=(0, 1)),
+        "W1": x.T @ d_hidden, "b1": d_hidden.sum(axis=0),
+    }
+    return float((error ** 2).mean()), gradients
+
+
+# Mini-batch Adam on standardized inputs and targets
+def fit(x, y, epochs=20, batch_size=512, learning_rate=3e-3, seed=0, log=None):
+    rng = np.random.default_rng(seed)
+    parameters = init_parameters(x.shape[1], rng)
+    first = {name: np.zeros_like(value) for name, value in parameters.items()}
+    second = {name: np.zeros_like(value) for name, value in parameters.items()}
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    step = 0
+    for epoch in range(epochs):
+        order = rng.permutation(len(x))
+        losses = []
+        for start in range(0, len(x), batch_size):
+            batch = order[start:start + batch_size]
+            loss, gradients = loss_and_gradients(parameters, x[batch], y[batch])
+            losses.append(loss)
+            step += 1
+            for name, gradient in gradients.items():
+                first[name] = beta1 * first[name] + (1 - beta1) * gradient
+                second[name] = beta2 * second[name] + (1 - beta2) * gradient ** 2
+                corrected = first[name] / (1 - beta1 ** step), second[name] / (1 - beta2 ** step)
+                parameters[name] = parameters[name] - learning_rate * corrected[0] / (np.sqrt(corrected[1]) + epsilon)
+        if log is not None:
+            log(f"epoch {epoch + 1}/{epochs}: loss {np.mean(losses):.4f}")
+    return parameters
+
+
+# The dynamic activation is a sum of relus of one input, so it is piecewise linear with a
+# knee where each relu switches: sorted knees plus a slope and intercept per piece give
+# the same function with one binary search per value instead of 16 relu units
+def activation_pieces(a1, c1, a2, c2):
+    sloped = a1 != 0
+    knees = np.unique(-c1[sloped] / a1[sloped])
+    if len(knees):
+        probes = np.concatenate([knees[:1] - 1, (knees[:-1] + knees[1:]) / 2, knees[-1:] + 1])
+    else:
+        probes = np.zeros(1)
+    on = (probes[:, None] * a1 + c1) > 0
+    return knees, (on * (a2 * a1)).sum(axis=1), (on * (a2 * c1)).sum(axis=1) + c2
+
+
+# Trained delay model as exported to .npz: parameters plus the input and target scaling.
+# Loading and predicting need numpy only.
+class DelayModel:
+    def __init__(self, parameters, feature_mean, feature_std, target_mean, target_std, train_types):
+        self.parameters = {name: np.asarray(value, dtype=np.float64) for name, value in parameters.items()}
+        self.feature_mean, self.feature_std = np.asarray(feature_mean, dtype=np.float32), np.asarray(feature_std, dtype=np.float32)
+        self.target_mean, self.target_std = float(target_mean), float(target_std)
+        self.train_types = [str(train_type) for train_type in train_types]
+        p = self.parameters
+        self.W1, self.b1 = p["W1"].astype(np.float32), p["b1"].astype(np.float32)
+        self.W3, self.b3 = p["W3"].astype(np.float32), np.float32(p["b3"])
+        knees, slopes, intercepts = activation_pieces(p["a1"], p["c1"], p["a2"], p["c2"])
+        self.knees, self.slopes, self.intercepts = knees.astype(np.float32), slopes.astype(np.float32), intercepts.astype(np.float32)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in PARAMETERS}, data["feature_mean"], data["feature_std"],
+                       data["target_mean"], data["target_std"], data["train_types"].tolist())
+
+    def save(self, path):
+        with open(path, "wb") as f:                            #np.savez would append .npz to a bare path
+            np.savez(f, **self.parameters, feature_mean=self.feature_mean, feature_std=self.feature_std,
+                     target_mean=self.target_mean, target_std=self.target_std, train_types=np.array(self.train_types, dtype=str))
+
+    def features(self, timetable, attributes):
+        return TrainFeatures(timetable, attributes, self.train_types)
+
+    def standardize(self, features):
+        x = (features - self.feature_mean) / self.feature_std
+        return np.nan_to_num(x, nan=0.0)                       #Unknown attribute: the training mean
+
+    # Delay in minutes for every row of features, in one batched pass
+    def predict(self, features):
+        hidden = self.standardize(features) @ self.W1 + self.b1
+        piece = np.searchsorted(self.knees, hidden)
+        activated = self.slopes[piece] * hidden + self.intercepts[piece]
+        return np.maximum((activated @ self.W3 + self.b3) * self.target_std + self.target_mean, 0)
+
+    # Same prediction through the layers as written (reference for predict)
+    def predict_layers(self, features):
+        output, _ = forward(self.parameters, self.standardize(features).astype(np.float64))
+        return np.maximum(output * self.target_std + self.target_mean, 0)
+
+
+# Inputs and the simulated delay of every train at random minutes of seeded simulator runs
+def training_set(simulator, features, runs, samples_per_run, seed=0):
+    rng = np.random.default_rng(seed)
+    x, y = [], []
+    for run in range(runs):
+        forecast = simulator.run([seed, run])
+        for now_min in rng.uniform(features.start.min(), features.end.max(), samples_per_run):
+            x.append(features.at(now_min))
+            y.append(forecast.train_delays(now_min).astype(np.float32))
+    x, y = np.concatenate(x), np.concatenate(y)
+    if len(x) > MAX_TRAINING_ROWS:
+        keep = rng.choice(len(x), MAX_TRAINING_ROWS, replace=False)
+        x, y = x[keep], y[keep]
+    return x, y
+
+
+def train(timetable, attributes, runs=8, samples_per_run=4, epochs=20, seed=0, log=None):
+    types = attributes["train_type"].dropna().astype(str)
+    train_types = sorted(types.unique().tolist())
+    features = TrainFeatures(timetable, attributes, train_types)
+    x, y = training_set(DelaySimulator(timetable), features, runs, samples_per_run, seed)
+
+    feature_mean = np.nanmean(x, axis=0)
+    feature_std = np.nanstd(x, axis=0)
+    feature_mean, feature_std = np.nan_to_num(feature_mean), np.where(np.nan_to_num(feature_std) > 0, np.nan_to_num(feature_std), 1)
+    target_mean, target_std = float(y.mean()), float(y.std()) or 1.0
+    scaled = np.nan_to_num((x - feature_mean) / feature_std)
+    target = (y - target_mean) / target_std
+
+    validation = np.random.default_rng(seed).random(len(x)) < VALIDATION_SHARE
+    parameters = fit(scaled[~validation], target[~validation], epochs=epochs, seed=seed, log=log)
+    model = DelayModel(parameters, feature_mean, feature_std, target_mean, target_std, train_types)
+    if validation.any():
+        error = np.abs(model.predict(x[validation]) - y[validation]).mean()
+        baseline = np.abs(y[~validation].mean() - y[validation]).mean()
+        if log is not None:
+            log(f"validation MAE {error:.2f} min (constant prediction {baseline:.2f} min) on {validation.sum()} rows")
+    return model
+
+
+def main():
+    from network_artifact import load_or_compile
+
+    parser = argparse.ArgumentParser(description="Train the delay model on simulated delays and export it for the API (DELAY_MODEL_PATH)")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--output", default="delay_model.npz")
+    parser.add_argument("--runs", type=int, default=8, help="seeded simulator runs to learn from")
+    parser.add_argument("--samples", type=int, default=4, help="minutes sampled per run")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timetable = load_or_compile(args.data, os.environ.get("NETWORK_ARTIFACT_PATH", args.data + ".network")).timetable
+    model = train(timetable, train_attributes(args.data, timetable), args.runs, args.samples, args.epochs, args.seed, log=print)
+    model.save(args.output)
+    print(f"Wrote {args.output} ({len(timetable)} trains, {time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+import heapq
+
+import numpy as np
+
+INF = float('inf')
+NO_BOUND = -(1 << 62)                                  #Running maximum over no stops
+
+MIN_DWELL_MIN = 1
+RUNNING_RECOVERY = 0.05
+MAX_PRIMARY_DELAY_MIN = 30
+INCIDENT_RATE = 0.01
+MAX_INCIDENT_MIN = 15
+
+
+# Scheduled departures with bad stop times (departure before arrival) moved up to the arrival
+def scheduled_departure(timetable):
+    return np.maximum(timetable.departure, timetable.arrival)
+
+
+# Platforms held at each stop's station when its train arrives: stays there whose event
+# came first that have not left yet. Events go by order, by default time * n + stop; a
+# stop whose turn comes after its time (see DelaySimulator) is counted against every stay
+# that arrived before its turn, which may count one too many but never misses one. A
+# platform freed at t is free for an arrival at t, and a stay of zero length (the train
+# leaves the minute it arrives) never holds one.
+def platforms_held(stations, arrival, leave, order=None):
+    n = len(arrival)
+    key = arrival * n + np.arange(n)
+    if order is None:
+        order = key
+    stays = leave > arrival
+    low = int(key.min(initial=0)) - n
+    span = max(int(order.max(initial=0)), int(leave.max(initial=0)) * n) - low + 1
+    offset = stations.astype(np.int64) * span - low                  #One sorted run of keys per station
+    arrived = np.sort((offset + key)[stays])
+    freed = np.sort((offset + leave * n - 1)[stays])
+    held = np.searchsorted(arrived, offset + order, side='right') - np.searchsorted(freed, offset + key)
+    return held - stays                                                #Not counting its own stay
+
+
+# Platforms per station: enough for every arrival of the schedule itself to find one
+# free (each stay occupying it from arrival to departure), so the undelayed timetable
+# never conflicts and every conflict comes from a delay
+def station_platforms(timetable):
+    held = platforms_held(timetable.stations, timetable.arrival, scheduled_departure(timetable))
+    platforms = np.ones(len(timetable.station_codes), dtype=np.int64)
+    np.maximum.at(platforms, timetable.stations, held + 1)
+    return platforms
+
+
+# Predicted delays and minute offsets for every stop of the timetable, aligned with its
+# arrays; injected holds the disturbances a simulator run started from (None otherwise)
+class DelayForecast:
+    def __init__(self, timetable, arrival_delay, departure_delay, injected=None):
+        self.timetable = timetable
+        self.arrival_delay = arrival_delay
+        self.departure_delay = departure_delay
+        self.injected = injected
+        self.arrival = timetable.arrival + arrival_delay
+        self.departure = scheduled_departure(timetable) + departure_delay
+        self.stop_delay = np.maximum(self.arrival_delay, self.departure_delay)
+        for array in (self.arrival, self.departure, self.arrival_delay, self.departure_delay, self.stop_delay):
+            array.setflags(write=False)
+
+    def max_delay(self):
+        return int(self.stop_delay.max(initial=0))
+
+    # Delay of each train right now: its departure delay at the first stop it has not
+    # left yet, or its arrival delay at the terminus once it has run. now_min is one
+    # pattern minute for all trains or one per train (each at its own service day).
+    def train_delays(self, now_min):
+        timetable = self.timetable
+        if len(timetable) == 0:
+            return np.zeros(0, dtype=np.int64)
+        if np.ndim(now_min):
+            now_min = np.repeat(now_min, np.diff(timetable.indptr))
+        stops = np.arange(len(self.departure))
+        pending = np.where(self.departure >= now_min, stops, len(stops))
+        next_stop = np.minimum.reduceat(pending, timetable.indptr[:-1])
+        terminus = timetable.indptr[1:] - 1
+        running = next_stop <= terminus
+        return np.where(running, self.departure_delay[np.minimum(next_stop, terminus)], self.arrival_delay[terminus])
+
+
+# Simulation of one run of every train. A station's platforms are taken in the order
+# trains reach it (by time, then stop, but never before the train's previous stop, which
+# matters where stop times run backwards): an arriving train takes the platform that
+# comes free first, waiting for it if needed, and holds it until it leaves. Delay enters as a
+# primary delay at the origin and random incidents at stops. It is recovered in the
+# dwell (a late train may cut its scheduled dwell down to MIN_DWELL_MIN) and on the run
+# to the next stop (a late train makes up a RUNNING_RECOVERY share of the scheduled run
+# time). Delays are carried from stop to stop rather than absolute times, so bad stop
+# times cannot invent delay.
+#
+# Most stations never run out of platforms, and without waits a train's delay depends on
+# its own stops only, so delays are first carried along every train at once with numpy,
+# one stop position per step. Stations where that leaves an arrival without a free
+# platform become contended: only their stops go through an event heap (the rest of a
+# train's run in between is a closed form), and the numpy pass fills in every other
+# stop. This repeats until no uncontended station is short of platforms, which gives
+# exactly the delays of simulating every stop as an event.
+class DelaySimulator:
+    def __init__(self, timetable, min_dwell=MIN_DWELL_MIN, running_recovery=RUNNING_RECOVERY):
+        self.timetable = timetable
+        self.platforms = station_platforms(timetable)
+
+        self.arrival, self.departure = timetable.arrival, scheduled_departure(timetable)
+        self.min_dwell = np.minimum(self.departure - self.arrival, min_dwell)
+        self.slack = self.departure - self.arrival - self.min_dwell                    #Dwell a late train can cut
+        run = np.zeros(len(self.arrival), dtype=np.int64)
+        run[:-1] = np.maximum(self.arrival[1:] - self.departure[:-1], 0)
+        self.recovery = np.floor(run * running_recovery).astype(np.int64)
+        self.terminus = np.zeros(len(self.arrival), dtype=bool)
+        self.terminus[timetable.indptr[1:] - 1] = True
+
+        # Stop k of every train as one index array, longest trains first so that the
+        # trains still running at position k are a prefix
+        lengths = np.diff(timetable.indptr)
+        order = np.argsort(-lengths, kind='stable')
+        first, lengths = timetable.indptr[:-1][order], lengths[order]
+        counts = np.searchsorted(-lengths, -np.arange(1, lengths.max(initial=0) + 1), side='right')
+        self._positions = [first[:count] + k for k, count in enumerate(counts.tolist())]
+        self._last_stop = np.repeat(timetable.indptr[1:] - 1, np.diff(timetable.indptr))
+
+    # Seeded disturbances: a primary delay per train at its origin plus incidents at random stops
+    def disturbances(self, seed=None, max_primary=MAX_PRIMARY_DELAY_MIN, incident_rate=INCIDENT_RATE, max_incident=MAX_INCIDENT_MIN):
+        rng = np.random.default_rng(seed)
+        stop_count = len(self.timetable.arrival)
+        injected = np.where(rng.random(stop_count) < incident_rate, rng.integers(1, max_incident + 1, stop_count), 0)
+        injected[self.timetable.indptr[:-1]] += rng.integers(0, max_primary + 1, len(self.timetable))
+        return injected
+
+    # The run after previous at now_min (one pattern minute, or one per train): stops
+    # already reached (predicted arrival at or before now_min) keep their disturbances,
+    # the rest are drawn anew. Delays only carry forward in time and a stop not reached
+    # yet cannot become reached by new draws, so with one minute the run repeats every
+    # realized delay. With one per train, runs of different service days share
+    # platforms, so the realized delays are also kept as they were.
+    def run_after(self, previous, now_min, seed=None):
+        injected = self.disturbances(seed)
+        if previous is None or previous.injected is None:
+            return self.run(injected=injected)
+        if np.ndim(now_min):
+            now_min = np.repeat(now_min, np.diff(self.timetable.indptr))
+        reached = previous.arrival <= now_min
+        forecast = self.run(injected=np.where(reached, previous.injected, injected))
+        return DelayForecast(self.timetable, np.where(reached, previous.arrival_delay, forecast.arrival_delay),
+                             np.where(reached, previous.departure_delay, forecast.departure_delay), forecast.injected)
+
+    def run(self, seed=None, injected=None):
+        if injected is None:
+            injected = self.disturbances(seed)
+        injected = np.array(injected, dtype=np.int64)                              #Own copy, kept read-only in the forecast
+        injected.setflags(write=False)
+        stations = self.timetable.stations
+        contended = np.zeros(len(self.platforms), dtype=bool)
+        while True:
+            arrival_delay, departure_delay, order = self._propagate(injected, contended[stations])
+            held = platforms_held(stations, self.arrival + arrival_delay, self.departure + departure_delay, order)
+            short = (held >= self.platforms[stations]) & ~contended[stations]
+            if not short.any():
+                return DelayForecast(self.timetable, arrival_delay, departure_delay, injected)
+            contended[stations[short]] = True
+
+    # Delays of every stop, those at contended stops from the event simulation and the
+    # rest carried along each train: arrival delay is what is left of the previous stop's
+    # departure delay after recovery, departure delay is what the dwell cannot absorb
+    # plus the stop's own incident. Also returns each stop's place in the event order.
+    def _propagate(self, injected, at_contended):
+        n = len(injected)
+        arrival_delay = np.zeros(n, dtype=np.int64)
+        departure_delay = np.zeros(n, dtype=np.int64)
+        order = np.zeros(n, dtype=np.int64)
+        if at_contended.any():
+            self._resolve_contended(injected, at_contended, arrival_delay, departure_delay, order)
+        for k, stops in enumerate(self._positions):
+            fixed = at_contended[stops]
+            if k:
+                previous = stops - 1
+                carried = np.maximum(departure_delay[previous] - self.recovery[previous], 0)
+                arrival_delay[stops] = np.where(fixed, arrival_delay[stops], carried)
+            left = np.maximum(arrival_delay[stops] - self.slack[stops], 0) + injected[stops]
+            departure_delay[stops] = np.where(fixed, departure_delay[stops], left)
+            key = (self.arrival[stops] + arrival_delay[stops]) * n + stops
+            order[stops] = np.where(fixed, order[stops], np.maximum(key, order[stops - 1]) if k else key)
+        return arrival_delay, departure_delay, order
+
+    # Running maximum of values along each train, starting over at the restart stops
+    def _running_max(self, values, restart):
+        result = values.copy()
+        for stops in self._positions[1:]:
+            result[stops] = np.where(restart[stops], values[stops], np.maximum(values[stops], result[stops - 1]))
+        return result
+
+    # Event simulation of the contended stops alone. Between two contended stops a train's
+    # arrival delay goes stop by stop as a = max(a + P, Q), with P = incident - slack -
+    # recovery and Q = max(incident - recovery, 0). Over stops i..n-1 that composes to
+    # a_n = S_n + max(a_i - S_i, max(Q_m - S_m+1 for i <= m < n)) with S the prefix sums of
+    # P, and the inner maximum is a running maximum that restarts after each contended
+    # stop, so an event reaches the train's next contended stop in O(1).
+    #
+    # A stop's event is keyed time * n + stop, but it only enters the queue once the
+    # previous stop's event is out, so the simulation order is the running maximum of the
+    # keys along the train. The keys of the uncontended stops are max(A + late * n, B)
+    # for fixed A and B, so that maximum is a closed form too. The heap holds
+    # order * count + position among the contended stops.
+    def _resolve_contended(self, injected, at_contended, arrival_delay, departure_delay, order):
+        n = len(injected)
+        step = injected - self.slack - self.recovery
+        prefix = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(step, out=prefix[1:])
+        restart = np.zeros(n, dtype=bool)
+        restart[self.timetable.indptr[:-1]] = True
+        restart[1:] |= at_contended[:-1]
+        best_gain = self._running_max(np.maximum(injected - self.recovery, 0) - prefix[1:], restart)
+
+        # Arrival time (no wait) at stop m, from late = a - S_i at the segment start i:
+        # arrival[m] + S_m + max(late, bound[m]), bound the running maximum up to m - 1
+        bound = np.full(n, NO_BOUND, dtype=np.int64)
+        bound[1:] = np.where(restart[1:], NO_BOUND, best_gain[:-1])
+        base = self.arrival + prefix[:-1]
+        stop_ids = np.arange(n)
+        # The key of stop m is max(base[m] * n + m + late * n, (base[m] + bound[m]) * n + m);
+        # their running maxima give the order the train reaches stop m in
+        key_late = self._running_max(base * n + stop_ids, restart)
+        key_fixed = self._running_max(np.where(restart, NO_BOUND, (base + np.where(restart, 0, bound)) * n + stop_ids), restart)
+
+        # Next contended stop at or after each stop of the same train (n when none)
+        following = np.minimum.accumulate(np.where(at_contended, np.arange(n), n)[::-1])[::-1]
+        following[following > self._last_stop] = n
+
+        stops = np.flatnonzero(at_contended)
+        count = len(stops)
+        after = np.where(self.terminus[stops], n, following[np.minimum(stops + 1, n - 1)])
+        has_next = after < n
+        next_stop = np.where(has_next, after, stops)
+        next_index = np.where(has_next, np.searchsorted(stops, next_stop), -1)
+        ref = prefix[stops + 1]
+        between = has_next & (next_stop > stops + 1)                                #Uncontended stops in between
+        before = np.maximum(next_stop - 1, 0)
+
+        firsts = self.timetable.indptr[:-1]
+        entry = following[firsts]
+        entered = entry < n
+        entry, first_stop = entry[entered], firsts[entered]
+        late = -prefix[first_stop]                                                  #Trains start on time
+        entry_time = base[entry] + np.maximum(late, bound[entry])
+        previous = np.maximum(entry - 1, 0)
+        entry_order = np.where(entry > first_stop, np.maximum(key_late[previous] + late * n, key_fixed[previous]), NO_BOUND)
+        entry_order = np.maximum(entry_time * n + entry, entry_order)
+        entry_index = np.searchsorted(stops, entry)
+        pending = np.zeros(count, dtype=np.int64)                                   #Arrival time of each queued event
+        pending[entry_index] = entry_time
+        queue = (entry_order * count + entry_index).tolist()
+        heapq.heapify(queue)
+
+        free_at = {station: [-INF] * int(self.platforms[station]) for station in np.unique(self.timetable.stations[stops]).tolist()}
+        platforms_of = [free_at[station] for station in self.timetable.stations[stops].tolist()]
+        arrival, departure, min_dwell = self.arrival[stops].tolist(), self.departure[stops].tolist(), self.min_dwell[stops].tolist()
+        incident, recovery = injected[stops].tolist(), self.recovery[stops].tolist()
+        next_base, next_bound = base[next_stop].tolist(), bound[next_stop].tolist()
+        next_index, next_stop, ref, between = next_index.tolist(), next_stop.tolist(), ref.tolist(), between.tolist()
+        before_late, before_fixed = key_late[before].tolist(), key_fixed[before].tolist()
+        pending = pending.tolist()
+        arrived, left, position = [0] * count, [0] * count, [0] * count
+
+        # The train at the head of the queue moves on by replacing its own entry, so a
+        # contended stop costs one heap operation (a pop at the train's last one)
+        pop, replace = heapq.heappop, heapq.heapreplace
+        while queue:
+            key, i = divmod(queue[0], count)
+            position[i] = key
+            time = pending[i]
+            platforms = platforms_of[i]
+            if platforms[0] > time:
+                time = platforms[0]
+            arrived[i] = time - arrival[i]
+            leave = time + min_dwell[i]
+            if leave < departure[i]:
+                leave = departure[i]
+            leave += incident[i]
+            if leave > time:                               #A zero-length stay holds no platform
+                replace(platforms, leave)
+            late = leave - departure[i]
+            left[i] = late
+            j = next_index[i]
+            if j < 0:
+                pop(queue)
+                continue
+            late -= recovery[i]
+            late = (late if late > 0 else 0) - ref[i]
+            time = next_base[i] + (late if late > next_bound[i] else next_bound[i])
+            pending[j] = time
+            time = time * n + next_stop[i]
+            if between[i]:
+                key = max(key, before_late[i] + late * n, before_fixed[i])
+            if key > time:
+                time = key
+            replace(queue, time * count + j)
+
+        arrival_delay[stops] = arrived
+        departure_delay[stops] = left
+        order[stops] = position
@@ -0,0 +1,161 @@
+import heapq
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 32
+
+
+def unit_vectors(latitude, longitude):
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def haversine_km(latitude, longitude, to_latitude, to_longitude):
+    lat, lon, to_lat, to_lon = map(np.radians, (latitude, longitude, to_latitude, to_longitude))
+    a = np.sin((to_lat - lat) / 2) ** 2 + np.cos(lat) * np.cos(to_lat) * np.sin((to_lon - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+# Static KD-tree over stations as unit vectors in 3-D: the straight-line (chord) distance
+# between two unit vectors grows with their great-circle distance, so the k nearest by
+# chord are the k nearest by haversine. Nodes are flat lists; each leaf holds at most
+# LEAF_SIZE points stored contiguously, so a leaf is checked with one numpy expression.
+class StationGeoIndex:
+    def __init__(self, station_codes, latitude, longitude, leaf_size=LEAF_SIZE):
+        latitude, longitude = np.asarray(latitude, dtype=np.float64), np.asarray(longitude, dtype=np.float64)
+        known = ~(np.isnan(latitude) | np.isnan(longitude))
+        self.station_codes = np.asarray(station_codes, dtype=object)[known]
+        self.latitude, self.longitude = latitude[known], longitude[known]
+        points = unit_vectors(self.latitude, self.longitude)
+
+        order = np.arange(len(points))
+        starts, ends, lows, highs, children = [], [], [], [], []
+        stack = [(0, len(points), -1, 0)]
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(starts)
+            if parent >= 0:
+                children[parent][side] = node
+            block = points[order[start:end]]
+            starts.append(start)
+            ends.append(end)
+            lows.append(block.min(axis=0) if end > start else np.zeros(3))
+            highs.append(block.max(axis=0) if end > start else np.zeros(3))
+            children.append([-1, -1])
+            if end - start > leaf_size:
+                axis = int(np.argmax(highs[-1] - lows[-1]))
+                middle = (end - start) // 2
+                order[start:end] = order[start:end][np.argpartition(block[:, axis], middle)]
+                stack.append((start + middle, end, node, 1))
+                stack.append((start, start + middle, node, 0))
+        self.order = order
+        self.points = points[order]
+        self.starts, self.ends = starts, ends
+        self.boxes = [tuple(zip(low.tolist(), high.tolist())) for low, high in zip(lows, highs)]
+        self.children = children
+
+    def __len__(self):
+        return len(self.station_codes)
+
+    # k nearest stations to (latitude, longitude) as [(code, distance_km)], nearest first
+    def nearest(self, latitude, longitude, k):
+        if len(self) == 0 or k <= 0:
+            return []
+        point = unit_vectors(np.array([latitude]), np.array([longitude]))[0]
+        x, y, z = point.tolist()
+        best = []                                          #Max-heap of (-squared chord, position)
+        queue = [(0.0, 0)]
+        while queue:
+            bound, node = heapq.heappop(queue)
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            left, right = self.children[node]
+            if left < 0:
+                start = self.starts[node]
+                squared = ((self.points[start:self.ends[node]] - point) ** 2).sum(axis=1)
+                for offset, value in enumerate(squared.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-value, start + offset))
+                    elif value < -best[0][0]:
+                        heapq.heapreplace(best, (-value, start + offset))
+                continue
+            for child in (left, right):
+                squared = 0.0
+                for value, (low, high) in zip((x, y, z), self.boxes[child]):
+                    gap = low - value if value < low else value - high if value > high else 0.0
+                    squared += gap * gap
+                heapq.heappush(queue, (squared, child))
+        found = sorted((-value, position) for value, position in best)
+        return [(self.station_codes[self.order[position]], _chord_to_km(math.sqrt(value))) for value, position in found]
+
+
+# Admissible travel-time lower bound for A*: great-circle distance to the target divided
+# by the fastest speed any edge of the topology implies (distance / base cost). Delays
+# only add to costs, so a bound from the base costs holds for every snapshot, and by the
+# triangle inequality it is also consistent. Stations without coordinates take those of
+# a neighbour (then of a neighbour's neighbour, ...); every edge, with those positions,
+# counts toward the fastest speed, so the bound stays admissible through them.
+# A speed per route would be tighter but is no bound: a path may change onto a faster
+# route. With one speed the bound is loose wherever a few fast links exist, so A* stays
+# off by default (abc_1.ROUTE_A_STAR) and Dijkstra answers /live/route.
+class TravelTimeBound:
+    def __init__(self, graph, station_coords):
+        codes = graph.station_codes.tolist()
+        latitude = np.array([station_coords.get(code, {}).get('latitude', np.nan) for code in codes], dtype=np.float64)
+        longitude = np.array([station_coords.get(code, {}).get('longitude', np.nan) for code in codes], dtype=np.float64)
+        sources = np.repeat(np.arange(len(codes)), np.diff(graph.indptr))
+        targets = graph.indices
+        known = ~(np.isnan(latitude) | np.isnan(longitude))
+        while not known.all():
+            borrowed = np.full(len(codes), -1)
+            for a, b in ((sources, targets), (targets, sources)):
+                usable = ~known[a] & known[b]
+                borrowed[a[usable]] = b[usable]
+            fill = borrowed >= 0
+            if not fill.any():
+                latitude[~known], longitude[~known] = 0.0, 0.0
+                break
+            latitude[fill], longitude[fill] = latitude[borrowed[fill]], longitude[borrowed[fill]]
+            known |= fill
+        self.latitude, self.longitude = latitude, longitude
+        self._radians = (np.radians(latitude).tolist(), np.radians(longitude).tolist(), np.cos(np.radians(latitude)).tolist())
+
+        distance = haversine_km(latitude[sources], longitude[sources], latitude[targets], longitude[targets])
+        costs = graph.costs
+        moving = distance > 0
+        if (costs[moving] <= 0).any():
+            self.minutes_per_km = 0.0                     #An edge covers distance in no time: no useful bound
+        else:
+            self.minutes_per_km = float(1 / (distance[moving] / costs[moving]).max()) if moving.any() else 0.0
+
+    def distance_km(self, source, target):
+        return float(haversine_km(self.latitude[source], self.longitude[source], self.latitude[target], self.longitude[target]))
+
+    # Lower bound on the minutes from every station to target, indexed by station id. Each
+    # entry is computed when it is read, so a search pays for the stations it reaches only.
+    def to(self, target):
+        if self.minutes_per_km == 0:
+            return [0.0] * len(self.latitude)
+        return BoundToTarget(self, target)
+
+
+# TravelTimeBound.to(target): the haversine of one station pair per read, in plain floats
+class BoundToTarget:
+    def __init__(self, bound, target):
+        self.latitude, self.longitude, self.cos_latitude = bound._radians
+        self.target = (self.latitude[target], self.longitude[target], self.cos_latitude[target])
+        self.minutes_per_km = bound.minutes_per_km
+
+    def __len__(self):
+        return len(self.latitude)
+
+    def __getitem__(self, station):
+        to_lat, to_lon, to_cos = self.target
+        a = math.sin((to_lat - self.latitude[station]) / 2) ** 2 + self.cos_latitude[station] * to_cos * math.sin((to_lon - self.longitude[station]) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1))) * self.minutes_per_km
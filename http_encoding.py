@@ -0,0 +1,74 @@
+import gzip
+import time
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import REGISTRY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+SERIALIZE_SECONDS = REGISTRY.histogram("response_serialization_seconds", "Time to encode jsonify() bodies", labels=("endpoint",))
+COMPRESS_SECONDS = REGISTRY.histogram("response_compression_seconds", "Time to compress response bodies", labels=("encoding",))
+
+if orjson is not None:
+    # Sorted keys like Flask's default provider; datetimes still go through Flask's default()
+    ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+# jsonify() through orjson when it is installed (several times faster on large lists),
+# Flask's stdlib encoder otherwise
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+
+    def response(self, *args, **kwargs):
+        start = time.perf_counter()
+        if orjson is None:
+            response = super().response(*args, **kwargs)
+        else:
+            obj = self._prepare_response_obj(args, kwargs)
+            response = self._app.response_class(orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS) + b"\n", mimetype=self.mimetype)
+        SERIALIZE_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint if has_request_context() else "")
+        return response
+
+
+def available_encodings():
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+# Compresses a finished response in place with the best encoding the client accepts
+# (brotli when installed, else gzip); small, streamed or already encoded bodies are left alone
+def compress_response(response, accept_encodings):
+    response.vary.add("Accept-Encoding")
+    if response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers:
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+    encoding = accept_encodings.best_match(available_encodings())
+    start = time.perf_counter()
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    COMPRESS_SECONDS.observe(time.perf_counter() - start, encoding=encoding)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,165 @@
+import cProfile
+import io
+import math
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = tuple(2 ** power for power in range(8, 26, 2))         #256 B .. 8 MiB
+COUNT_BUCKETS = tuple(4 ** power for power in range(9))              #1 .. 65536
+PROFILE_LINES = 40
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Monotonic counter, one series per combination of label values
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name, self.documentation, self.labels = name, documentation, tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(label, "") for label in self.labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, _label_text(self.labels, key), value) for key, value in sorted(self.series.items())]
+
+
+# Cumulative-bucket histogram like Prometheus' own: per series a count per upper bound,
+# plus the sum and total count of the observations
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labels=()):
+        self.name, self.documentation, self.labels = name, documentation, tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(label, "") for label in self.labels)
+        with self.lock:
+            counts = self.series.get(key)
+            if counts is None:
+                counts = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][i] += 1
+                    break
+            counts[1] += value
+            counts[2] += 1
+
+    # Observes the wall time of the with-block in seconds
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    # {label values: (count, sum)} of every series
+    def totals(self):
+        with self.lock:
+            return {key: (counts[2], counts[1]) for key, counts in self.series.items()}
+
+    def samples(self):
+        with self.lock:
+            series = sorted((key, (list(counts[0]), counts[1], counts[2])) for key, counts in self.series.items())
+        lines = []
+        for key, (buckets, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                lines.append((self.name + "_bucket", _label_text(self.labels, key, [("le", _number(bound))]), cumulative))
+            lines.append((self.name + "_sum", _label_text(self.labels, key), total))
+            lines.append((self.name + "_count", _label_text(self.labels, key), count))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    # A module imported twice (e.g. as __main__ and by name) gets its metric back
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is None:
+                self.metrics[metric.name] = metric
+                return metric
+            if existing.kind != metric.kind or existing.labels != metric.labels:
+                raise ValueError(f"Metric {metric.name} is already registered differently")
+            return existing
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, labels=()):
+        return self._register(Histogram(name, documentation, buckets, labels))
+
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# cProfile of everything the current thread runs between start() and summary(). One
+# profile runs at a time (newer Pythons refuse a second active profiler); start() says
+# whether this one got to run.
+class RequestProfile:
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.running = False
+
+    def start(self):
+        if not self.lock.acquire(blocking=False):
+            return False
+        self.running = True
+        self.profiler.enable()
+        return True
+
+    def stop(self):
+        if self.running:
+            self.profiler.disable()
+            self.running = False
+            self.lock.release()
+
+    def summary(self, sort="cumulative", lines=PROFILE_LINES):
+        self.stop()
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).strip_dirs().sort_stats(sort).print_stats(lines)
+        return out.getvalue()
@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from convert_to_csv import read_train_data, default_data_path
+from routing import RouteGraph, build_route_graph
+from station_graph import EdgeTable, build_edge_table
+from timetable import StationIndex, Timetable, build_timetable
+
+FORMAT_VERSION = 1
+MAGIC = b"RTNET\0\0\0"
+ALIGNMENT = 64
+REQUIRED_COLUMNS = ["train_number", "from_station_code", "to_station_code", "train_name_y", "arrival_time", "departure_time", "day", "total_duration_min"]
+
+# Everything the API derives from the schedule data before serving: the timetable (with
+# its station index), the edge table and the route topology, plus station coordinates.
+# data_version is the checksum of the data file it was built from, when known.
+Network = namedtuple("Network", ["timetable", "edge_table", "route_topology", "station_coords", "data_version"], defaults=(None,))
+
+
+def build_network(df):
+    df = df.dropna(subset=REQUIRED_COLUMNS)
+    edge_table = build_edge_table(df)
+    coords = df[['from_station_code', 'latitude', 'longitude']].drop_duplicates('from_station_code').set_index('from_station_code')
+    return Network(
+        timetable=build_timetable(df),
+        edge_table=edge_table,
+        route_topology=build_route_graph(edge_table, *edge_table.delayed_weights({})),
+        station_coords=coords.to_dict('index'),
+    )
+
+
+def compile_network(data_path):
+    return build_network(read_train_data(data_path, columns=REQUIRED_COLUMNS + ["latitude", "longitude"]))
+
+
+def source_checksum(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# {key: index array} as one CSR triple, so it can be stored as flat arrays
+def _pack_groups(groups):
+    keys = list(groups)
+    indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(groups[key]) for key in keys], out=indptr[1:])
+    values = np.concatenate([np.asarray(groups[key], dtype=np.int64) for key in keys]) if keys else np.zeros(0, dtype=np.int64)
+    return np.array(keys, dtype=str), indptr, values
+
+
+def _unpack_groups(keys, indptr, values):
+    return {key: values[indptr[i]:indptr[i + 1]] for i, key in enumerate(keys.tolist())}
+
+
+def _text(array):
+    return np.array([] if len(array) == 0 else array, dtype=str)
+
+
+def network_arrays(network):
+    timetable, edge_table, topology = network.timetable, network.edge_table, network.route_topology
+    index = timetable.station_index
+    train_edge_keys, train_edge_indptr, train_edge_values = _pack_groups(edge_table.train_edges)
+    train_station_keys, train_station_indptr, train_station_values = _pack_groups(edge_table.train_stations)
+    coord_codes = list(network.station_coords)
+    return {
+        "train_ids": _text(timetable.train_ids),
+        "train_names": _text(timetable.train_names),
+        "timetable_indptr": timetable.indptr,
+        "timetable_stations": timetable.stations,
+        "timetable_station_codes": _text(timetable.station_codes),
+        "arrival": timetable.arrival,
+        "departure": timetable.departure,
+        "index_indptr": index.indptr,
+        "index_stops": index.stops,
+        "index_trains": index.trains,
+        "index_arrival": index.arrival,
+        "index_max_dwell": index.max_dwell,
+        "edge_station_codes": _text(edge_table.station_codes),
+        "edge_sources": edge_table.sources,
+        "edge_targets": edge_table.targets,
+        "edge_base_weights": edge_table.base_weights,
+        "edge_trains": _text(edge_table.edge_trains),
+        "station_owner": _text(["" if train is None else train for train in edge_table.station_owner.tolist()]),
+        "train_edge_keys": train_edge_keys,
+        "train_edge_indptr": train_edge_indptr,
+        "train_edge_values": train_edge_values,
+        "train_station_keys": train_station_keys,
+        "train_station_indptr": train_station_indptr,
+        "train_station_values": train_station_values,
+        "topology_indptr": topology.indptr,
+        "topology_indices": topology.indices,
+        "topology_edge_ids": topology.edge_ids,
+        "coord_codes": _text(coord_codes),
+        "coord_latitude": np.array([network.station_coords[code]['latitude'] for code in coord_codes], dtype=np.float64),
+        "coord_longitude": np.array([network.station_coords[code]['longitude'] for code in coord_codes], dtype=np.float64),
+    }
+
+
+# File layout: MAGIC, the header length (uint64 LE), a JSON header (format version,
+# source checksum and each array's dtype/shape/offset), then the raw arrays, each
+# starting on a 64-byte boundary so they can be mapped in place
+def save_network(network, path, checksum):
+    arrays = {name: np.ascontiguousarray(array) for name, array in network_arrays(network).items()}
+    table, offset = {}, 0
+    for name, array in arrays.items():
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({"format_version": FORMAT_VERSION, "source_checksum": checksum, "arrays": table}).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    # Written next to the target and renamed over it, so a concurrent reader never maps a partial file
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + table[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(partial, path)
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None, 0
+        (length,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(length))
+    return header, -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+
+
+# Maps the file read-only; the numeric arrays are views into the mapping (pages shared
+# by every process mapping the same file), only the small string arrays are copied out
+def load_network(path):
+    header, data_start = read_header(path)
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = data_start + spec["offset"]
+        array = np.frombuffer(mapped, dtype=dtype, count=count, offset=start) if count else np.zeros(0, dtype=dtype)
+        arrays[name] = array.reshape(spec["shape"])
+
+    station_codes = arrays["timetable_station_codes"].astype(object)
+    timetable = Timetable(
+        train_ids=arrays["train_ids"].astype(object),
+        train_names=arrays["train_names"].astype(object),
+        indptr=arrays["timetable_indptr"],
+        stations=arrays["timetable_stations"],
+        station_codes=station_codes,
+        arrival=arrays["arrival"],
+        departure=arrays["departure"],
+        station_index=StationIndex(arrays["index_indptr"], arrays["index_stops"], arrays["index_trains"],
+                                   arrays["index_arrival"], arrays["index_max_dwell"]),
+    )
+    owner = arrays["station_owner"].astype(object)
+    owner[owner == ""] = None
+    edge_table = EdgeTable(
+        station_codes=arrays["edge_station_codes"].astype(object),
+        sources=arrays["edge_sources"],
+        targets=arrays["edge_targets"],
+        base_weights=arrays["edge_base_weights"],
+        edge_trains=arrays["edge_trains"].astype(object),
+        train_edges=_unpack_groups(arrays["train_edge_keys"], arrays["train_edge_indptr"], arrays["train_edge_values"]),
+        station_owner=owner,
+        train_stations=_unpack_groups(arrays["train_station_keys"], arrays["train_station_indptr"], arrays["train_station_values"]),
+    )
+    topology = RouteGraph(edge_table.station_codes, arrays["topology_indptr"], arrays["topology_indices"],
+                          arrays["topology_edge_ids"], *edge_table.delayed_weights({}))
+    station_coords = {code: {'latitude': latitude, 'longitude': longitude} for code, latitude, longitude in
+                      zip(arrays["coord_codes"].tolist(), arrays["coord_latitude"].tolist(), arrays["coord_longitude"].tolist())}
+    return Network(timetable, edge_table, topology, station_coords, header["source_checksum"])
+
+
+# Maps the artifact at path when it was compiled from this exact data file, otherwise
+# parses the data file and writes a fresh artifact there for the next start
+def load_or_compile(data_path, path):
+    checksum = source_checksum(data_path)
+    if os.path.exists(path):
+        header, _ = read_header(path)
+        if header is not None and header["format_version"] == FORMAT_VERSION and header["source_checksum"] == checksum:
+            return load_network(path)
+    network = compile_network(data_path)._replace(data_version=checksum)
+    save_network(network, path, checksum)
+    return network
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the train data into a prebuilt network artifact for fast API start")
+    parser.add_argument("--data", default=default_data_path())
+    parser.add_argument("--output", help="artifact path (default: <data>.network)")
+    args = parser.parse_args()
+    output = args.output or args.data + ".network"
+    network = compile_network(args.data)
+    save_network(network, output, source_checksum(args.data))
+    print(f"Wrote {output}: {len(network.timetable)} trains, {len(network.route_topology)} stations, "
+          f"{len(network.edge_table)} edges, {os.path.getsize(output) / 2 ** 20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
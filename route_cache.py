@@ -0,0 +1,163 @@
+import bisect
+import threading
+from collections import Counter, OrderedDict
+
+from metrics import REGISTRY, COUNT_BUCKETS
+from routing import find_fastest_route, find_tree_route, find_alternate_routes, shortest_path_tree
+
+ROUTE_CACHE_SIZE = 4096
+TREE_CACHE_SIZE = 32                                        #A tree is two station-length lists, a route a short tuple
+TREE_AFTER_MISSES = 2
+DISTANCE_BANDS_KM = (100, 250, 500, 1000, 2000)
+
+SEARCH_SECONDS = REGISTRY.histogram("route_search_seconds", "Time of route searches run on a cache miss", labels=("search", "distance_band"))
+SEARCH_SETTLED = REGISTRY.histogram("route_search_settled_stations", "Stations settled per route search", COUNT_BUCKETS, labels=("search", "distance_band"))
+SEARCH_PUSHES = REGISTRY.histogram("route_search_heap_pushes", "Heap pushes per route search", COUNT_BUCKETS, labels=("search", "distance_band"))
+
+_MISSING = object()
+
+
+# Bounded LRU of route answers for the current snapshot. Keys carry the snapshot version,
+# and publishing a snapshot (the cache is a SnapshotHolder listener) drops every entry,
+# so a cached route is never served against newer delays. Besides single routes it keeps
+# shortest-path trees: once an origin has missed TREE_AFTER_MISSES times in a snapshot,
+# one full search from it is cached and every later query from that origin is read off
+# the tree. Trees have their own, much smaller LRU, so they never push routes out. Routes are computed outside the lock, so two concurrent misses on the same
+# key may both search; the answers are identical. The travel-time bound
+# (geo_index.TravelTimeBound) labels searches by distance band; with a_star single routes
+# are searched with A* on it, which only beats Dijkstra where the bound is tight.
+class RouteCache:
+    def __init__(self, max_entries=ROUTE_CACHE_SIZE, tree_after=TREE_AFTER_MISSES, bound=None, a_star=False, max_trees=TREE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.max_trees = max_trees
+        self.tree_after = tree_after
+        self.bound = bound
+        self.a_star = a_star and bound is not None
+        self.entries = OrderedDict()
+        self.trees = OrderedDict()
+        self.version = None
+        self.origin_misses = Counter()
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    # Great-circle band of an origin-destination pair ("unknown" without a bound)
+    def distance_band(self, graph, source, destination):
+        source_id, destination_id = graph.station_id(source), graph.station_id(destination)
+        if self.bound is None or source_id is None or destination_id is None:
+            return "unknown"
+        distance = self.bound.distance_km(source_id, destination_id)
+        band = bisect.bisect(DISTANCE_BANDS_KM, distance)
+        if band == len(DISTANCE_BANDS_KM):
+            return f"{DISTANCE_BANDS_KM[-1]}+km"
+        return f"{DISTANCE_BANDS_KM[band - 1] if band else 0}-{DISTANCE_BANDS_KM[band]}km"
+
+    def published(self, snapshot):
+        with self.lock:
+            self.entries.clear()
+            self.trees.clear()
+            self.origin_misses.clear()
+            self.version = snapshot.version
+            self.counts["invalidations"] += 1
+
+    def _get(self, key):
+        with self.lock:
+            value = self.entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.counts["misses"] += 1
+            else:
+                self.entries.move_to_end(key)
+                self.counts["hits"] += 1
+            return value
+
+    def _put(self, key, value):
+        with self.lock:
+            self._insert(self.entries, self.max_entries, key, value, "evictions")
+
+    def _insert(self, entries, max_entries, key, value, evictions):
+        if self._superseded(key[1]):
+            return                                         #Computed on a snapshot that has since been replaced
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+            self.counts[evictions] += 1
+
+    def _superseded(self, version):
+        return self.version is not None and version < self.version
+
+    # Shortest-path tree of the origin, if it has been built or is now worth building
+    def _origin_tree(self, snapshot, source):
+        key = ("tree", snapshot.version, source)
+        with self.lock:
+            tree = self.trees.get(key)
+            if tree is not None:
+                self.trees.move_to_end(key)
+                return tree
+            if self._superseded(snapshot.version):
+                return None                                #Misses on a replaced snapshot would never be cleared
+            self.origin_misses[key] += 1
+            if self.origin_misses[key] < self.tree_after:
+                return None
+            del self.origin_misses[key]
+        source_id = snapshot.graph.station_id(source)
+        if source_id is None:
+            return None
+        counts = Counter()
+        with SEARCH_SECONDS.time(search="tree", distance_band="all"):
+            tree = shortest_path_tree(snapshot.graph, source_id, counts=counts)
+        SEARCH_SETTLED.observe(counts["settled"], search="tree", distance_band="all")
+        SEARCH_PUSHES.observe(counts["pushes"], search="tree", distance_band="all")
+        with self.lock:
+            self.counts["tree_builds"] += 1
+            self._insert(self.trees, self.max_trees, key, tree, "tree_evictions")
+        return tree
+
+    # (minutes, [station codes]) like find_fastest_route, from the contraction hierarchy
+    # when the snapshot has one (already fast, so no trees), the graph otherwise
+    def fastest_route(self, snapshot, source, destination):
+        key = ("route", snapshot.version, source, destination)
+        route = self._get(key)
+        if route is _MISSING:
+            band = self.distance_band(snapshot.graph, source, destination)
+            if snapshot.hierarchy is not None:
+                with SEARCH_SECONDS.time(search="hierarchy", distance_band=band):
+                    route = snapshot.hierarchy.find_fastest_route(source, destination)
+            else:
+                tree = self._origin_tree(snapshot, source)
+                if tree is None:
+                    search, counts = "a_star" if self.a_star else "dijkstra", Counter()
+                    with SEARCH_SECONDS.time(search=search, distance_band=band):
+                        route = find_fastest_route(snapshot.graph, source, destination, self.bound if self.a_star else None, counts)
+                    SEARCH_SETTLED.observe(counts["settled"], search=search, distance_band=band)
+                    SEARCH_PUSHES.observe(counts["pushes"], search=search, distance_band=band)
+                else:
+                    route = find_tree_route(snapshot.graph, tree, destination)
+            self._put(key, route)
+        return route
+
+    def alternate_routes(self, snapshot, source, destination, alternates, budget_s=None):
+        key = ("alternates", snapshot.version, source, destination, alternates)
+        routes = self._get(key)
+        if routes is _MISSING:
+            with SEARCH_SECONDS.time(search="alternates", distance_band=self.distance_band(snapshot.graph, source, destination)):
+                routes = find_alternate_routes(snapshot.graph, source, destination, alternates, budget_s)
+            self._put(key, routes)
+        return routes
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counts["hits"] + self.counts["misses"]
+            return {
+                "snapshot_version": self.version,
+                "size": len(self.entries),
+                "trees": len(self.trees),
+                "max_entries": self.max_entries,
+                "max_trees": self.max_trees,
+                "hits": self.counts["hits"],
+                "misses": self.counts["misses"],
+                "hit_rate": self.counts["hits"] / lookups if lookups else 0.0,
+                "evictions": self.counts["evictions"],
+                "invalidations": self.counts["invalidations"],
+                "tree_builds": self.counts["tree_builds"],
+                "tree_evictions": self.counts["tree_evictions"],
+            }
@@ -0,0 +1,330 @@
+import heapq
+import time
+
+import numpy as np
+
+from timetable import code_index
+
+INF = float('inf')
+
+
+# Station graph in CSR form over integer station ids (ids follow sorted station codes).
+# The out-edges of station u are positions indptr[u]:indptr[u + 1] of indices/costs,
+# where an edge's cost is its delayed weight plus the delay of the station it leaves,
+# the same cost the original Dijkstra added up per hop. The topology, and its list form
+# the searches run on, is shared between snapshots; on every delay refresh only the costs
+# are recomputed, and their list is the previous one with the changed edges patched in.
+class RouteGraph:
+    def __init__(self, station_codes, indptr, indices, edge_ids, weights, station_delay, topology=None, previous_costs=None):
+        self.station_codes = station_codes
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_ids = edge_ids
+        self.weights = weights
+        self.station_delay = station_delay
+        self._topology = topology or _TopologyLists(indptr, indices)
+        self.costs = weights[edge_ids] + station_delay[self._topology.edge_sources]
+        for array in (weights, station_delay, self.costs):
+            array.setflags(write=False)
+        self.adjacency = (self._topology.indptr, self._topology.indices, _cost_list(self.costs, previous_costs))
+        self._reverse_costs = None
+
+    def __len__(self):
+        return len(self.station_codes)
+
+    def __contains__(self, station_code):
+        return self.station_id(station_code) is not None
+
+    def station_id(self, station_code):
+        return code_index(self.station_codes, station_code)
+
+    # In-edges in the same CSR layout, built on first use (k-shortest paths need it)
+    @property
+    def reverse_adjacency(self):
+        indptr, sources, order = self._topology.reverse()
+        if self._reverse_costs is None:
+            self._reverse_costs = self.costs[order].tolist()
+        return indptr, sources, self._reverse_costs
+
+    def with_weights(self, weights, station_delay):
+        return RouteGraph(self.station_codes, self.indptr, self.indices, self.edge_ids, weights, station_delay,
+                          self._topology, (self.costs, self.adjacency[2]))
+
+
+# Costs as a list: a copy of the previous snapshot's list with the edges whose cost
+# changed rewritten when few did (a refresh usually touches a small share of the trains)
+def _cost_list(costs, previous=None):
+    if previous is None:
+        return costs.tolist()
+    previous_costs, previous_list = previous
+    changed = np.flatnonzero(costs != previous_costs)
+    if len(changed) * 4 > len(costs):
+        return costs.tolist()
+    patched = previous_list.copy()
+    for position, cost in zip(changed.tolist(), costs[changed].tolist()):
+        patched[position] = cost
+    return patched
+
+
+# List form of a RouteGraph topology, shared by every snapshot over it
+class _TopologyLists:
+    def __init__(self, indptr, indices):
+        self.indptr, self.indices = indptr.tolist(), indices.tolist()
+        self.edge_sources = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        self._indices = indices
+        self._reverse = None
+
+    # In-edge CSR: (indptr, source per in-edge, position of each in-edge among the out-edges)
+    def reverse(self):
+        if self._reverse is None:
+            station_count = len(self.indptr) - 1
+            order = np.argsort(self._indices, kind='stable')
+            indptr = np.zeros(station_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self._indices, minlength=station_count), out=indptr[1:])
+            self._reverse = (indptr.tolist(), self.edge_sources[order].tolist(), order)
+        return self._reverse
+
+
+def build_route_graph(edge_table, weights, station_delay):
+    order = np.argsort(edge_table.sources, kind='stable')
+    indptr = np.zeros(len(edge_table.station_codes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edge_table.sources, minlength=len(edge_table.station_codes)), out=indptr[1:])
+    return RouteGraph(edge_table.station_codes, indptr, edge_table.targets[order], order, weights, station_delay)
+
+
+# Dijkstra over the CSR arrays with flat dist/parent lists; stops as soon as the target
+# is settled and only then walks the parent pointers back to build the path. Between
+# equal-cost parents the smaller station id wins, so the path depends only on the graph,
+# not on the order stations are settled in. A counts mapping (e.g. a Counter) gets the
+# stations settled and heap pushes added under "settled" and "pushes".
+def shortest_path(graph, source, target, counts=None):
+    dist, parent = shortest_path_tree(graph, source, target, counts)
+    if dist[target] == INF:
+        return INF, []
+    return dist[target], _walk_back(parent, target)
+
+
+# The search behind shortest_path, run to completion unless a target is given. Up to any
+# station the settle order is the same either way, so walking the full tree back from
+# a station gives exactly the path shortest_path would return for it: one tree answers
+# every query from its source.
+def shortest_path_tree(graph, source, target=-1, counts=None):
+    indptr, indices, costs = graph.adjacency
+    dist = [INF] * len(graph)
+    parent = [-1] * len(graph)
+    settled = [False] * len(graph)
+    dist[source] = 0
+    queue = [(0, source)]
+    done = pushes = 0
+    while queue:
+        current, station = heapq.heappop(queue)
+        if settled[station]:
+            continue
+        settled[station] = True
+        done += 1
+        if station == target:
+            break
+        for position in range(indptr[station], indptr[station + 1]):
+            neighbor = indices[position]
+            if settled[neighbor]:
+                continue
+            total_cost = current + costs[position]
+            if total_cost < dist[neighbor]:
+                dist[neighbor] = total_cost
+                parent[neighbor] = station
+                heapq.heappush(queue, (total_cost, neighbor))
+                pushes += 1
+            elif total_cost == dist[neighbor] and station < parent[neighbor]:
+                parent[neighbor] = station
+    if counts is not None:
+        counts["settled"] += done
+        counts["pushes"] += pushes
+    return dist, parent
+
+
+# Goal-directed variant of shortest_path: lower_bound[u] is an admissible, consistent
+# estimate of the cost from u to target (e.g. geo_index.TravelTimeBound), so stations
+# leading away from the target are never settled. Entries pop by (estimate, cost so far):
+# every equal-cost parent of a station is settled before it, as in plain Dijkstra, so the
+# same tie rule picks the same path.
+def shortest_path_a_star(graph, source, target, lower_bound, counts=None):
+    indptr, indices, costs = graph.adjacency
+    dist = [INF] * len(graph)
+    parent = [-1] * len(graph)
+    settled = [False] * len(graph)
+    dist[source] = 0
+    queue = [(lower_bound[source], 0, source)]
+    done = pushes = 0
+    while queue:
+        _, current, station = heapq.heappop(queue)
+        if settled[station]:
+            continue
+        settled[station] = True
+        done += 1
+        if station == target:
+            break
+        for position in range(indptr[station], indptr[station + 1]):
+            neighbor = indices[position]
+            if settled[neighbor]:
+                continue
+            total_cost = current + costs[position]
+            if total_cost < dist[neighbor]:
+                dist[neighbor] = total_cost
+                parent[neighbor] = station
+                heapq.heappush(queue, (total_cost + lower_bound[neighbor], total_cost, neighbor))
+                pushes += 1
+            elif total_cost == dist[neighbor] and station < parent[neighbor]:
+                parent[neighbor] = station
+    if counts is not None:
+        counts["settled"] += done
+        counts["pushes"] += pushes
+    if not settled[target]:
+        return INF, []
+    return dist[target], _walk_back(parent, target)
+
+
+def _walk_back(parent, station):
+    path = []
+    while station != -1:
+        path.append(station)
+        station = parent[station]
+    path.reverse()
+    return path
+
+
+# Cost of every station to the target (Dijkstra over in-edges) and the next hop on its
+# shortest path: the reverse shortest-path tree that all of Yen's spur searches share
+def reverse_tree(graph, target):
+    indptr, indices, costs = graph.reverse_adjacency
+    dist = [INF] * len(graph)
+    next_hop = [-1] * len(graph)
+    dist[target] = 0
+    queue = [(0, target)]
+    while queue:
+        current, station = heapq.heappop(queue)
+        if current > dist[station]:
+            continue
+        for position in range(indptr[station], indptr[station + 1]):
+            neighbor = indices[position]
+            total_cost = current + costs[position]
+            if total_cost < dist[neighbor]:
+                dist[neighbor] = total_cost
+                next_hop[neighbor] = station
+                heapq.heappush(queue, (total_cost, neighbor))
+    return dist, next_hop
+
+
+def _edge_cost(adjacency, station, neighbor):
+    indptr, indices, costs = adjacency
+    return min(costs[p] for p in range(indptr[station], indptr[station + 1]) if indices[p] == neighbor)
+
+
+# A* from the spur station with the exact distance-to-target as heuristic. Removing
+# stations or edges only makes distances longer, so the heuristic stays admissible and
+# consistent, and the search runs straight down the tree wherever nothing was removed.
+def _spur_path(graph, spur, target, dist_to, next_hop, blocked_stations, blocked_hops):
+    hop = next_hop[spur]
+    if hop not in blocked_hops:
+        path = [spur]
+        while hop != -1 and hop not in blocked_stations:
+            path.append(hop)
+            hop = next_hop[hop]
+        if path[-1] == target:
+            return dist_to[spur], path
+
+    indptr, indices, costs = graph.adjacency
+    cost_so_far = {spur: 0}
+    parent = {spur: -1}
+    settled = set()
+    queue = [(dist_to[spur], spur)]
+    while queue:
+        _, station = heapq.heappop(queue)
+        if station in settled:
+            continue
+        settled.add(station)
+        if station == target:
+            return cost_so_far[target], _walk_back(parent, target)
+        for position in range(indptr[station], indptr[station + 1]):
+            neighbor = indices[position]
+            if neighbor in blocked_stations or neighbor in settled or dist_to[neighbor] == INF:
+                continue
+            if station == spur and neighbor in blocked_hops:
+                continue
+            total_cost = cost_so_far[station] + costs[position]
+            if total_cost < cost_so_far.get(neighbor, INF):
+                cost_so_far[neighbor] = total_cost
+                parent[neighbor] = station
+                heapq.heappush(queue, (total_cost + dist_to[neighbor], neighbor))
+    return INF, []
+
+
+# Yen's k shortest loopless paths. The first path is the plain shortest_path result so it
+# matches /live/route; later ones come from spur searches guided by one reverse tree.
+# Stops early (returning what it has) once budget_s seconds have been spent.
+def k_shortest_paths(graph, source, target, k, budget_s=None):
+    deadline = None if budget_s is None else time.perf_counter() + budget_s
+    cost, path = shortest_path(graph, source, target)
+    if not path:
+        return []
+    found = [(cost, path)]
+    if k <= 1:
+        return found
+    dist_to, next_hop = reverse_tree(graph, target)
+    candidates = []
+    seen = {tuple(path)}
+    while len(found) < k:
+        previous = found[-1][1]
+        root_cost = 0
+        for i in range(len(previous) - 1):
+            if deadline is not None and time.perf_counter() > deadline:
+                return found
+            spur = previous[i]
+            root = previous[:i + 1]
+            blocked_hops = {p[i + 1] for _, p in found if len(p) > i + 1 and p[:i + 1] == root}
+            spur_cost, spur_path = _spur_path(graph, spur, target, dist_to, next_hop, set(root[:-1]), blocked_hops)
+            if spur_path:
+                candidate = root[:-1] + spur_path
+                key = tuple(candidate)
+                if key not in seen:
+                    seen.add(key)
+                    heapq.heappush(candidates, (root_cost + spur_cost, candidate))
+            root_cost += _edge_cost(graph.adjacency, spur, previous[i + 1])
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates))
+    return found
+
+
+# Station-code front end used by the API: (minutes, [station codes]) or (inf, []).
+# With a bound (geo_index.TravelTimeBound) the search is A*; the cost is the same.
+def find_fastest_route(graph, start, end, bound=None, counts=None):
+    source = graph.station_id(start)
+    target = graph.station_id(end)
+    if source is None or target is None:
+        return INF, []
+    if bound is None:
+        cost, path = shortest_path(graph, source, target, counts)
+    else:
+        cost, path = shortest_path_a_star(graph, source, target, bound.to(target), counts)
+    return cost, graph.station_codes[path].tolist()
+
+
+# Same result as find_fastest_route, read off a shortest_path_tree of the start station
+def find_tree_route(graph, tree, end):
+    dist, parent = tree
+    target = graph.station_id(end)
+    if target is None or dist[target] == INF:
+        return INF, []
+    return dist[target], graph.station_codes[_walk_back(parent, target)].tolist()
+
+
+# Primary route plus up to `alternates` loopless alternates, as ((cost, codes), [(cost, codes), ...])
+def find_alternate_routes(graph, start, end, alternates, budget_s=None):
+    source = graph.station_id(start)
+    target = graph.station_id(end)
+    if source is None or target is None:
+        return (INF, []), []
+    routes = [(cost, graph.station_codes[path].tolist()) for cost, path in k_shortest_paths(graph, source, target, alternates + 1, budget_s)]
+    if not routes:
+        return (INF, []), []
+    return routes[0], routes[1:]
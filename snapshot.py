@@ -0,0 +1,30 @@
+from collections import namedtuple
+from types import MappingProxyType
+
+# Everything a request reads about the live network, frozen at publish time. The updater
+# builds the next snapshot off to the side and swaps it in with a single assignment, so
+# a request that pins one snapshot sees a consistent graph and delays for its lifetime.
+# predicted_delays (per train, in timetable order) is only set when a delay model is loaded;
+# service_days is the window of service days the delays were computed for.
+GraphSnapshot = namedtuple("GraphSnapshot", ["version", "graph", "train_delays", "max_delay", "updated_at", "connections", "hierarchy", "forecast",
+                                             "predicted_delays", "service_days"], defaults=(None, None))
+
+EMPTY_SNAPSHOT = GraphSnapshot(0, None, MappingProxyType({}), 0, None, None, None, None, None, None)
+
+
+class SnapshotHolder:
+    def __init__(self, initial=EMPTY_SNAPSHOT):
+        self._current = initial
+        self._listeners = []
+
+    @property
+    def current(self):
+        return self._current
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def publish(self, snapshot):
+        self._current = snapshot                           #Plain reference swap, atomic under the GIL
+        for listener in list(self._listeners):
+            listener(snapshot)
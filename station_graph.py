@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+
+# Static edge array for the station graph. Every (from, to) pair keeps the base weight
+# (total_duration_min) and train of the last schedule row that names it, which is the
+# row DiGraph.add_edge would have left in place; likewise each station's delay comes
+# from the train of the last row departing it. Delays are applied on top of the base
+# weights, so a refresh only has to touch the edges served by trains whose delay changed.
+class EdgeTable:
+    def __init__(self, station_codes, sources, targets, base_weights, edge_trains, train_edges, station_owner, train_stations):
+        self.station_codes = station_codes
+        self.sources = sources
+        self.targets = targets
+        self.base_weights = base_weights
+        self.edge_trains = edge_trains
+        self.train_edges = train_edges
+        self.station_owner = station_owner
+        self.train_stations = train_stations
+
+    def __len__(self):
+        return len(self.sources)
+
+    # Full edge weight and per-station delay arrays for a {train_id: delay} mapping
+    def delayed_weights(self, train_delays):
+        edge_delay = np.array([train_delays.get(train, 0) for train in self.edge_trains.tolist()], dtype=np.float64)
+        station_delay = np.array([train_delays.get(train, 0) for train in self.station_owner.tolist()], dtype=np.float64)
+        return self.base_weights + edge_delay, station_delay
+
+    # Applies {train_id: new_delay} to the weight and station delay arrays in place
+    def apply_delay_changes(self, weights, station_delay, changes):
+        touched = 0
+        for train_id, delay in changes.items():
+            edges = self.train_edges.get(train_id)
+            if edges is not None:
+                weights[edges] = self.base_weights[edges] + delay
+                touched += len(edges)
+            stations = self.train_stations.get(train_id)
+            if stations is not None:
+                station_delay[stations] = delay
+        return touched
+
+
+def build_edge_table(df):
+    rows = pd.DataFrame({
+        "source": df['from_station_code'].astype(str).to_numpy(),
+        "target": df['to_station_code'].astype(str).to_numpy(),
+        "train": df['train_number'].astype(str).to_numpy(),
+        "weight": df['total_duration_min'].astype(float).to_numpy(),
+    })
+    station_codes = np.unique(np.concatenate([rows["source"].to_numpy(), rows["target"].to_numpy()]).astype(object))
+    rows["source"] = np.searchsorted(station_codes, rows["source"].to_numpy()).astype(np.int32)
+    rows["target"] = np.searchsorted(station_codes, rows["target"].to_numpy()).astype(np.int32)
+
+    edges = rows.drop_duplicates(["source", "target"], keep="last").reset_index(drop=True)
+    owners = rows.drop_duplicates("source", keep="last")
+    station_owner = np.full(len(station_codes), None, dtype=object)
+    station_owner[owners["source"].to_numpy()] = owners["train"].to_numpy()
+
+    return EdgeTable(
+        station_codes=station_codes,
+        sources=edges["source"].to_numpy(),
+        targets=edges["target"].to_numpy(),
+        base_weights=edges["weight"].to_numpy(dtype=np.float64),
+        edge_trains=edges["train"].to_numpy(dtype=object),
+        train_edges={train: index.to_numpy() for train, index in edges.groupby("train").groups.items()},
+        station_owner=station_owner,
+        train_stations={train: group.to_numpy() for train, group in owners.groupby("train")["source"]},
+    )
+
+
+# Trains whose delay differs from the previous tick (missing trains count as 0)
+def changed_delays(old, new):
+    return {train_id: delay for train_id, delay in new.items() if old.get(train_id, 0) != delay}
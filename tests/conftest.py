@@ -0,0 +1,172 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from convert_to_csv import convert
+from routing import INF, RouteGraph, shortest_path
+from timetable import MINUTES_PER_DAY, build_timetable
+
+
+# abc_1 serving converter output built from generated source files, with the first
+# delay snapshot published. abc_1 reads its data path at import, so it is imported here
+# once per session.
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("api")
+    data_path = str(directory / "trains.parquet")
+    convert(*write_source_files(str(directory), np.random.default_rng(0), trains=60, stations=15), data_path)
+    os.environ.update(TRAIN_DATA_PATH=data_path, DELAY_SIMULATION_SEED="0")
+    import abc_1
+    abc_1.build_timetables()
+    abc_1.update_delays_and_graph(schedule_next=False)
+    return abc_1
+
+
+# Seeded generator for a test; tests parametrized over "seed" get one per seed
+@pytest.fixture
+def seed():
+    return 0
+
+
+@pytest.fixture
+def rng(seed):
+    return np.random.default_rng(seed)
+
+
+def _clock(minutes):
+    minutes = int(minutes) % MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+# Timetable from {train_number: [(station, arrival_min, departure_min), ...]}, times as
+# minute offsets from midnight of day 1
+def timetable_from_stops(trains):
+    rows = []
+    for number, stops in trains.items():
+        for station, arrival, departure in stops:
+            rows.append({"train_number": number, "train_name_y": f"Train {number}", "from_station_code": station,
+                         "day": arrival // MINUTES_PER_DAY + 1, "arrival_time": _clock(arrival), "departure_time": _clock(departure)})
+    return build_timetable(pd.DataFrame(rows))
+
+
+# Random trains over stations S0..S<stations - 1>: each starts in the first days, runs
+# 2..max_stops stops and dwells 0..max_dwell minutes (zero_dwell_share of them 0)
+def random_trains(rng, trains, stations, max_stops=8, max_dwell=6, zero_dwell_share=0.5, start_days=1):
+    result = {}
+    for number in range(trains):
+        route = rng.choice(stations, size=int(rng.integers(2, min(max_stops, stations) + 1)), replace=False)
+        time = int(rng.integers(0, start_days * MINUTES_PER_DAY))
+        stops = []
+        for station in route.tolist():
+            dwell = 0 if rng.random() < zero_dwell_share else int(rng.integers(1, max_dwell + 1))
+            departure = min(time + dwell, (time // MINUTES_PER_DAY + 1) * MINUTES_PER_DAY - 1)   #Same day as the arrival
+            stops.append((f"S{station}", time, departure))
+            time = departure + int(rng.integers(5, 240))
+        result[10000 + number] = stops
+    return result
+
+
+# Trains shaped like the converted data: every row of a train is at one station with the
+# train's own departure and arrival clock times, 1..max_rows rows on each of 1..days days,
+# so a train's stop times keep running backwards from one row to the next
+def repeated_row_trains(rng, trains, stations, max_rows=6, days=2):
+    result = {}
+    for number in range(trains):
+        station = f"S{int(rng.integers(0, stations))}"
+        arrival, departure = (int(minute) for minute in rng.integers(0, MINUTES_PER_DAY, 2))
+        stops = []
+        for day in range(int(rng.integers(1, days + 1))):
+            offset = day * MINUTES_PER_DAY
+            stops += [(station, offset + arrival, offset + departure)] * int(rng.integers(1, max_rows + 1))
+        result[10000 + number] = stops
+    return result
+
+
+def random_timetable(rng, trains, stations, **options):
+    return timetable_from_stops(random_trains(rng, trains, stations, **options))
+
+
+def zeros(timetable):
+    return np.zeros(len(timetable.arrival), dtype=np.int64)
+
+
+# Random station graph: up to `edges` distinct directed edges with whole-minute weights
+# (so equal-cost paths are common) and a delay on some stations
+def random_route_graph(rng, stations, edges, max_weight=30, delayed_share=0.3, max_delay=10):
+    sources, targets = rng.integers(0, stations, edges), rng.integers(0, stations, edges)
+    pairs = np.unique(np.stack([sources, targets], axis=1)[sources != targets], axis=0)
+    indptr = np.zeros(stations + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs[:, 0], minlength=stations), out=indptr[1:])
+    weights = rng.integers(1, max_weight + 1, len(pairs)).astype(np.float64)
+    station_delay = np.where(rng.random(stations) < delayed_share, rng.integers(1, max_delay + 1, stations), 0).astype(np.float64)
+    codes = np.array([f"S{station:03d}" for station in range(stations)], dtype=object)
+    return RouteGraph(codes, indptr, pairs[:, 1].astype(np.int64), np.arange(len(pairs)), weights, station_delay)
+
+
+# Cost of a station-id path over the graph's cheapest edges (None if a hop is not an edge)
+def path_cost(graph, path):
+    indptr, indices, costs = graph.adjacency
+    cost = 0
+    for station, neighbor in zip(path, path[1:]):
+        hops = [costs[position] for position in range(indptr[station], indptr[station + 1]) if indices[position] == neighbor]
+        if not hops:
+            return None
+        cost += min(hops)
+    return cost
+
+
+# Raw inputs of convert_to_csv.convert in the shape of the real dataset: stations.json and
+# trains.json GeoJSON plus schedules.csv with one row per call of every train (no arrival
+# at the origin, no departure at the terminus). Returns the three paths.
+def write_source_files(directory, rng, trains, stations):
+    codes = [f"S{station:03d}" for station in range(stations)]
+    station_features = [{"type": "Feature", "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+                         "properties": {"code": code, "name": f"Station {code}", "state": "State", "zone": "Z", "address": ""}}
+                        for code, lat, lon in zip(codes, rng.uniform(10, 30, stations), rng.uniform(70, 90, stations))]
+    train_features, schedule_rows = [], []
+    for number in range(10001, 10001 + trains):
+        route = [codes[station] for station in rng.choice(stations, size=int(rng.integers(2, min(6, stations) + 1)), replace=False)]
+        start = int(rng.integers(0, MINUTES_PER_DAY))
+        arrival = start + np.cumsum(rng.integers(30, 300, len(route) - 1))
+        departure = arrival + rng.integers(0, 10, len(route) - 1)
+        duration = int(arrival[-1]) - start
+        train_features.append({"type": "Feature", "geometry": None, "properties": {
+            "number": str(number), "name": f"Train {number}", "type": "Exp", "zone": "Z",
+            "departure": _clock(start), "arrival": _clock(arrival[-1]), "duration_h": duration // 60, "duration_m": duration % 60,
+            "distance": 100, "from_station_code": route[0], "from_station_name": f"Station {route[0]}",
+            "to_station_code": route[-1], "to_station_name": f"Station {route[-1]}", "return_train": str(number + 1),
+            "sleeper": 1, "classes": "SL"}})
+        calls = [(None, start)] + list(zip(arrival.tolist(), departure.tolist()))
+        for stop, (code, (arrives, departs)) in enumerate(zip(route, calls)):
+            last = stop == len(route) - 1
+            schedule_rows.append({"arrival": None if arrives is None else _clock(arrives),
+                                  "day": 1 + (start if arrives is None else arrives) // MINUTES_PER_DAY,
+                                  "train_name": f"Train {number}", "station_name": f"Station {code}",
+                                  "departure": None if last else _clock(departs), "train_number": number,
+                                  "station_code": code, "id": len(schedule_rows) + 1})
+    paths = [os.path.join(directory, name) for name in ("stations.json", "trains.json", "schedules.csv")]
+    for path, features in zip(paths, (station_features, train_features)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f)
+    pd.DataFrame(schedule_rows).to_csv(paths[2], index=False)
+    return paths
+
+
+# Each search(source, target) -> (cost, station-id path) over the pairs has the cost
+# shortest_path finds on graph and a path from source to target adding up to it
+def assert_matches_shortest_path(graph, search, pairs):
+    for source, target in pairs:
+        cost, path = search(source, target)
+        assert cost == shortest_path(graph, source, target)[0], (source, target)
+        if cost != INF:
+            assert path[0] == source and path[-1] == target
+            assert path_cost(graph, path) == cost, (source, target, path)
+
+
+def all_pairs(graph):
+    return [(source, target) for source in range(len(graph)) for target in range(len(graph)) if source != target]
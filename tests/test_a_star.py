@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from conftest import assert_matches_shortest_path, random_route_graph
+from geo_index import TravelTimeBound, haversine_km
+from routing import shortest_path, shortest_path_a_star
+
+
+# Random graph whose base weights are the great-circle minutes at 40..120 km/h, so the
+# bound is tight, with the coordinates of all but a missing_share of the stations
+def located_route_graph(rng, stations, edges, missing_share=0.3):
+    graph = random_route_graph(rng, stations, edges, delayed_share=0)
+    latitude, longitude = rng.uniform(15, 30, stations), rng.uniform(70, 88, stations)
+    sources = np.repeat(np.arange(stations), np.diff(graph.indptr))[np.argsort(graph.edge_ids)]
+    targets = graph.indices[np.argsort(graph.edge_ids)]
+    distance = haversine_km(latitude[sources], longitude[sources], latitude[targets], longitude[targets])
+    weights = np.ceil(distance / rng.uniform(40, 120, len(distance)) * 60)
+    coords = {code: {"latitude": float(latitude[station]), "longitude": float(longitude[station])}
+              for station, code in enumerate(graph.station_codes.tolist()) if rng.random() >= missing_share}
+    return graph.with_weights(weights, graph.station_delay), coords
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_a_star_costs_match_dijkstra(rng):
+    base, coords = located_route_graph(rng, stations=60, edges=180)
+    bound = TravelTimeBound(base, coords)
+    assert bound.minutes_per_km > 0
+    # The bound comes from the base costs; a delayed snapshot only makes edges slower
+    delayed = base.with_weights(base.weights + rng.integers(0, 20, len(base.weights)),
+                                rng.integers(0, 10, len(base)).astype(np.float64))
+    for graph in (base, delayed):
+        pairs = [pair for pair in rng.integers(0, len(graph), (200, 2)).tolist() if pair[0] != pair[1]]
+        assert_matches_shortest_path(graph, lambda source, target: shortest_path_a_star(graph, source, target, bound.to(target)), pairs)
+
+
+def test_a_star_without_any_coordinates_is_dijkstra():
+    graph = random_route_graph(np.random.default_rng(0), stations=30, edges=90)
+    bound = TravelTimeBound(graph, {})
+    assert bound.minutes_per_km == 0
+    for target in range(len(graph)):
+        for source in range(len(graph)):
+            assert shortest_path_a_star(graph, source, target, bound.to(target)) == shortest_path(graph, source, target)
@@ -0,0 +1,40 @@
+import math
+
+import numpy as np
+import pytest
+
+from batch_routing import INLINE_ORIGINS, BatchRouter, distance_rows
+from conftest import random_route_graph
+
+
+def test_pool_matrix_matches_distance_rows():
+    graph = random_route_graph(np.random.default_rng(0), stations=40, edges=160)
+    codes = graph.station_codes.tolist()
+    sources, destinations = codes[:INLINE_ORIGINS * 2] + ["NOPE"], codes[::3] + ["NOPE"]
+    router = BatchRouter(workers=2)
+    try:
+        matrix = router.travel_time_matrix(graph, sources, destinations)
+        again = router.travel_time_matrix(graph.with_weights(graph.weights * 2, graph.station_delay * 2), sources, destinations)
+    finally:
+        router.close()
+    expected = distance_rows(graph.adjacency, len(graph), list(range(INLINE_ORIGINS * 2)), list(range(0, len(codes), 3)))
+    assert np.array_equal(matrix[:-1, :-1], expected)
+    assert np.isinf(matrix[-1]).all() and np.isinf(matrix[:, -1]).all()
+    assert np.array_equal(again[:-1, :-1], expected * 2)
+
+
+def test_route_matrix_endpoint(api):
+    graph = api.snapshots.current.graph
+    codes = graph.station_codes.tolist()
+    response = api.app.test_client().post("/live/route/batch", json={"sources": codes + ["NOPE"], "destinations": codes[:5] + ["NOPE"]})
+    assert response.status_code == 200
+    body = response.get_json()
+    expected = distance_rows(graph.adjacency, len(graph), list(range(len(codes))), list(range(5)))
+    assert body["time_min"][:-1] == [[None if math.isinf(time) else int(time) for time in row] + [None] for row in expected.tolist()]
+    assert body["time_min"][-1] == [None] * 6
+    assert body["unknown_stations"] == ["NOPE"]
+
+
+@pytest.mark.parametrize("body", [[], ["S000"], 3, "S000", None, {"sources": "S000", "destinations": ["S001"]}])
+def test_route_matrix_rejects_malformed_bodies(api, body):
+    assert api.app.test_client().post("/live/route/batch", json=body).status_code == 400
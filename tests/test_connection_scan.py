@@ -0,0 +1,95 @@
+import heapq
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from connection_scan import INF, build_connections
+from conftest import random_timetable, timetable_from_stops
+from delay_simulation import DelaySimulator
+
+
+# Time-dependent Dijkstra over stations: the label is the earliest time a station is
+# reached; from there any trip departing no earlier can be boarded and ridden to each
+# of its later stops. The earliest arrival ConnectionScan.earliest_arrival must find.
+def earliest_arrival_dijkstra(connections, source, target, depart_after):
+    trips = defaultdict(list)
+    for index in np.lexsort((connections.stop, connections.trip)).tolist():
+        trips[int(connections.trip[index])].append(index)
+    position = {index: (trip, k) for trip, indices in trips.items() for k, index in enumerate(indices)}
+    leaving = defaultdict(list)
+    for index in range(len(connections)):
+        leaving[int(connections.from_station[index])].append(index)
+
+    best = defaultdict(lambda: INF)
+    best[source] = depart_after
+    queue = [(depart_after, source)]
+    done = set()
+    while queue:
+        time, station = heapq.heappop(queue)
+        if station in done:
+            continue
+        done.add(station)
+        if station == target:
+            return time
+        for index in leaving[station]:
+            if connections.departure[index] < time:
+                continue
+            trip, k = position[index]
+            for ride in trips[trip][k:]:
+                arrival, to_station = int(connections.arrival[ride]), int(connections.to_station[ride])
+                if arrival < best[to_station]:
+                    best[to_station] = arrival
+                    heapq.heappush(queue, (arrival, to_station))
+    return INF
+
+
+def assert_valid_journey(legs, source, target, depart_after, arrival):
+    assert legs[0]["stations"][0] == source and legs[-1]["stations"][-1] == target
+    assert legs[0]["departure"] >= depart_after and legs[-1]["arrival"] == arrival
+    for leg, following in zip(legs, legs[1:]):
+        assert leg["stations"][-1] == following["stations"][0]
+        assert following["departure"] >= leg["arrival"]
+
+
+def assert_matches_time_dependent_dijkstra(connections, rng, queries):
+    codes = connections.timetable.station_codes
+    for _ in range(queries):
+        source, target = rng.choice(len(codes), 2, replace=False).tolist()
+        depart_after = int(rng.integers(0, 2 * 1440))
+        arrival, legs = connections.earliest_arrival(codes[source], codes[target], depart_after)
+        assert arrival == earliest_arrival_dijkstra(connections, source, target, depart_after), (source, target, depart_after)
+        if arrival != INF:
+            assert_valid_journey(legs, codes[source], codes[target], depart_after, arrival)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_earliest_arrival_matches_time_dependent_dijkstra(rng):
+    timetable = random_timetable(rng, trains=int(rng.integers(20, 200)), stations=int(rng.integers(4, 25)), start_days=2)
+    assert_matches_time_dependent_dijkstra(build_connections(timetable), rng, queries=40)
+
+
+@pytest.mark.parametrize("seed", range(50, 54))
+def test_delayed_connections_match_time_dependent_dijkstra(seed, rng):
+    timetable = random_timetable(rng, trains=150, stations=15, start_days=2)
+    forecast = DelaySimulator(timetable).run(seed=seed)
+    connections = build_connections(timetable).with_stop_delays(forecast.arrival_delay, forecast.departure_delay)
+    assert_matches_time_dependent_dijkstra(connections, rng, queries=40)
+
+
+def test_stops_at_one_station_make_no_connections():
+    timetable = timetable_from_stops({1: [("A", 0, 5), ("A", 30, 35), ("B", 60, 65)], 2: [("C", 10, 10), ("C", 40, 40)]})
+    connections = build_connections(timetable)
+    assert len(connections) == 1
+    assert connections.earliest_arrival("A", "B", 0)[0] == 60
+
+
+# convert_to_csv output carries the train's origin as every row's station, so there is
+# nothing to scan: depart_after must say so instead of answering "no path"
+def test_depart_after_on_converted_data_fails_loudly(api):
+    snapshot = api.snapshots.current
+    source, destination = snapshot.graph.station_codes[api.edge_table.sources[0]], snapshot.graph.station_codes[api.edge_table.targets[0]]
+    client = api.app.test_client()
+    assert client.get(f"/live/route?source={source}&destination={destination}").status_code == 200
+    response = client.get(f"/live/route?source={source}&destination={destination}&depart_after=08:00")
+    assert response.status_code == 501 and "per-stop stations" in response.get_json()["error"]
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from conftest import all_pairs, assert_matches_shortest_path, random_route_graph
+from contraction import contract, load_or_contract
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_hierarchy_matches_dijkstra(rng):
+    stations = int(rng.integers(5, 40))
+    graph = random_route_graph(rng, stations, edges=int(rng.integers(stations, stations * 4)))
+    assert_matches_shortest_path(graph, contract(graph).customize(graph).shortest_path, all_pairs(graph))
+
+
+# A delay refresh only re-customizes: the same contraction must serve the new costs
+@pytest.mark.parametrize("seed", range(100, 104))
+def test_recustomized_hierarchy_matches_dijkstra(rng):
+    graph = random_route_graph(rng, 30, edges=90)
+    hierarchy = contract(graph)
+    for _ in range(3):
+        weights = graph.weights + np.where(rng.random(len(graph.weights)) < 0.2, rng.integers(1, 60, len(graph.weights)), 0)
+        station_delay = graph.station_delay + rng.integers(0, 5, len(graph))
+        graph = graph.with_weights(weights, station_delay)
+        assert_matches_shortest_path(graph, hierarchy.customize(graph).shortest_path, all_pairs(graph))
+
+
+def test_saved_hierarchy_is_reused_for_the_same_topology(tmp_path):
+    graph = random_route_graph(np.random.default_rng(7), 25, edges=70)
+    path = str(tmp_path / "hierarchy.npz")
+    contracted = load_or_contract(graph, path)
+    loaded = load_or_contract(graph, path)
+    np.testing.assert_array_equal(loaded.rank, contracted.rank)
+    assert_matches_shortest_path(graph, loaded.customize(graph).shortest_path, all_pairs(graph))
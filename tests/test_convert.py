@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from convert_to_csv import iter_features
+
+FEATURES = [
+    {"type": "Feature", "geometry": {"type": "LineString", "coordinates": [[77.25, 28.5], [77.5, 28.75], [78, 29]]},
+     "properties": {"number": "12001", "name": "Shatabdi {\"Exp\"} [AC]", "path": "C:\\trains\\", "note": "\u00e9\\\"]}"}},
+    {"type": "Feature", "geometry": None, "properties": {"number": "1", "nested": [[], [[1, [2]]], {"a": [{}]}]}},
+    {"type": "Feature", "geometry": {"type": "Point", "coordinates": [72.8, 19.0]}, "properties": {}},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 16])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_features_match_json_load(tmp_path, chunk_size, indent):
+    path = tmp_path / "features.json"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": FEATURES}, indent=indent), encoding="utf-8")
+    assert list(iter_features(str(path), chunk_size)) == FEATURES
+
+
+def test_empty_and_unterminated_collections(tmp_path):
+    path = tmp_path / "features.json"
+    path.write_text('{"type": "FeatureCollection", "features": [ ]}', encoding="utf-8")
+    assert list(iter_features(str(path), 3)) == []
+    path.write_text('{"features": [{"properties": {"name": "a}"}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_features(str(path), 3))
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from data_stats import SummaryCache
+
+
+def write_rows(path, **extra):
+    rows = {"from_station_code": ["A", "A", "B"], "to_station_code": ["B", "C", "C"], "total_duration_min": [60, 90, 30], **extra}
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def test_summary_without_train_type(tmp_path):
+    path = str(tmp_path / "trains.csv")
+    write_rows(path)
+    summary = SummaryCache(path).summary()
+    assert summary["rows"] == 3 and summary["avg_duration_by_train_type"] == []
+    assert summary["top_departure_stations"][0] == {"station": "A", "departures": 2}
+
+
+def test_summary_by_train_type(tmp_path):
+    path = str(tmp_path / "trains.csv")
+    write_rows(path, train_type=["Exp", "Exp", "Raj"])
+    assert SummaryCache(path).summary()["avg_duration_by_train_type"] == [
+        {"train_type": "Exp", "avg_duration_min": 75.0}, {"train_type": "Raj", "avg_duration_min": 30.0}]
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from delay_model import ACTIVATION_UNITS, DelayModel, activation_pieces, init_parameters, train, train_attributes
+
+
+def random_parameters(rng, feature_count):
+    parameters = init_parameters(feature_count, rng)
+    parameters["b1"] = rng.normal(0, 1, parameters["b1"].shape)
+    parameters["c1"] = rng.normal(0, 1, ACTIVATION_UNITS)
+    parameters["a1"][rng.random(ACTIVATION_UNITS) < 0.2] = 0          #Constant units: no knee
+    a1, c1 = parameters["a1"], parameters["c1"]
+    c1[:2] = c1[2:4] / np.where(a1[2:4] != 0, a1[2:4], 1) * a1[:2]      #Units sharing a knee
+    parameters["c2"], parameters["b3"] = rng.normal(0, 1, ()), rng.normal(0, 1, ())
+    return parameters
+
+
+def relu_activation(values, a1, c1, a2, c2):
+    return np.maximum(values[:, None] * a1 + c1, 0) @ a2 + c2
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_activation_pieces_match_the_relu_units(rng):
+    p = random_parameters(rng, 4)
+    knees, slopes, intercepts = activation_pieces(p["a1"], p["c1"], p["a2"], p["c2"])
+    values = np.concatenate([rng.normal(0, 3, 5000), knees, knees + 1e-9, knees - 1e-9, [-1e6, 1e6]])
+    piece = np.searchsorted(knees, values)
+    np.testing.assert_allclose(slopes[piece] * values + intercepts[piece], relu_activation(values, p["a1"], p["c1"], p["a2"], p["c2"]),
+                               rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_predict_matches_the_layers(rng):
+    feature_count = 12
+    model = DelayModel(random_parameters(rng, feature_count), rng.normal(0, 1, feature_count), rng.uniform(0.5, 2, feature_count),
+                       rng.uniform(0, 30), rng.uniform(1, 20), ["Express", "Local"])
+    features = rng.normal(0, 3, (4000, feature_count)).astype(np.float32)
+    features[rng.random(features.shape) < 0.05] = np.nan                 #Unknown attributes
+    np.testing.assert_allclose(model.predict(features), model.predict_layers(features), rtol=1e-4, atol=1e-3)
+
+
+def test_trained_model_predict_matches_the_layers(api, tmp_path):
+    timetable = api.train_timetables
+    attributes = train_attributes(api.DATA_PATH, timetable)
+    model = train(timetable, attributes, runs=2, samples_per_run=2, epochs=2)
+    model.save(str(tmp_path / "model.npz"))
+    loaded = DelayModel.load(str(tmp_path / "model.npz"))
+    features = model.features(timetable, attributes)
+    for now_min in np.random.default_rng(0).uniform(features.start.min(), features.end.max(), 20):
+        matrix = features.at(now_min)
+        np.testing.assert_allclose(model.predict(matrix), model.predict_layers(matrix), rtol=1e-4, atol=1e-3)
+        np.testing.assert_array_equal(loaded.predict(matrix), model.predict(matrix))
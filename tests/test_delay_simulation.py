@@ -0,0 +1,102 @@
+import heapq
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from conftest import random_timetable, random_trains, repeated_row_trains, timetable_from_stops, zeros
+from delay_simulation import DelaySimulator, station_platforms
+from timetable import MINUTES_PER_DAY
+
+
+def test_zero_dwell_stop_counts_as_using_a_platform():
+    # A holds X from 00:00 to 00:10; B passes X at 00:05 without stopping
+    timetable = timetable_from_stops({1: [("X", 0, 10), ("Y", 30, 30)], 2: [("W", 0, 0), ("X", 5, 5), ("Z", 20, 20)]})
+    platforms = station_platforms(timetable)
+    assert platforms[timetable.station_id("X")] == 2
+    forecast = DelaySimulator(timetable).run(injected=zeros(timetable))
+    assert forecast.max_delay() == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_undisturbed_run_has_no_delay(rng):
+    timetable = random_timetable(rng, trains=200, stations=15)
+    forecast = DelaySimulator(timetable).run(injected=zeros(timetable))
+    assert forecast.max_delay() == 0
+
+
+# Every stop as an event in one heap: the simulation DelaySimulator.run must reproduce
+def simulate_every_stop(simulator, injected):
+    timetable = simulator.timetable
+    arrival, departure, min_dwell = simulator.arrival.tolist(), simulator.departure.tolist(), simulator.min_dwell.tolist()
+    stations, terminus, recovery = timetable.stations.tolist(), simulator.terminus.tolist(), simulator.recovery.tolist()
+    injected = injected.tolist()
+    span = len(arrival)
+    arrival_delay, departure_delay = [0] * span, [0] * span
+    free_at = [[-float('inf')] * platforms for platforms in simulator.platforms.tolist()]
+    queue = sorted(arrival[first] * span + first for first in timetable.indptr[:-1].tolist())
+    while queue:
+        time, stop = divmod(heapq.heappop(queue), span)
+        platforms = free_at[stations[stop]]
+        time = max(time, platforms[0])
+        arrival_delay[stop] = time - arrival[stop]
+        leave = max(time + min_dwell[stop], departure[stop]) + injected[stop]
+        if leave > time:
+            heapq.heapreplace(platforms, leave)
+        departure_delay[stop] = leave - departure[stop]
+        if not terminus[stop]:
+            late = max(departure_delay[stop] - recovery[stop], 0)
+            heapq.heappush(queue, (arrival[stop + 1] + late) * span + stop + 1)
+    return np.array(arrival_delay), np.array(departure_delay)
+
+
+def assert_matches_simulating_every_stop(timetable, seed):
+    simulator = DelaySimulator(timetable)
+    injected = simulator.disturbances(seed, max_primary=60, incident_rate=0.2)
+    forecast = simulator.run(injected=injected)
+    arrival_delay, departure_delay = simulate_every_stop(simulator, injected)
+    np.testing.assert_array_equal(forecast.arrival_delay, arrival_delay)
+    np.testing.assert_array_equal(forecast.departure_delay, departure_delay)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_run_matches_simulating_every_stop(seed, rng):
+    timetable = random_timetable(rng, trains=int(rng.integers(20, 300)), stations=int(rng.integers(4, 40)), start_days=2)
+    assert_matches_simulating_every_stop(timetable, seed)
+
+
+# Stop times that run backwards put a train's events out of time order
+@pytest.mark.parametrize("seed", range(12))
+def test_run_matches_simulating_every_stop_with_repeated_rows(seed, rng):
+    trains = repeated_row_trains(rng, trains=int(rng.integers(20, 300)), stations=int(rng.integers(2, 20)))
+    trains.update({number + 1000: stops for number, stops in random_trains(rng, trains=int(rng.integers(0, 100)), stations=20).items()})
+    assert_matches_simulating_every_stop(timetable_from_stops(trains), seed)
+
+
+# A refresh redraws only what lies ahead: stops reached by now keep their delays, and with
+# one pattern minute for all trains that needs no pinning (the run reproduces them)
+@pytest.mark.parametrize("seed", range(6))
+def test_run_after_keeps_realized_delays(seed, rng):
+    timetable = random_timetable(rng, trains=300, stations=8, start_days=2)
+    simulator = DelaySimulator(timetable)
+    previous = simulator.run(seed=seed)
+    for now_min in (int(rng.integers(0, MINUTES_PER_DAY)), rng.integers(0, MINUTES_PER_DAY, len(timetable))):
+        forecast = simulator.run_after(previous, now_min, seed=seed + 100)
+        reached = previous.arrival <= (np.repeat(now_min, np.diff(timetable.indptr)) if np.ndim(now_min) else now_min)
+        np.testing.assert_array_equal(forecast.arrival_delay[reached], previous.arrival_delay[reached])
+        np.testing.assert_array_equal(forecast.departure_delay[reached], previous.departure_delay[reached])
+        assert (forecast.departure_delay[~reached] != previous.departure_delay[~reached]).any()
+        if not np.ndim(now_min):
+            rerun = simulator.run(injected=forecast.injected)
+            np.testing.assert_array_equal(forecast.arrival_delay, rerun.arrival_delay)
+            np.testing.assert_array_equal(forecast.departure_delay, rerun.departure_delay)
+
+
+def test_refresh_keeps_realized_delays(api):
+    previous, now = api.snapshots.current, datetime.now()
+    now_min = api.train_pattern_minutes(api.current_service_days(previous, now), previous.forecast, now)
+    api.update_delays_and_graph(schedule_next=False)
+    forecast, timetable = api.snapshots.current.forecast, api.train_timetables
+    reached = previous.forecast.arrival <= np.repeat(now_min, np.diff(timetable.indptr))
+    np.testing.assert_array_equal(forecast.arrival_delay[reached], previous.forecast.arrival_delay[reached])
+    np.testing.assert_array_equal(forecast.departure_delay[reached], previous.forecast.departure_delay[reached])
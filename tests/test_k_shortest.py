@@ -0,0 +1,40 @@
+import pytest
+
+from conftest import path_cost, random_route_graph
+from routing import k_shortest_paths
+
+
+# Every loopless path from source to target, by depth-first search
+def all_loopless_paths(graph, source, target):
+    indptr, indices, _ = graph.adjacency
+    paths, stack = [], [[source]]
+    while stack:
+        path = stack.pop()
+        if path[-1] == target:
+            paths.append(path)
+            continue
+        for neighbor in set(indices[indptr[path[-1]]:indptr[path[-1] + 1]]) - set(path):
+            stack.append(path + [neighbor])
+    return paths
+
+
+# Costs must be the k smallest over all loopless paths; with ties the paths themselves
+# may differ, so each is checked to be a distinct loopless path of the stated cost
+def assert_matches_enumeration(graph, source, target, k):
+    found = k_shortest_paths(graph, source, target, k)
+    expected = sorted(path_cost(graph, path) for path in all_loopless_paths(graph, source, target))[:k]
+    assert [cost for cost, _ in found] == pytest.approx(expected), (source, target)
+    for cost, path in found:
+        assert path[0] == source and path[-1] == target and len(set(path)) == len(path)
+        assert path_cost(graph, path) == pytest.approx(cost)
+    assert len({tuple(path) for _, path in found}) == len(found)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_k_shortest_paths_match_enumeration(rng):
+    stations = int(rng.integers(4, 9))
+    graph = random_route_graph(rng, stations, edges=int(rng.integers(stations, 4 * stations)))
+    for source in range(stations):
+        for target in range(stations):
+            if source != target:
+                assert_matches_enumeration(graph, source, target, k=int(rng.integers(1, 8)))
@@ -0,0 +1,49 @@
+import pytest
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=1001", "limit=-1", "limit=1.5", "limit=ten", "limit=",
+                                   "cursor=-1", "cursor=abc", "cursor=", "limit=5&cursor=1e3"])
+def test_all_trains_rejects_malformed_cursor_and_limit(api, query):
+    response = api.app.test_client().get(f"/live/all_trains?{query}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_all_trains_pages_follow_the_next_cursor(api):
+    client = api.app.test_client()
+    everything = client.get(f"/live/all_trains?limit={api.MAX_PAGE_SIZE}").get_json()
+    pages, url = [], "/live/all_trains?limit=7&fields=number,route"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages += response.get_json()
+        cursor = response.headers.get("X-Next-Cursor")
+        url = cursor and f"/live/all_trains?limit=7&fields=number,route&cursor={cursor}"
+        if cursor:
+            assert f"cursor={cursor}" in response.headers["Link"]
+    assert pages == [{"train_number": row["train_number"], "route": row["route"]} for row in everything]
+    assert len(pages) > 7
+
+
+@pytest.mark.parametrize("url", ["/live/all_trains?limit=5", "/live/last_update"])
+def test_matching_if_none_match_gets_304(api, url):
+    client = api.app.test_client()
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert cached.headers["ETag"] == etag
+    assert client.get(url, headers={"If-None-Match": 'W/"stale"'}).status_code == 200
+
+
+def test_snapshot_publish_changes_snapshot_etags_only(api):
+    client = api.app.test_client()
+    before = {url: client.get(url).headers["ETag"] for url in ("/live/last_update", "/live/all_trains")}
+    api.update_delays_and_graph(schedule_next=False)
+    updated = client.get("/live/last_update", headers={"If-None-Match": before["/live/last_update"]})
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] != before["/live/last_update"]
+    assert updated.get_json()["snapshot_version"] == api.snapshots.current.version
+    assert client.get("/live/all_trains", headers={"If-None-Match": before["/live/all_trains"]}).status_code == 304
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+
+import network_artifact
+from conftest import write_source_files
+from convert_to_csv import convert
+from network_artifact import compile_network, load_network, load_or_compile, network_arrays, read_header, save_network, source_checksum
+
+
+def converted_data(directory, seed, trains):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "trains.parquet")
+    convert(*write_source_files(directory, np.random.default_rng(seed), trains=trains, stations=15), path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def data_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("artifact")
+    return converted_data(str(directory / "first"), 0, 40), converted_data(str(directory / "second"), 1, 50)
+
+
+def assert_same_network(loaded, network):
+    arrays, expected = network_arrays(loaded), network_arrays(network)
+    assert list(arrays) == list(expected)
+    for name, array in expected.items():
+        np.testing.assert_array_equal(arrays[name], array, err_msg=name)
+    timetable, edge_table = loaded.timetable, loaded.edge_table
+    assert timetable.train_ids.tolist() == network.timetable.train_ids.tolist()
+    assert edge_table.station_owner.tolist() == network.edge_table.station_owner.tolist()
+    assert edge_table.train_edges.keys() == network.edge_table.train_edges.keys()
+    for train, edges in network.edge_table.train_edges.items():
+        np.testing.assert_array_equal(edge_table.train_edges[train], edges)
+    np.testing.assert_array_equal(loaded.route_topology.costs, network.route_topology.costs)
+    assert loaded.route_topology.adjacency == network.route_topology.adjacency
+    assert loaded.station_coords.keys() == network.station_coords.keys()
+    for code, coords in network.station_coords.items():
+        np.testing.assert_array_equal([loaded.station_coords[code]["latitude"], loaded.station_coords[code]["longitude"]],
+                                      [coords["latitude"], coords["longitude"]], err_msg=code)
+
+
+def test_artifact_round_trip(data_files, tmp_path):
+    network = compile_network(data_files[0])
+    path = str(tmp_path / "trains.network")
+    save_network(network, path, "checksum")
+    header, data_start = read_header(path)
+    assert header["format_version"] == network_artifact.FORMAT_VERSION
+    assert data_start % network_artifact.ALIGNMENT == 0
+    loaded = load_network(path)
+    assert loaded.data_version == "checksum"
+    assert_same_network(loaded, network)
+    assert not loaded.timetable.arrival.flags.writeable                  #Mapped read-only, not copied
+    assert os.listdir(tmp_path) == ["trains.network"]
+
+
+def test_stale_artifact_is_recompiled(data_files, tmp_path, monkeypatch):
+    first, second = data_files
+    data_path, path = str(tmp_path / "trains.parquet"), str(tmp_path / "trains.network")
+    with open(first, "rb") as source, open(data_path, "wb") as f:
+        f.write(source.read())
+    built = load_or_compile(data_path, path)
+    assert built.data_version == read_header(path)[0]["source_checksum"] == source_checksum(first)
+    assert_same_network(built, compile_network(first))
+
+    def compiled(data_path):
+        raise AssertionError("recompiled a current artifact")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(network_artifact, "compile_network", compiled)
+        assert_same_network(load_or_compile(data_path, path), built)
+
+    # The data file changed: the checksum no longer matches
+    with open(second, "rb") as source, open(data_path, "wb") as f:
+        f.write(source.read())
+    rebuilt = load_or_compile(data_path, path)
+    assert rebuilt.data_version == read_header(path)[0]["source_checksum"] == source_checksum(second)
+    assert_same_network(rebuilt, compile_network(second))
+    assert_same_network(load_network(path), rebuilt)
+
+    # Written by another format version, or not an artifact at all
+    monkeypatch.setattr(network_artifact, "FORMAT_VERSION", network_artifact.FORMAT_VERSION + 1)
+    assert_same_network(load_or_compile(data_path, path), rebuilt)
+    assert read_header(path)[0]["format_version"] == network_artifact.FORMAT_VERSION
+    with open(path, "wb") as f:
+        f.write(b"not an artifact")
+    assert_same_network(load_or_compile(data_path, path), rebuilt)
+    assert read_header(path)[0]["source_checksum"] == source_checksum(second)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from conftest import random_route_graph
+from route_cache import RouteCache
+from routing import find_fastest_route
+from snapshot import GraphSnapshot, SnapshotHolder
+
+
+def snapshot_of(version, graph):
+    return GraphSnapshot(version, graph, {}, 0, None, None, None, None)
+
+
+def route_pairs(graph, count, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = graph.station_codes.tolist()
+    return [(codes[source], codes[target]) for source, target in rng.integers(0, len(codes), (count, 2)).tolist() if source != target]
+
+
+def test_cached_answer_is_reused_within_a_snapshot():
+    graph = random_route_graph(np.random.default_rng(0), stations=40, edges=160)
+    snapshot = snapshot_of(1, graph)
+    cache = RouteCache(tree_after=10 ** 6)
+    cache.published(snapshot)
+    for source, destination in route_pairs(graph, 20):
+        route = cache.fastest_route(snapshot, source, destination)
+        assert route == find_fastest_route(graph, source, destination)
+        assert cache.fastest_route(snapshot, source, destination) is route
+        alternates = cache.alternate_routes(snapshot, source, destination, 2)
+        assert cache.alternate_routes(snapshot, source, destination, 2) is alternates
+    stats = cache.stats()
+    assert stats["hits"] == stats["misses"] == stats["size"]
+    assert stats["tree_builds"] == 0
+
+
+def test_publish_drops_cached_answers():
+    rng = np.random.default_rng(1)
+    graph = random_route_graph(rng, stations=40, edges=160)
+    delayed = graph.with_weights(graph.weights + rng.integers(0, 60, len(graph.weights)), graph.station_delay * 3)
+    snapshots, cache = SnapshotHolder(), RouteCache()
+    snapshots.subscribe(cache.published)
+    pairs = route_pairs(graph, 30, seed=1)
+    snapshots.publish(snapshot_of(1, graph))
+    for source, destination in pairs:
+        cache.fastest_route(snapshots.current, source, destination)
+    snapshots.publish(snapshot_of(2, delayed))
+    assert cache.stats()["size"] == cache.stats()["trees"] == 0
+    for source, destination in pairs:
+        assert cache.fastest_route(snapshots.current, source, destination) == find_fastest_route(delayed, source, destination)
+    # An answer finished on the replaced snapshot is not stored
+    cache.fastest_route(snapshot_of(1, graph), *pairs[0])
+    assert all(key[1] == 2 for key in cache.entries)
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_lru_eviction_respects_the_bound():
+    graph = random_route_graph(np.random.default_rng(2), stations=40, edges=160)
+    snapshot = snapshot_of(1, graph)
+    cache = RouteCache(max_entries=5, tree_after=1, max_trees=2)
+    cache.published(snapshot)
+    pairs = list(dict.fromkeys(route_pairs(graph, 40, seed=2)))
+    for count, (source, destination) in enumerate(pairs, 1):
+        cache.fastest_route(snapshot, source, destination)
+        cache.fastest_route(snapshot, *pairs[0])                  #Keeps the first pair the most recently used
+        assert len(cache.entries) == min(count, 5)
+        assert len(cache.trees) <= 2
+    assert ("route", 1) + pairs[0] in cache.entries
+    assert list(cache.entries)[-2:] == [("route", 1) + pairs[-1], ("route", 1) + pairs[0]]
+    stats = cache.stats()
+    assert stats["evictions"] == len(pairs) - 5
+    assert stats["tree_builds"] - stats["tree_evictions"] == len(cache.trees) == 2
@@ -0,0 +1,29 @@
+import pytest
+
+from conftest import path_cost, random_route_graph
+from routing import INF, shortest_path, shortest_path_tree
+
+
+# The path the tie rule defines: from the target back, the smallest-id station that
+# reaches each one at its shortest cost
+def smallest_parent_path(graph, dist, target):
+    indptr, indices, costs = graph.adjacency
+    path = [target]
+    while dist[path[-1]] != 0:
+        station = path[-1]
+        path.append(min(u for u in range(len(graph)) for p in range(indptr[u], indptr[u + 1])
+                        if indices[p] == station and dist[u] + costs[p] == dist[station]))
+    return path[::-1]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_equal_cost_ties_take_the_smallest_parent(rng):
+    graph = random_route_graph(rng, stations=30, edges=120, max_weight=4)
+    for source in range(len(graph)):
+        dist, parent = shortest_path_tree(graph, source)
+        for target in range(len(graph)):
+            cost, path = shortest_path(graph, source, target)
+            assert cost == dist[target]
+            if cost != INF and target != source:
+                assert path == smallest_parent_path(graph, dist, target)
+                assert path_cost(graph, path) == cost
@@ -0,0 +1,45 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from timetable import MINUTES_PER_DAY, ServiceDays
+
+
+# Oldest day whose instance is not past until at when, else the newest day
+def current_day_by_scan(days, until, when):
+    offsets = days.offsets(when)
+    return next((day for day in range(len(days)) if offsets[day] <= until), len(days) - 1)
+
+
+@pytest.mark.parametrize("days_before,days_after", [(0, 0), (1, 1), (2, 0), (3, 2)])
+def test_rolled_window_matches_a_new_window(days_before, days_after):
+    days = ServiceDays.around(date(2024, 2, 27), days_before, days_after)
+    dates = days.dates
+    assert days.rolled(days.today) is days
+    for shift in range(-len(days) - 1, len(days) + 2):
+        today = days.today + timedelta(days=shift)
+        rolled = days.rolled(today)
+        assert rolled.dates == ServiceDays.around(today, days_before, days_after).dates
+        assert rolled.today == today and rolled.days_before == days_before
+    assert days.dates == dates
+
+
+# Trains run at most days_before + 1 days (abc_1 sizes the window from the service span),
+# so once the window rolls past midnight every instance still running keeps its day
+@pytest.mark.parametrize("seed", range(5))
+def test_current_day_across_midnight(rng):
+    days_before = int(rng.integers(0, 3))
+    days = ServiceDays.around(date(2024, 12, 31), days_before, days_after=int(rng.integers(0, 3)))
+    until = rng.integers(0, (days_before + 1) * MINUTES_PER_DAY, 200)
+    for minutes in [0, 1, MINUTES_PER_DAY - 1, MINUTES_PER_DAY, MINUTES_PER_DAY + 1] + rng.integers(0, 2 * MINUTES_PER_DAY, 10).tolist():
+        when = datetime.combine(days.today, datetime.min.time()) + timedelta(minutes=minutes)
+        offsets = days.offsets(when)
+        assert all(days.to_datetime(day, offsets[day]) == when for day in range(len(days)))
+        current = days.current_day(until, when)
+        assert current.tolist() == [current_day_by_scan(days, value, when) for value in until.tolist()]
+
+        rolled = days.rolled(when.date())
+        rolled_current = rolled.current_day(until, when)
+        for day, rolled_day, value in zip(current.tolist(), rolled_current.tolist(), until.tolist()):
+            if days.to_datetime(day, value) >= when:
+                assert rolled.dates[rolled_day] == days.dates[day]
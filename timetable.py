@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+MINUTES_PER_DAY = 1440
+
+
+# Parses "HH:MM:SS" strings into minutes after midnight (NaN where unparsable)
+def clock_to_minutes(series):
+    parsed = pd.to_datetime(series.astype(str), format='%H:%M:%S', errors='coerce')
+    return parsed.dt.hour * 60 + parsed.dt.minute
+
+
+# Position of a code in a sorted code array, or None when it is not there
+def code_index(codes, code):
+    index = int(np.searchsorted(codes, code))
+    if index < len(codes) and codes[index] == code:
+        return index
+    return None
+
+
+# Inverted index from station to the trains calling there. Calls of station s are the
+# slice indptr[s]:indptr[s + 1] of stops/trains/arrival, sorted by scheduled arrival,
+# with only the first call of each train kept. max_dwell bounds departure - arrival
+# per station so a time window can be turned into a bound on scheduled arrival.
+class StationIndex:
+    def __init__(self, indptr, stops, trains, arrival, max_dwell):
+        self.indptr = indptr
+        self.stops = stops
+        self.trains = trains
+        self.arrival = arrival
+        self.max_dwell = max_dwell
+
+    def calls(self, station_id):
+        return slice(int(self.indptr[station_id]), int(self.indptr[station_id + 1]))
+
+    # Calls whose scheduled arrival lies in [earliest, latest], by binary search
+    def calls_between(self, station_id, earliest, latest):
+        start, end = int(self.indptr[station_id]), int(self.indptr[station_id + 1])
+        arrival = self.arrival[start:end]
+        return slice(start + int(np.searchsorted(arrival, earliest, side='left')),
+                     start + int(np.searchsorted(arrival, latest, side='right')))
+
+
+def build_station_index(indptr, stations, arrival, departure, station_count):
+    trains = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    _, first_call = np.unique(trains.astype(np.int64) * station_count + stations, return_index=True)
+    order = first_call[np.lexsort((trains[first_call], arrival[first_call], stations[first_call]))]
+
+    station_indptr = np.zeros(station_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(stations[order], minlength=station_count), out=station_indptr[1:])
+    max_dwell = np.zeros(station_count, dtype=np.int64)
+    np.maximum.at(max_dwell, stations, np.maximum(departure - arrival, 0))
+    return StationIndex(station_indptr, order, trains[order].astype(np.int32), arrival[order], max_dwell)
+
+
+# Columnar timetable: every stop of every train lives in flat arrays, and the stops of
+# train i are the contiguous slice indptr[i]:indptr[i + 1]. Times are int64 minute
+# offsets from midnight of the pattern's first day; ServiceDays places each run of this
+# pattern on a calendar day.
+class Timetable:
+    def __init__(self, train_ids, train_names, indptr, stations, station_codes, arrival, departure, station_index):
+        self.train_ids = train_ids
+        self.train_names = train_names
+        self.indptr = indptr
+        self.stations = stations
+        self.station_codes = station_codes
+        self.arrival = arrival
+        self.departure = departure
+        self.station_index = station_index
+        self.train_index = {train_id: i for i, train_id in enumerate(train_ids.tolist())}
+
+    def __len__(self):
+        return len(self.train_ids)
+
+    def __contains__(self, train_id):
+        return train_id in self.train_index
+
+    def __iter__(self):
+        return iter(self.train_index)
+
+    def keys(self):
+        return self.train_index.keys()
+
+    def stops(self, train_id):
+        i = self.train_index[train_id]
+        return slice(int(self.indptr[i]), int(self.indptr[i + 1]))
+
+    def train_name(self, train_id):
+        return self.train_names[self.train_index[train_id]]
+
+    def station_id(self, station_code):
+        return code_index(self.station_codes, station_code)
+
+    def route(self, train_id):
+        return self.station_codes[self.stations[self.stops(train_id)]].tolist()
+
+    # Calendar days one run of the pattern touches (3 for a train arriving on day 3)
+    def service_span_days(self):
+        return int(self.arrival.max(initial=0)) // MINUTES_PER_DAY + 1
+
+
+# Rolling window of service days. The timetable holds one service pattern (offsets from
+# midnight of day 1) and every train runs it once per service day, so the instance of
+# day d calls at midnight(d) + offset; trains of days_before earlier days can still be
+# running. Immutable: rolled() drops the days that fell out and appends the new ones,
+# leaving the timetable arrays untouched, so each snapshot keeps the window it was
+# published with.
+class ServiceDays:
+    def __init__(self, dates, days_before):
+        self.dates = tuple(dates)
+        self.days_before = days_before
+        self.midnights = tuple(datetime.combine(day, datetime.min.time()) for day in self.dates)
+
+    @classmethod
+    def around(cls, today, days_before=1, days_after=1):
+        return cls([today + timedelta(days=k) for k in range(-days_before, days_after + 1)], days_before)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def today(self):
+        return self.dates[self.days_before]
+
+    def rolled(self, today):
+        shift = (today - self.today).days
+        if shift == 0:
+            return self
+        if 0 < shift < len(self.dates):
+            added = [self.dates[-1] + timedelta(days=k) for k in range(1, shift + 1)]
+            return ServiceDays(self.dates[shift:] + tuple(added), self.days_before)
+        return ServiceDays.around(today, self.days_before, len(self.dates) - self.days_before - 1)
+
+    # Minutes from each day's midnight to when, oldest day first (so descending)
+    def offsets(self, when):
+        return np.array([(when - midnight).total_seconds() / 60 for midnight in self.midnights])
+
+    # Day index of the instance current at when, for each value of until (pattern minutes
+    # an instance stays current to, e.g. its delayed terminus arrival): the oldest day
+    # whose instance has not passed it yet, or the newest day once all have. Offsets
+    # descend with the day, so this is one binary search per value.
+    def current_day(self, until, when):
+        day = np.searchsorted(-self.offsets(when), -np.asarray(until), side='left')
+        return np.minimum(day, len(self.dates) - 1)
+
+    def to_datetime(self, day, minutes):
+        return self.midnights[day] + timedelta(minutes=int(minutes))
+
+
+def build_timetable(df):
+    day = pd.to_numeric(df['day'], errors='coerce')
+    arrival = clock_to_minutes(df['arrival_time'])
+    departure = clock_to_minutes(df['departure_time'])
+    valid = (day.notna() & arrival.notna() & departure.notna()).to_numpy()
+
+    day_offset = (day.to_numpy()[valid].astype(np.int64) - 1) * MINUTES_PER_DAY
+    arrival = day_offset + arrival.to_numpy()[valid].astype(np.int64)
+    departure = day_offset + departure.to_numpy()[valid].astype(np.int64)
+    train_codes, train_numbers = pd.factorize(df['train_number'].to_numpy()[valid], sort=True)
+    station_ids, station_codes = pd.factorize(df['from_station_code'].astype(str).to_numpy()[valid], sort=True)
+    names = df['train_name_y'].astype(str).to_numpy()[valid]
+
+    # Group by train, then order each train's stops by arrival (stable, like sorted())
+    order = np.lexsort((arrival, train_codes))
+    train_codes = train_codes[order]
+    counts = np.bincount(train_codes, minlength=len(train_numbers))
+    keep_train = counts >= 2
+    keep_stop = keep_train[train_codes]
+    order = order[keep_stop]
+
+    counts = counts[keep_train]
+    indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    train_ids = np.array([str(number) for number in np.asarray(train_numbers)[keep_train]], dtype=object)
+    train_names = names[order][indptr[:-1]] if len(counts) else np.array([], dtype=object)
+
+    stations = station_ids[order].astype(np.int32)
+    arrival, departure = arrival[order], departure[order]
+    return Timetable(
+        train_ids=train_ids,
+        train_names=train_names,
+        indptr=indptr,
+        stations=stations,
+        station_codes=np.asarray(station_codes, dtype=object),
+        arrival=arrival,
+        departure=departure,
+        station_index=build_station_index(indptr, stations, arrival, departure, len(station_codes)),
+    )